@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_save, post_delete
 
 
 class ArtConfig(AppConfig):
     name = 'art'
+
+    def ready(self):
+        from art.taxonomy import TAXONOMY_MODELS, invalidate_taxonomy
+
+        for model in TAXONOMY_MODELS:
+            post_save.connect(invalidate_taxonomy, sender=model,
+                              dispatch_uid='invalidate_taxonomy_on_save_' + model.__name__)
+            post_delete.connect(invalidate_taxonomy, sender=model,
+                                dispatch_uid='invalidate_taxonomy_on_delete_' + model.__name__)
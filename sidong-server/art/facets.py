@@ -0,0 +1,98 @@
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from art.models import Art, CHOICES_OF_MEDIUM
+
+PRICE_BUCKETS = [
+    (0, 100000),
+    (100000, 300000),
+    (300000, 500000),
+    (500000, 1000000),
+    (1000000, None),
+]
+
+# 패널에 보여주는 필터 항목 -> get_arts_filter() 가 만드는 조건 키
+FACET_FILTER_KEYS = {
+    'sale_status': 'sale_status__in',
+    'orientation': 'orientation__in',
+    'size': 'size__in',
+    'medium': 'medium',
+    'price': 'price__range',
+}
+
+FACET_CHOICES = {
+    'sale_status': Art.CHOICES_OF_SALE_STATUS,
+    'orientation': Art.CHOICES_OF_ORIENTATION,
+    'size': Art.CHOICES_OF_SIZE,
+    'medium': CHOICES_OF_MEDIUM,
+}
+
+
+def get_facet_cache_key(arts_filter):
+    normalized = {
+        key: sorted(value) if key.endswith('__in') else value
+        for key, value in arts_filter.items()
+    }
+    return 'art_facets:' + hashlib.md5(
+        json.dumps(normalized, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def get_price_bucket_filter(min_price, max_price):
+    price_filter = Q(price__gte=min_price)
+    if max_price is not None:
+        price_filter &= Q(price__lt=max_price)
+    return price_filter
+
+
+def get_art_facets(arts_filter):
+    cache_key = get_facet_cache_key(arts_filter)
+    facets = cache.get(cache_key)
+    if facets is None:
+        facets = count_art_facets(arts_filter)
+        cache.set(cache_key, facets, settings.ART_FACETS_CACHE_TIMEOUT)
+    return facets
+
+
+def count_art_facets(arts_filter):
+    # 각 항목의 개수는 "그 항목을 제외한 나머지 필터" 를 적용한 결과로 센다.
+    # 모든 개수를 COUNT(...) FILTER (WHERE ...) 로 한 번의 쿼리에서 계산한다.
+    base_filter = {
+        key: value for key, value in arts_filter.items()
+        if key not in FACET_FILTER_KEYS.values()
+    }
+
+    def other_facets_filter(facet):
+        return Q(**{
+            key: value for key, value in arts_filter.items()
+            if key in FACET_FILTER_KEYS.values() and key != FACET_FILTER_KEYS[facet]
+        })
+
+    aggregates = {'total_count': Count('id', filter=Q(**arts_filter))}
+
+    for facet, choices in FACET_CHOICES.items():
+        for value, _ in choices:
+            aggregates['{0}__{1}'.format(facet, value)] = Count('id', filter=(
+                other_facets_filter(facet) & Q(**{facet: value})))
+
+    for i, (min_price, max_price) in enumerate(PRICE_BUCKETS):
+        aggregates['price__{0}'.format(i)] = Count('id', filter=(
+            other_facets_filter('price') & get_price_bucket_filter(min_price, max_price)))
+
+    counts = Art.objects.filter(**base_filter).aggregate(**aggregates)
+
+    facets = {'total_count': counts['total_count']}
+    for facet, choices in FACET_CHOICES.items():
+        facets[facet] = [{
+            'value': value,
+            'count': counts['{0}__{1}'.format(facet, value)],
+        } for value, _ in choices]
+
+    facets['price'] = [{
+        'min_price': min_price,
+        'max_price': max_price,
+        'count': counts['price__{0}'.format(i)],
+    } for i, (min_price, max_price) in enumerate(PRICE_BUCKETS)]
+
+    return facets
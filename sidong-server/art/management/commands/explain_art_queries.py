@@ -0,0 +1,109 @@
+import random
+import re
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from art.models import Art, PAINTING, CHOICES_OF_MEDIUM
+from user.models import Artist
+
+# arts 쿼리에서 실제로 나올 수 있는 (라벨, 필터, 정렬) 조합
+QUERY_COMBINATIONS = [
+    ('newest', {}, ['-id']),
+    ('on sale, newest first', {'sale_status__in': [Art.ON_SALE]}, ['-id']),
+    ('on sale, cheapest first', {'sale_status__in': [Art.ON_SALE]}, ['price', '-id']),
+    ('by medium, price range', {
+        'medium': PAINTING, 'price__range': [100000, 500000]}, ['-id']),
+    ('by medium, price range, cheapest first', {
+        'medium': PAINTING, 'price__range': [100000, 500000]}, ['price', '-id']),
+    ('cheapest first', {}, ['price', '-id']),
+    ('most liked', {}, ['-like_count', '-id']),
+    ('recently created', {}, ['-created_at', '-id']),
+    ('filter panel', {
+        'sale_status__in': [Art.ON_SALE, Art.SOLD_OUT],
+        'orientation__in': [Art.LANDSCAPE, Art.PORTRAIT],
+        'size__in': [Art.SMALL, Art.MEDIUM],
+        'medium': PAINTING,
+        'price__range': [0, 1000000],
+    }, ['-id']),
+]
+
+INDEX_PATTERN = re.compile(r'Index (?:Only )?Scan(?: Backward)? using (\w+)|Bitmap Index Scan on (\w+)')
+EXECUTION_TIME_PATTERN = re.compile(r'Execution Time: ([\d.]+) ms')
+
+
+class Command(BaseCommand):
+    help = 'arts 쿼리의 필터/정렬 조합마다 EXPLAIN (ANALYZE, BUFFERS) 를 실행해서 사용하는 인덱스를 보여줍니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='실행 전에 만들 임시 작품 수. 트랜잭션을 롤백해서 데이터는 남지 않습니다.')
+        parser.add_argument(
+            '--page-size', type=int, default=20)
+        parser.add_argument(
+            '--verbose-plans', action='store_true', help='전체 실행 계획을 출력합니다.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['seed']:
+                seed_arts(options['seed'])
+
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE ' + Art._meta.db_table)
+                used_indexes = set()
+
+                combinations = list(QUERY_COMBINATIONS)
+                artist_id = Art.objects.filter(
+                    artist__isnull=False).values_list('artist_id', flat=True).first()
+                if artist_id:
+                    combinations.append(('by artist', {'artist_id': artist_id}, ['-id']))
+
+                for label, arts_filter, ordering in combinations:
+                    queryset = Art.objects.filter(
+                        **arts_filter).order_by(*ordering)[:options['page_size']]
+                    sql, params = queryset.query.sql_with_params()
+                    cursor.execute('EXPLAIN (ANALYZE, BUFFERS) ' + sql, params)
+                    plan = [row[0] for row in cursor.fetchall()]
+
+                    indexes = [
+                        name for match in INDEX_PATTERN.finditer('\n'.join(plan))
+                        for name in match.groups() if name
+                    ]
+                    used_indexes.update(indexes)
+                    execution_time = EXECUTION_TIME_PATTERN.search(plan[-1])
+
+                    self.stdout.write('{0:<42} {1:>10} ms  {2}'.format(
+                        label,
+                        execution_time.group(1) if execution_time else '-',
+                        ', '.join(indexes) if indexes else 'Seq Scan',
+                    ))
+                    if options['verbose_plans']:
+                        self.stdout.write('\n'.join('    ' + line for line in plan))
+
+            unused_indexes = [
+                index.name for index in Art._meta.indexes if index.name not in used_indexes]
+            if unused_indexes:
+                self.stdout.write(self.style.WARNING(
+                    '사용되지 않은 인덱스: ' + ', '.join(unused_indexes)))
+
+            transaction.set_rollback(True)
+
+
+def seed_arts(count):
+    artist_ids = list(Artist.objects.values_list('id', flat=True)) or [None]
+    arts = []
+    for i in range(count):
+        width = random.randint(10, 200)
+        height = random.randint(10, 200)
+        arts.append(Art(
+            artist_id=random.choice(artist_ids),
+            name='explain ' + str(i),
+            medium=random.choice(CHOICES_OF_MEDIUM)[0],
+            sale_status=random.choice(Art.CHOICES_OF_SALE_STATUS)[0],
+            price=random.randint(1, 300) * 10000,
+            orientation=random.choice(Art.CHOICES_OF_ORIENTATION)[0],
+            size=random.choice(Art.CHOICES_OF_SIZE)[0],
+            width=width,
+            height=height,
+            like_count=random.randint(0, 500),
+        ))
+    Art.objects.bulk_create(arts, batch_size=5000)
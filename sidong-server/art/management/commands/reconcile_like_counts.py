@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from art.models import Like as ArtLike
+from user.models import Like as ArtistLike
+from sidong_server.likes import reconcile_like_count
+
+
+class Command(BaseCommand):
+    help = '작품/작가의 like_count 를 Like 테이블의 행 수로 다시 계산합니다.'
+
+    def handle(self, *args, **options):
+        art_count = reconcile_like_count(ArtLike, 'art')
+        artist_count = reconcile_like_count(ArtistLike, 'artist')
+
+        self.stdout.write('arts: {0}, artists: {1} updated'.format(
+            art_count, artist_count))
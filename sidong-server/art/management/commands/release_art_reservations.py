@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from art.reservations import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = '예약 시간이 지난 작품의 예약(reserveArt)을 한 번에 풉니다.'
+
+    def handle(self, *args, **options):
+        self.stdout.write('{0} reservations released'.format(release_expired_reservations()))
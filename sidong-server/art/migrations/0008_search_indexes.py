@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('art', '0007_auto_20210519_1505'),
+        ('user', '0017_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [
+                "CREATE INDEX art_art_name_trgm ON art_art "
+                "USING gin ((UPPER(name::text)) gin_trgm_ops);",
+                "CREATE INDEX art_art_name_ngrams ON art_art "
+                "USING gin (search_ngrams(name));",
+            ],
+            [
+                "DROP INDEX IF EXISTS art_art_name_trgm;",
+                "DROP INDEX IF EXISTS art_art_name_ngrams;",
+            ],
+        ),
+    ]
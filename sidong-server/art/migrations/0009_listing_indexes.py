@@ -0,0 +1,41 @@
+# Generated by Django 2.2.10 on 2026-10-18 08:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('art', '0008_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='art',
+            index=models.Index(condition=models.Q(sale_status=1), fields=['-id'], name='art_on_sale_newest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='art',
+            index=models.Index(condition=models.Q(sale_status=1), fields=['price', '-id'], name='art_on_sale_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='art',
+            index=models.Index(fields=['medium', 'price'], name='art_medium_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='art',
+            index=models.Index(fields=['price', '-id'], name='art_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='art',
+            index=models.Index(fields=['-like_count', '-id'], name='art_like_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='art',
+            index=models.Index(fields=['-created_at', '-id'], name='art_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='art',
+            index=models.Index(fields=['artist', '-id'], name='art_artist_newest_idx'),
+        ),
+    ]
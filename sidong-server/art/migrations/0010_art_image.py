@@ -0,0 +1,54 @@
+# Generated by Django 2.2.10 on 2026-10-18 09:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file', '0005_file_sha256'),
+        ('art', '0009_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArtImage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('art', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='art_images', to='art.Art')),
+                ('file', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='art_images', to='file.File')),
+            ],
+            options={
+                'ordering': ['position'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='artimage',
+            constraint=models.UniqueConstraint(fields=('art', 'position'), name='unique_art_image_position'),
+        ),
+        # 지워진 File 을 가리키던 id 는 옮기지 않는다.
+        migrations.RunSQL(
+            """
+            INSERT INTO art_artimage (art_id, file_id, position)
+            SELECT images.art_id, images.file_id,
+                   ROW_NUMBER() OVER (PARTITION BY images.art_id ORDER BY images.ordinality) - 1
+            FROM (
+                SELECT art.id AS art_id, image.file_id, image.ordinality
+                FROM art_art AS art, UNNEST(art.images) WITH ORDINALITY AS image(file_id, ordinality)
+            ) AS images
+            JOIN file_file ON file_file.id = images.file_id
+            """,
+            """
+            UPDATE art_art SET images = ARRAY(
+                SELECT file_id FROM art_artimage
+                WHERE art_artimage.art_id = art_art.id ORDER BY position
+            )
+            """,
+        ),
+        migrations.RemoveField(
+            model_name='art',
+            name='images',
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.10 on 2026-10-18 09:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('art', '0010_art_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='art',
+            name='reserved_by',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='art',
+            name='reserved_until',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name='art',
+            index=models.Index(condition=models.Q(reserved_until__isnull=False), fields=['reserved_until'], name='art_reserved_until_idx'),
+        ),
+    ]
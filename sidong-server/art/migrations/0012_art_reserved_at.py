@@ -0,0 +1,18 @@
+# Generated by Django 2.2.10 on 2026-10-18 09:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('art', '0011_art_reservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='art',
+            name='reserved_at',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
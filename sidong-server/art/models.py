@@ -1,4 +1,3 @@
-from django.contrib.postgres.fields import ArrayField
 from django.db import models
 from django.contrib.auth.models import User
 from file.models import File
@@ -127,13 +126,68 @@ class Art(models.Model):
     size = models.CharField(choices=CHOICES_OF_SIZE, max_length=8)
     width = models.PositiveIntegerField(default=0)
     height = models.PositiveIntegerField(default=0)
-    images = ArrayField(models.PositiveIntegerField(), default=list)
     like_count = models.PositiveIntegerField(default=0)
+    # 결제창을 여는 동안 다른 사람이 같은 작품을 결제하지 못하도록 잠시 잡아둔다. (art/reservations.py)
+    reserved_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, related_name='+',
+    )
+    reserved_until = models.DateTimeField(null=True)
+    # 같은 사람이 계속 연장해서 작품을 묶어두지 못하도록 처음 예약한 시간부터 최대 시간을 둔다.
+    reserved_at = models.DateTimeField(null=True)
+
+    class Meta:
+        # arts 쿼리의 필터/정렬 조합에 맞춘 인덱스. (python manage.py explain_art_queries 로 확인)
+        indexes = [
+            models.Index(fields=['-id'], condition=models.Q(sale_status=1),    # ON_SALE
+                         name='art_on_sale_newest_idx'),
+            models.Index(fields=['price', '-id'], condition=models.Q(sale_status=1),
+                         name='art_on_sale_price_idx'),
+            models.Index(fields=['medium', 'price'], name='art_medium_price_idx'),
+            models.Index(fields=['price', '-id'], name='art_price_idx'),
+            models.Index(fields=['-like_count', '-id'], name='art_like_count_idx'),
+            models.Index(fields=['-created_at', '-id'], name='art_created_at_idx'),
+            models.Index(fields=['artist', '-id'], name='art_artist_newest_idx'),
+            # 만료된 예약을 한 번에 푸는 release_art_reservations 용
+            models.Index(fields=['reserved_until'], condition=models.Q(reserved_until__isnull=False),
+                         name='art_reserved_until_idx'),
+        ]
+
+    @property
+    def images(self):
+        # 예전 ArrayField(images) 처럼 순서대로 정렬된 File id 목록
+        return [art_image.file_id for art_image in self.art_images.all()]
+
+    def get_representative_art_image(self):
+        # optimizer_hints 로 미리 가져온 이미지가 있으면 query 없이 쓴다.
+        if hasattr(self, 'representative_art_images'):
+            art_images = self.representative_art_images
+        elif 'art_images' in getattr(self, '_prefetched_objects_cache', {}):
+            art_images = self.art_images.all()[:1]
+        else:
+            art_images = self.art_images.select_related('file')[:1]
+        return art_images[0] if art_images else None
 
     @property
     def representative_image_url(self):
-        representative_image_file = File.objects.get(id=self.images[0])
-        return representative_image_file.url
+        art_image = self.get_representative_art_image()
+        return art_image.file.url if art_image else None
+
+
+class ArtImage(models.Model):
+    art = models.ForeignKey(
+        Art, on_delete=models.CASCADE, related_name='art_images',
+    )
+    file = models.ForeignKey(
+        File, on_delete=models.PROTECT, related_name='art_images',
+    )
+    position = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['position']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['art', 'position'], name='unique_art_image_position'),
+        ]
 
 
 class Like(models.Model):
@@ -169,3 +223,11 @@ def calculate_orientation(width, height):
         return Art.PORTRAIT
     else:
         return Art.ETC_ORIENTATION
+
+
+def set_art_images(art_id, file_ids):
+    ArtImage.objects.filter(art_id=art_id).delete()
+    ArtImage.objects.bulk_create([
+        ArtImage(art_id=art_id, file_id=file_id, position=position)
+        for position, file_id in enumerate(file_ids)
+    ])
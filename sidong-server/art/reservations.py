@@ -0,0 +1,47 @@
+import datetime
+from django.conf import settings
+from django.db.models import F, Q, Value
+from django.db.models.functions import Least
+from django.utils import timezone
+from art.models import Art
+
+# 결제창을 열기 전에 작품을 잠시 잡아둔다. 조건부 UPDATE 한 문장으로 처리하므로
+# 여러 사람이 동시에 요청해도 한 명만 예약에 성공한다. (주문 저장은 user/checkout.py)
+
+
+def reserve_art(art_id, user):
+    now = timezone.now()
+    reserved_until = now + datetime.timedelta(minutes=settings.ART_RESERVATION_MINUTES)
+
+    # 예약이 없거나 만료된 판매 중인 작품을 새로 예약한다.
+    reserved_count = Art.objects.filter(
+        Q(reserved_by__isnull=True) | Q(reserved_until__lt=now),
+        id=art_id, sale_status=Art.ON_SALE,
+    ).update(reserved_by=user, reserved_at=now, reserved_until=reserved_until)
+
+    if reserved_count == 0:
+        # 본인이 잡고 있는 예약은 연장하되, 처음 예약한 때부터 최대 시간까지만 연장한다.
+        reserved_count = Art.objects.filter(
+            id=art_id, sale_status=Art.ON_SALE, reserved_by=user, reserved_until__gte=now,
+        ).update(reserved_until=Least(
+            Value(reserved_until), F('reserved_at') + datetime.timedelta(
+                minutes=settings.ART_RESERVATION_MAX_MINUTES)))
+        if reserved_count == 1:
+            reserved_until = Art.objects.values_list(
+                'reserved_until', flat=True).get(id=art_id)
+
+    if reserved_count == 1:
+        return (True, reserved_until)
+
+    art = Art.objects.filter(id=art_id).only('sale_status').first()
+    if art is None:
+        return (False, '작품 정보가 없습니다.')
+    if art.sale_status != Art.ON_SALE:
+        return (False, '판매 중인 작품이 아닙니다.')
+    return (False, '다른 분이 결제 중인 작품입니다.\n잠시 후 다시 시도해주세요.')
+
+
+def release_expired_reservations():
+    # 주문 저장(user/checkout.py)도 예약 시간이 지난 예약은 인정하지 않으므로 풀어도 결과가 같다.
+    return Art.objects.filter(reserved_until__lt=timezone.now()).update(
+        reserved_by=None, reserved_at=None, reserved_until=None)
@@ -1,49 +1,95 @@
 from django.db import transaction
+from django.db.models import Prefetch
+from promise import Promise
 from graphene import ObjectType, Field, List, ID, Mutation, String, \
-    Int, Boolean, Argument, InputObjectType, InputField
+    Int, Boolean, Argument, InputObjectType, InputField, DateTime, NonNull
 from graphene_django.types import DjangoObjectType
 from graphene_file_upload.scalars import Upload
 from django.contrib.auth.models import User
-from art.models import Theme, Style, Technique, Art, \
-    calculate_art_size, Like, calculate_orientation
-from file.models import File, create_file, validate_file
+from art.models import Theme, Style, Technique, Art, ArtImage, \
+    calculate_art_size, Like, calculate_orientation, set_art_images
+from art.facets import get_art_facets
+from art.reservations import reserve_art
+from art.taxonomy import get_taxonomy
+from file.models import File, create_files, get_user_files, validate_file
+from file.loaders import get_file_url
 from user.models import Artist
+from user.viewer import get_viewer
+from sidong_server.likes import add_like, remove_like
+from sidong_server.optimizer import is_prefetched, optimize
+from sidong_server.pagination import get_ordering, paginate_by_cursor
+from sidong_server.search import SEARCH_ORDERING, rank, search
 from django.utils import timezone
 
 
+ART_ORDERING_FIELDS = ['id', 'price', 'like_count', 'created_at']
+
+
 class ArtImageType(ObjectType):
     id = ID()
     url = String()
+    width = Int()
+    height = Int()
+    size = Int()
+    dominant_color = String()
+    blurhash = String()
 
 
 class ArtType(DjangoObjectType):
     class Meta:
         model = Art
         convert_choices_to_enum = ["size"]
+        exclude = ('reserved_by', 'reserved_until', 'reserved_at')
 
-    representative_image_url = String()
-    image_urls = List(ArtImageType)
+    images = List(NonNull(Int), required=True)
+    representative_image_url = String(size=String())
+    image_urls = List(ArtImageType, size=String())
     current_user_likes_this = Boolean()
 
-    def resolve_representative_image_url(self, info):
-        return self.representative_image_url
-
-    def resolve_image_urls(self, info):
-        image_urls = []
-        for image_id in self.images:
-            file_instance = File.objects.get(id=image_id)
-            image_urls.append({
-                'id': image_id,
-                'url': file_instance.url,
-            })
-
-        return image_urls
+    optimizer_hints = {
+        'images': [Prefetch('art_images')],
+        'representative_image_url': [Prefetch(
+            'art_images',
+            queryset=ArtImage.objects.filter(position=0).select_related('file'),
+            to_attr='representative_art_images',
+        )],
+        'image_urls': [Prefetch(
+            'art_images', queryset=ArtImage.objects.select_related('file'))],
+        'current_user_likes_this': [],
+    }
+
+    def resolve_images(self, info):
+        # 예전 ArrayField(images) 처럼 순서대로 정렬된 File id 목록
+        return [art_image.file_id for art_image in self.art_images.all()]
+
+    def resolve_representative_image_url(self, info, size=None):
+        art_image = self.get_representative_art_image()
+        if art_image is None:
+            return None
+        return get_file_url(info, art_image.file, size)
+
+    def resolve_image_urls(self, info, size=None):
+        art_images = self.art_images.all()
+        if not is_prefetched(self, 'art_images'):
+            art_images = art_images.select_related('file')
+
+        def to_image_urls(urls):
+            return [{
+                'id': art_image.file_id,
+                'url': url,
+                'width': art_image.file.width,
+                'height': art_image.file.height,
+                'size': art_image.file.size,
+                'dominant_color': art_image.file.dominant_color,
+                'blurhash': art_image.file.blurhash,
+            } for art_image, url in zip(art_images, urls)]
+
+        return Promise.all([
+            get_file_url(info, art_image.file, size) for art_image in art_images
+        ]).then(to_image_urls)
 
     def resolve_current_user_likes_this(self, info):
-        user = info.context.user
-        if user.is_anonymous:
-            return False
-        return Like.objects.filter(user=user, art_id=self.id).exists()
+        return get_viewer(info).likes_art(self.id)
 
     def resolve_created_at(self, info):
         return timezone.localdate(self.created_at)
@@ -81,6 +127,7 @@ class ArtLikeType(ObjectType):
 
 class CursorBasedArts(ObjectType):
     last_id = ID()
+    next_cursor = String()
     arts = List(ArtType)
 
 
@@ -89,6 +136,31 @@ class ArtConnection(ObjectType):
     total_count = Int()
 
 
+class ArtCursorConnection(ObjectType):
+    arts = List(ArtType)
+    next_cursor = String()
+
+
+class FacetCountType(ObjectType):
+    value = String()
+    count = Int()
+
+
+class PriceBucketCountType(ObjectType):
+    min_price = Int()
+    max_price = Int()
+    count = Int()
+
+
+class ArtFacetsType(ObjectType):
+    total_count = Int()
+    sale_status = List(FacetCountType)
+    orientation = List(FacetCountType)
+    size = List(FacetCountType)
+    medium = List(FacetCountType)
+    price = List(PriceBucketCountType)
+
+
 class SaleStatusInput(InputObjectType):
     all = InputField(Boolean)
     on_sale = InputField(Boolean)
@@ -111,6 +183,58 @@ class ArtSizeInput(InputObjectType):
     large = InputField(Boolean)
 
 
+def get_arts_filter(sale_status=None, size=None, orientation=None, price=None,
+                    medium=None, theme=None, style=None, technique=None):
+    arts_filter = {}
+
+    if sale_status:     # 필터 적용
+        sale_status_list = []
+        orientation_list = []
+        size_list = []
+
+        if sale_status['all'] is False:
+            if sale_status['on_sale'] is True:
+                sale_status_list.append(Art.ON_SALE)
+            if sale_status['sold_out'] is True:
+                sale_status_list.append(Art.SOLD_OUT)
+            if sale_status['not_for_sale'] is True:
+                sale_status_list.append(Art.NOT_FOR_SALE)
+            arts_filter['sale_status__in'] = sale_status_list
+
+        if orientation['all'] is False:
+            if orientation['landscape'] is True:
+                orientation_list.append(Art.LANDSCAPE)
+            if orientation['portrait'] is True:
+                orientation_list.append(Art.PORTRAIT)
+            if orientation['square'] is True:
+                orientation_list.append(Art.SQUARE)
+            if orientation['etc'] is True:
+                orientation_list.append(Art.ETC_ORIENTATION)
+            arts_filter['orientation__in'] = orientation_list
+
+        if size['all'] is False:
+            if size['small'] is True:
+                size_list.append(Art.SMALL)
+            if size['medium'] is True:
+                size_list.append(Art.MEDIUM)
+            if size['large'] is True:
+                size_list.append(Art.LARGE)
+            arts_filter['size__in'] = size_list
+
+        if medium != 'all':
+            arts_filter['medium'] = medium
+        if style != 'all':
+            arts_filter['style'] = style
+        if technique != 'all':
+            arts_filter['technique'] = technique
+        if theme != 'all':
+            arts_filter['theme'] = theme
+
+        arts_filter['price__range'] = price
+
+    return arts_filter
+
+
 class Query(ObjectType):
     art = Field(ArtType, art_id=ID())
     art_options = Field(ArtOptions, medium_id=ID())
@@ -119,12 +243,21 @@ class Query(ObjectType):
                 orientation=Argument(OrientationInput), size=Argument(ArtSizeInput),
                 price=List(Int), medium=String(), style=String(),
                 technique=String(), theme=String(), ordering_priority=List(String))
+    arts_by_cursor = Field(ArtCursorConnection, cursor=String(),
+                           page_size=Int(), sale_status=Argument(SaleStatusInput),
+                           orientation=Argument(OrientationInput), size=Argument(ArtSizeInput),
+                           price=List(Int), medium=String(), style=String(),
+                           technique=String(), theme=String(), ordering_priority=List(String))
+    art_facets = Field(ArtFacetsType, sale_status=Argument(SaleStatusInput),
+                       orientation=Argument(OrientationInput), size=Argument(ArtSizeInput),
+                       price=List(Int), medium=String(), style=String(),
+                       technique=String(), theme=String())
     arts_by_artist = List(ArtType, artist_id=ID(), last_art_id=ID())
     current_user_arts_offset_based = Field(
         ArtConnection, page=Int(), page_size=Int())
     user_liking_arts = Field(ArtLikeType, user_id=ID(required=True),
                              last_like_id=ID())
-    search_arts = Field(CursorBasedArts, last_id=ID(),
+    search_arts = Field(CursorBasedArts, last_id=ID(), cursor=String(),
                         word=String(required=True))
 
     def resolve_art(self, info, art_id):
@@ -134,10 +267,10 @@ class Query(ObjectType):
         if medium_id is None:
             return None
 
-        themes = Theme.objects.filter(medium=medium_id).order_by('name')
-        styles = Style.objects.filter(medium=medium_id).order_by('name')
-        techniques = Technique.objects.filter(
-            medium=medium_id).order_by('name')
+        taxonomy = get_taxonomy()
+        themes = taxonomy.filter(Theme, medium_id)
+        styles = taxonomy.filter(Style, medium_id)
+        techniques = taxonomy.filter(Technique, medium_id)
 
         return ArtOptions(
             themes=themes,
@@ -150,74 +283,54 @@ class Query(ObjectType):
                      medium=None, theme=None, style=None, technique=None,
                      ordering_priority=None):
 
-        arts_filter = {}
-
-        if sale_status:     # 필터 적용
-            sale_status_list = []
-            orientation_list = []
-            size_list = []
-
-            if sale_status['all'] is False:
-                if sale_status['on_sale'] is True:
-                    sale_status_list.append(Art.ON_SALE)
-                if sale_status['sold_out'] is True:
-                    sale_status_list.append(Art.SOLD_OUT)
-                if sale_status['not_for_sale'] is True:
-                    sale_status_list.append(Art.NOT_FOR_SALE)
-                arts_filter['sale_status__in'] = sale_status_list
-
-            if orientation['all'] is False:
-                if orientation['landscape'] is True:
-                    orientation_list.append(Art.LANDSCAPE)
-                if orientation['portrait'] is True:
-                    orientation_list.append(Art.PORTRAIT)
-                if orientation['square'] is True:
-                    orientation_list.append(Art.SQUARE)
-                if orientation['etc'] is True:
-                    orientation_list.append(Art.ETC_ORIENTATION)
-                arts_filter['orientation__in'] = orientation_list
-
-            if size['all'] is False:
-                if size['small'] is True:
-                    size_list.append(Art.SMALL)
-                if size['medium'] is True:
-                    size_list.append(Art.MEDIUM)
-                if size['large'] is True:
-                    size_list.append(Art.LARGE)
-                arts_filter['size__in'] = size_list
-
-            if medium != 'all':
-                arts_filter['medium'] = medium
-            if style != 'all':
-                arts_filter['style'] = style
-            if technique != 'all':
-                arts_filter['technique'] = technique
-            if theme != 'all':
-                arts_filter['theme'] = theme
-
-            arts_filter['price__range'] = price
+        arts_filter = get_arts_filter(sale_status, size, orientation, price,
+                                      medium, theme, style, technique)
 
         arts = Art.objects.filter(**arts_filter)
 
-        if not arts:
+        if not arts.exists():
             return None
 
         if ordering_priority is None:
             ordering_priority = ['-id']
 
-        return arts.order_by(*ordering_priority)[page*page_size:(page + 1)*page_size]
+        return optimize(arts.order_by(*ordering_priority), info)[
+            page*page_size:(page + 1)*page_size]
+
+    def resolve_arts_by_cursor(self, info, cursor=None, page_size=20,
+                               sale_status=None, size=None, orientation=None, price=None,
+                               medium=None, theme=None, style=None, technique=None,
+                               ordering_priority=None):
+        arts_filter = get_arts_filter(sale_status, size, orientation, price,
+                                      medium, theme, style, technique)
+        ordering = get_ordering(ordering_priority, ART_ORDERING_FIELDS)
+
+        arts, next_cursor = paginate_by_cursor(
+            optimize(Art.objects.filter(**arts_filter), info, 'arts',
+                     fields=[field.lstrip('-') for field in ordering]),
+            ordering, cursor, page_size)
+
+        return {
+            'arts': arts,
+            'next_cursor': next_cursor,
+        }
+
+    def resolve_art_facets(self, info, sale_status=None, size=None, orientation=None,
+                           price=None, medium=None, theme=None, style=None, technique=None):
+        return get_art_facets(get_arts_filter(sale_status, size, orientation, price,
+                                              medium, theme, style, technique))
 
     def resolve_arts_by_artist(self, info, artist_id, last_art_id=None):
         arts = Art.objects.filter(artist_id=artist_id)
 
-        if not arts:
+        if not arts.exists():
             return None
 
         arts_filter = {}
         if last_art_id:
             arts_filter = {'id__lt': last_art_id}
 
-        return arts.filter(**arts_filter).order_by('-id')[:20]
+        return optimize(arts.filter(**arts_filter).order_by('-id'), info)[:20]
 
     def resolve_current_user_arts_offset_based(self, info, page=0, page_size=10):
         user = info.context.user
@@ -227,7 +340,8 @@ class Query(ObjectType):
         arts = Art.objects.filter(artist__user=user)
 
         return {
-            'arts': arts.order_by('-id')[page*page_size:(page + 1)*page_size],
+            'arts': optimize(arts.order_by('-id'), info, 'arts')[
+                page*page_size:(page + 1)*page_size],
             'total_count': arts.count(),
         }
 
@@ -243,33 +357,60 @@ class Query(ObjectType):
         like_instances = like_instances.filter(
             **like_filter).order_by('-id')[:20]
 
+        # 좋아요한 순서대로 작품을 한 번에 가져온다.
+        arts = optimize(Art.objects.all(), info, 'arts').in_bulk(
+            [like.art_id for like in like_instances])
+
         return {
             'id': user_id,
             'last_like_id': like_instances[len(like_instances) - 1].id if like_instances else None,
-            'arts': [like.art for like in like_instances],
+            'arts': [arts[like.art_id] for like in like_instances if like.art_id in arts],
         }
 
-    def resolve_search_arts(self, info, word, last_id=None):
+    def resolve_search_arts(self, info, word, last_id=None, cursor=None):
         if not word:
             return None
 
-        arts = Art.objects.filter(name__icontains=word)
-        if not arts:
+        arts = search(Art.objects.all(), ['name'], word)
+        if not arts.exists():
             return None
 
-        arts_filter = {'id__lt': last_id} if last_id else {}
+        if cursor is None:  # 이전 클라이언트: id 순서로 lastId 다음부터 조회
+            arts_filter = {'id__lt': last_id} if last_id else {}
+            arts = optimize(arts.filter(**arts_filter).order_by('-id'), info, 'arts')[:20]
 
-        arts = arts.filter(**arts_filter).order_by('-id')[:20]
+            return {
+                'last_id': arts[len(arts) - 1].id if arts else None,
+                'arts': arts,
+            }
+
+        # cursor 를 넘기면(첫 페이지는 빈 문자열) 유사도 순으로 정렬하고 nextCursor 로 이어서 조회한다.
+        arts, next_cursor = paginate_by_cursor(
+            optimize(rank(arts, ['name'], word), info, 'arts'),
+            SEARCH_ORDERING, cursor, 20)
 
         return {
-            'last_id': arts[len(arts) - 1].id if arts else None,
+            'last_id': arts[-1].id if arts else None,
+            'next_cursor': next_cursor,
             'arts': arts,
         }
 
 
+def validate_taxonomy(style, technique, theme):
+    taxonomy = get_taxonomy()
+    if not taxonomy.exists(Style, style):
+        return '존재하지 않는 스타일입니다.'
+    if not taxonomy.exists(Technique, technique):
+        return '존재하지 않는 기법입니다.'
+    if not taxonomy.exists(Theme, theme):
+        return '존재하지 않는 주제입니다.'
+    return None
+
+
 class CreateArt(Mutation):
     class Arguments:
-        art_images = Upload(required=True)
+        art_images = Upload()
+        image_file_ids = List(ID)
         description = String(required=True)
         width = Int(required=True)
         height = Int(required=True)
@@ -286,43 +427,53 @@ class CreateArt(Mutation):
     success = Boolean()
     msg = String()
 
-    @transaction.atomic
-    def mutate(self, info, art_images, description, width,
+    def mutate(self, info, description, width,
                height, is_framed, medium, name,
-               sale_status, style, technique, theme, price=None, delivery_fee=None):
+               sale_status, style, technique, theme, price=None, delivery_fee=None,
+               art_images=None, image_file_ids=None):
         current_user = info.context.user
 
-        for image in art_images:
-            validate_image = validate_file(image, File.BUCKET_ASSETS)
-            if validate_image['status'] == 'fail':
-                return CreateArt(success=False, msg=validate_image['msg'])
-
-        image_file_ids = []
-
-        for image in art_images:
-            image_file = create_file(image, File.BUCKET_ASSETS, current_user)
-            if image_file['status'] == 'fail':
-                return CreateArt(success=False, msg=image_file['msg'])
-            image_file_ids.append(image_file['instance'].id)
-
-        Art.objects.create(
-            artist=current_user.artist,
-            images=image_file_ids,
-            description=description,
-            width=width,
-            height=height,
-            size=calculate_art_size(width, height),
-            is_framed=is_framed,
-            medium=medium,
-            name=name,
-            orientation=calculate_orientation(width, height),
-            price=price if price else 0,
-            delivery_fee=delivery_fee if delivery_fee else 0,
-            sale_status=sale_status,
-            style=Style.objects.get(id=style),
-            technique=Technique.objects.get(id=technique),
-            theme=Theme.objects.get(id=theme),
-        )
+        if not art_images and not image_file_ids:
+            return CreateArt(success=False, msg="작품 이미지를 등록해주세요.")
+
+        taxonomy_msg = validate_taxonomy(style, technique, theme)
+        if taxonomy_msg:
+            return CreateArt(success=False, msg=taxonomy_msg)
+
+        if image_file_ids:
+            # requestUploadSlots / confirmUploads 로 미리 올린 파일
+            image_files = get_user_files(image_file_ids, current_user)
+        else:
+            for image in art_images:
+                validate_image = validate_file(image, File.BUCKET_ASSETS)
+                if validate_image['status'] == 'fail':
+                    return CreateArt(success=False, msg=validate_image['msg'])
+
+            # 업로드는 트랜잭션 밖에서 병렬로 처리한다.
+            image_files = create_files(art_images, File.BUCKET_ASSETS, current_user)
+
+        if image_files['status'] == 'fail':
+            return CreateArt(success=False, msg=image_files['msg'])
+
+        with transaction.atomic():
+            art = Art.objects.create(
+                artist=current_user.artist,
+                description=description,
+                width=width,
+                height=height,
+                size=calculate_art_size(width, height),
+                is_framed=is_framed,
+                medium=medium,
+                name=name,
+                orientation=calculate_orientation(width, height),
+                price=price if price else 0,
+                delivery_fee=delivery_fee if delivery_fee else 0,
+                sale_status=sale_status,
+                style_id=style,
+                technique_id=technique,
+                theme_id=theme,
+            )
+            set_art_images(art.id, [image_file.id for image_file in image_files['instances']])
 
         return CreateArt(success=True)
 
@@ -356,23 +507,40 @@ class UpdateArt(Mutation):
         if info.context.user.id != art.get().artist.user.id:
             return UpdateArt(success=False, msg="작품을 수정할 권한이 없습니다.")
 
-        art.update(
-            images=art_images,
-            description=description,
-            width=width,
-            height=height,
-            size=calculate_art_size(width, height),
-            is_framed=is_framed,
-            medium=medium,
-            name=name,
-            orientation=calculate_orientation(width, height),
-            price=price if price else 0,
-            delivery_fee=delivery_fee if delivery_fee else 0,
-            sale_status=sale_status,
-            style=Style.objects.get(id=style),
-            technique=Technique.objects.get(id=technique),
-            theme=Theme.objects.get(id=theme),
-        )
+        taxonomy_msg = validate_taxonomy(style, technique, theme)
+        if taxonomy_msg:
+            return UpdateArt(success=False, msg=taxonomy_msg)
+
+        # 이미 이 작품에 붙어 있는 이미지는 그대로 두고, 새로 붙이는 파일은 본인이 올린 파일인지 확인한다.
+        # (user 를 저장하기 전에 올린 예전 파일도 수정할 때 그대로 쓸 수 있다.)
+        current_file_ids = set(
+            ArtImage.objects.filter(art_id=art_id).values_list('file_id', flat=True))
+        image_files = get_user_files([
+            file_id for file_id in art_images
+            if not (str(file_id).isdigit() and int(file_id) in current_file_ids)
+        ], info.context.user)
+        if image_files['status'] == 'fail':
+            return UpdateArt(success=False, msg=image_files['msg'])
+        image_file_ids = [int(file_id) for file_id in art_images]
+
+        with transaction.atomic():
+            art.update(
+                description=description,
+                width=width,
+                height=height,
+                size=calculate_art_size(width, height),
+                is_framed=is_framed,
+                medium=medium,
+                name=name,
+                orientation=calculate_orientation(width, height),
+                price=price if price else 0,
+                delivery_fee=delivery_fee if delivery_fee else 0,
+                sale_status=sale_status,
+                style_id=style,
+                technique_id=technique,
+                theme_id=theme,
+            )
+            set_art_images(art_id, image_file_ids)
 
         return UpdateArt(success=True)
 
@@ -405,10 +573,7 @@ class LikeArt(Mutation):
         if user.is_anonymous:
             return LikeArt(success=False)
 
-        art = Art.objects.get(id=art_id)
-        Like.objects.create(user=user, art=art)
-        art.like_count += 1
-        art.save()
+        add_like(Like, 'art', user.id, art_id)
 
         return LikeArt(success=True)
 
@@ -424,20 +589,36 @@ class CancelLikeArt(Mutation):
         if user.is_anonymous:
             return CancelLikeArt(success=False)
 
-        art = Art.objects.get(id=art_id)
-        like = Like.objects.filter(user=user, art=art)
-        like.delete()
-
-        if art.like_count > 0:
-            art.like_count -= 1
-            art.save()
+        remove_like(Like, 'art', user.id, art_id)
 
         return CancelLikeArt(success=True)
 
 
+class ReserveArt(Mutation):
+    class Arguments:
+        art_id = ID(required=True)
+
+    success = Boolean()
+    msg = String()
+    reserved_until = DateTime()
+
+    def mutate(self, info, art_id):
+        user = info.context.user
+        if user.is_anonymous:
+            return ReserveArt(success=False, msg="로그인이 필요합니다.")
+
+        result_of_reserve, msg_or_reserved_until = reserve_art(art_id, user)
+
+        if result_of_reserve is False:
+            return ReserveArt(success=False, msg=msg_or_reserved_until)
+
+        return ReserveArt(success=True, reserved_until=msg_or_reserved_until)
+
+
 class Mutation(ObjectType):
     create_art = CreateArt.Field()
     update_art = UpdateArt.Field()
     delete_art = DeleteArt.Field()
     like_art = LikeArt.Field()
     cancel_like_art = CancelLikeArt.Field()
+    reserve_art = ReserveArt.Field()
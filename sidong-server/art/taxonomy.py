@@ -0,0 +1,61 @@
+import threading
+import time
+from django.conf import settings
+from django.db import transaction
+from art.models import Theme, Style, Technique
+
+TAXONOMY_MODELS = (Theme, Style, Technique)
+
+_lock = threading.Lock()
+_registry = None
+
+
+class TaxonomyRegistry(object):
+    # Theme / Style / Technique 전체를 (id, name, medium) 튜플로 들고 있는다.
+    def __init__(self):
+        self.loaded_at = time.monotonic()
+        self.rows = {}
+        self.ids = {}
+        for model in TAXONOMY_MODELS:
+            rows = tuple(model.objects.order_by(
+                'medium', 'name').values_list('id', 'name', 'medium'))
+            self.rows[model] = rows
+            self.ids[model] = frozenset(row[0] for row in rows)
+
+    def is_expired(self):
+        return time.monotonic() - self.loaded_at > settings.TAXONOMY_MAX_AGE
+
+    def filter(self, model, medium):
+        medium = int(medium)
+        return [
+            model(id=id, name=name, medium=row_medium)
+            for id, name, row_medium in self.rows[model] if row_medium == medium
+        ]
+
+    def exists(self, model, id):
+        try:
+            return int(id) in self.ids[model]
+        except (TypeError, ValueError):
+            return False
+
+
+def get_taxonomy():
+    global _registry
+    registry = _registry
+    if registry is None or registry.is_expired():
+        with _lock:
+            registry = _registry
+            if registry is None or registry.is_expired():
+                registry = TaxonomyRegistry()
+                _registry = registry
+    return registry
+
+
+def clear_taxonomy():
+    global _registry
+    _registry = None
+
+
+def invalidate_taxonomy(using=None, **kwargs):
+    # commit 전에 비우면 다른 요청이 아직 바뀌기 전의 행을 다시 읽어서 TAXONOMY_MAX_AGE 동안 들고 있게 된다.
+    transaction.on_commit(clear_taxonomy, using=using)
@@ -1,3 +1,254 @@
-from django.test import TestCase
+import datetime
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from art.models import Art, ArtImage, Like, Style, Technique, Theme, set_art_images
+from art.reservations import release_expired_reservations, reserve_art
+from art.taxonomy import clear_taxonomy, get_taxonomy
+from file.models import File
+from user.models import Artist
+from sidong_server.likes import add_like, reconcile_like_count, remove_like
+from sidong_server.pagination import InvalidCursor, MAX_PAGE_SIZE, paginate_by_cursor
+from sidong_server.schema import schema
 
-# Create your tests here.
+
+def create_art(artist, **kwargs):
+    return Art.objects.create(artist=artist, name='작품', size=Art.SMALL, **kwargs)
+
+
+class CursorPaginationTest(TestCase):
+    def setUp(self):
+        self.artist = Artist.objects.create(artist_name='작가', real_name='작가')
+        created_at = timezone.now().replace(microsecond=123000)
+        self.arts = [create_art(self.artist) for _ in range(5)]
+        # 같은 밀리초 안에서 마이크로초만 다른 created_at
+        for i, art in enumerate(self.arts):
+            Art.objects.filter(id=art.id).update(
+                created_at=created_at + datetime.timedelta(microseconds=i * 100))
+
+    def paginate_all(self, ordering, page_size):
+        ids = []
+        cursor = None
+        while True:
+            arts, cursor = paginate_by_cursor(Art.objects.all(), ordering, cursor, page_size)
+            ids.extend(art.id for art in arts)
+            if cursor is None:
+                return ids
+
+    def test_created_at_cursor_keeps_microseconds(self):
+        for ordering in (['-created_at', '-id'], ['created_at', '-id']):
+            ids = self.paginate_all(ordering, 1)
+            expected = list(Art.objects.order_by(*ordering).values_list('id', flat=True))
+            self.assertEqual(ids, expected)
+
+    def test_cursor_is_tied_to_ordering(self):
+        _, cursor = paginate_by_cursor(Art.objects.all(), ['-created_at', '-id'], None, 2)
+        with self.assertRaises(InvalidCursor):
+            paginate_by_cursor(Art.objects.all(), ['price', '-id'], cursor, 2)
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(InvalidCursor):
+            paginate_by_cursor(Art.objects.all(), ['-id'], 'not-a-cursor', 2)
+
+    def test_page_size_is_capped(self):
+        for _ in range(MAX_PAGE_SIZE):
+            create_art(self.artist)
+        arts, cursor = paginate_by_cursor(Art.objects.all(), ['-id'], None, 10000)
+        self.assertEqual(len(arts), MAX_PAGE_SIZE)
+        self.assertIsNotNone(cursor)
+
+
+class LikeTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='liker@test.com')
+        self.art = create_art(Artist.objects.create(artist_name='작가', real_name='작가'))
+
+    def get_like_count(self):
+        return Art.objects.get(id=self.art.id).like_count
+
+    def test_like_is_counted_once(self):
+        self.assertTrue(add_like(Like, 'art', self.user.id, self.art.id))
+        self.assertFalse(add_like(Like, 'art', self.user.id, self.art.id))
+        self.assertEqual(self.get_like_count(), 1)
+        self.assertEqual(Like.objects.filter(art=self.art).count(), 1)
+
+    def test_unlike_is_counted_once(self):
+        add_like(Like, 'art', self.user.id, self.art.id)
+        self.assertTrue(remove_like(Like, 'art', self.user.id, self.art.id))
+        self.assertFalse(remove_like(Like, 'art', self.user.id, self.art.id))
+        self.assertEqual(self.get_like_count(), 0)
+
+    def test_reconcile_like_count(self):
+        add_like(Like, 'art', self.user.id, self.art.id)
+        Art.objects.filter(id=self.art.id).update(like_count=7)
+        self.assertEqual(reconcile_like_count(Like, 'art'), 1)
+        self.assertEqual(self.get_like_count(), 1)
+
+
+class TaxonomyInvalidationTest(TransactionTestCase):
+    def test_registry_is_cleared_after_commit(self):
+        registry = get_taxonomy()
+        with transaction.atomic():
+            theme = Theme.objects.create(name='풍경')
+            # commit 전에는 이전 registry 를 그대로 쓴다.
+            self.assertIs(get_taxonomy(), registry)
+        self.assertIsNot(get_taxonomy(), registry)
+        self.assertTrue(get_taxonomy().exists(Theme, theme.id))
+
+
+class ArtImagesQueryTest(TestCase):
+    QUERY = """
+        { currentUserArtsOffsetBased(pageSize: 20) {
+            arts { id images representativeImageUrl }
+        } }
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(username='artist@test.com')
+        self.artist = Artist.objects.create(user=self.user, artist_name='작가', real_name='작가')
+
+    def create_art_with_images(self, count):
+        art = create_art(self.artist)
+        files = [File.objects.create(path='p/{0}-{1}.jpg'.format(art.id, i),
+                                     content_type='image/jpeg') for i in range(count)]
+        set_art_images(art.id, [file.id for file in files])
+        return art, files
+
+    def execute(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        result = schema.execute(self.QUERY, context_value=request)
+        self.assertIsNone(result.errors)
+        return result.data['currentUserArtsOffsetBased']['arts']
+
+    def test_images_keep_their_order(self):
+        art, files = self.create_art_with_images(3)
+        set_art_images(art.id, [files[2].id, files[0].id])
+
+        arts = self.execute()
+
+        self.assertEqual(arts[0]['images'], [files[2].id, files[0].id])
+        self.assertTrue(arts[0]['representativeImageUrl'].endswith(files[2].path))
+
+    def test_query_count_does_not_grow_with_arts(self):
+        self.create_art_with_images(2)
+        with CaptureQueriesContext(connection) as queries:
+            self.execute()
+        query_count = len(queries)
+
+        for _ in range(5):
+            self.create_art_with_images(2)
+        with self.assertNumQueries(query_count):
+            self.execute()
+
+
+@override_settings(ART_RESERVATION_MINUTES=10, ART_RESERVATION_MAX_MINUTES=30)
+class ReservationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='buyer@test.com')
+        self.other_user = User.objects.create(username='other@test.com')
+        self.art = create_art(
+            Artist.objects.create(artist_name='작가', real_name='작가'),
+            sale_status=Art.ON_SALE)
+
+    def move_reservation(self, minutes):
+        # 예약 시간을 앞당겨서 시간이 흐른 것처럼 만든다.
+        delta = datetime.timedelta(minutes=minutes)
+        art = Art.objects.get(id=self.art.id)
+        Art.objects.filter(id=self.art.id).update(
+            reserved_at=art.reserved_at - delta, reserved_until=art.reserved_until - delta)
+
+    def test_only_one_user_holds_the_art(self):
+        self.assertTrue(reserve_art(self.art.id, self.user)[0])
+        self.assertFalse(reserve_art(self.art.id, self.other_user)[0])
+
+        self.move_reservation(11)
+        self.assertTrue(reserve_art(self.art.id, self.other_user)[0])
+
+    def test_extension_is_capped(self):
+        reserve_art(self.art.id, self.user)
+
+        # 8분마다 연장하면 처음 두 번은 10분씩 연장된다.
+        for _ in range(2):
+            self.move_reservation(8)
+            _, reserved_until = reserve_art(self.art.id, self.user)
+            self.assertGreater(
+                reserved_until, timezone.now() + datetime.timedelta(minutes=9))
+
+        # 처음 예약한 지 24분이 지나면 30분까지만 연장된다.
+        self.move_reservation(8)
+        _, reserved_until = reserve_art(self.art.id, self.user)
+        art = Art.objects.get(id=self.art.id)
+        self.assertEqual(reserved_until, art.reserved_at + datetime.timedelta(minutes=30))
+        self.assertLess(reserved_until, timezone.now() + datetime.timedelta(minutes=7))
+
+    def test_release_expired_reservations(self):
+        reserve_art(self.art.id, self.user)
+        self.assertEqual(release_expired_reservations(), 0)
+
+        self.move_reservation(11)
+        self.assertEqual(release_expired_reservations(), 1)
+        art = Art.objects.get(id=self.art.id)
+        self.assertEqual((art.reserved_by, art.reserved_at, art.reserved_until), (None, None, None))
+
+
+class UpdateArtImagesTest(TestCase):
+    MUTATION = """
+        mutation($artId: ID!, $artImages: [ID]!, $style: ID!, $technique: ID!, $theme: ID!) {
+            updateArt(artId: $artId, artImages: $artImages, description: "", width: 10,
+                      height: 10, isFramed: false, medium: "0", name: "작품", saleStatus: "0",
+                      style: $style, technique: $technique, theme: $theme) { success msg }
+        }
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(username='artist@test.com')
+        self.other_user = User.objects.create(username='other@test.com')
+        self.art = create_art(
+            Artist.objects.create(user=self.user, artist_name='작가', real_name='작가'))
+        # user 를 저장하기 전에 올린 예전 파일
+        self.legacy_file = File.objects.create(path='p/legacy.jpg', content_type='image/jpeg')
+        set_art_images(self.art.id, [self.legacy_file.id])
+        self.taxonomy = {
+            'style': Style.objects.create(name='스타일').id,
+            'technique': Technique.objects.create(name='기법').id,
+            'theme': Theme.objects.create(name='주제').id,
+        }
+        clear_taxonomy()
+
+    def create_file(self, user):
+        return File.objects.create(
+            path='p/{0}.jpg'.format(user.username), content_type='image/jpeg', user=user)
+
+    def update_art(self, art_images):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        result = schema.execute(self.MUTATION, context_value=request, variable_values=dict(
+            artId=self.art.id, artImages=art_images, **self.taxonomy))
+        self.assertIsNone(result.errors)
+        return result.data['updateArt']
+
+    def get_image_ids(self):
+        return list(ArtImage.objects.filter(art=self.art).values_list('file_id', flat=True))
+
+    def test_own_and_current_files(self):
+        own_file = self.create_file(self.user)
+
+        result = self.update_art([own_file.id, self.legacy_file.id])
+
+        self.assertTrue(result['success'])
+        self.assertEqual(self.get_image_ids(), [own_file.id, self.legacy_file.id])
+
+    def test_file_of_other_user_is_rejected(self):
+        result = self.update_art([self.create_file(self.other_user).id])
+
+        self.assertFalse(result['success'])
+        self.assertEqual(self.get_image_ids(), [self.legacy_file.id])
+
+    def test_malformed_file_id_is_rejected(self):
+        result = self.update_art(['not-an-id'])
+
+        self.assertFalse(result['success'])
+        self.assertEqual(self.get_image_ids(), [self.legacy_file.id])
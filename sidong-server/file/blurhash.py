@@ -0,0 +1,80 @@
+import math
+
+# https://github.com/woltapp/blurhash 알고리즘의 인코더 부분
+BASE83_CHARACTERS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+def encode_base83(value, length):
+    return ''.join(
+        BASE83_CHARACTERS[(value // (83 ** (length - i))) % 83] for i in range(1, length + 1))
+
+
+def srgb_to_linear(value):
+    value = value / 255
+    if value <= 0.04045:
+        return value / 12.92
+    return ((value + 0.055) / 1.055) ** 2.4
+
+
+def linear_to_srgb(value):
+    value = max(0.0, min(1.0, value))
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def sign_pow(value, exponent):
+    return math.copysign(abs(value) ** exponent, value)
+
+
+def encode_blurhash(image, x_components=4, y_components=3):
+    # image: 작게 줄인 RGB PIL 이미지 (32px 정도면 충분하다)
+    width, height = image.size
+    pixels = [tuple(srgb_to_linear(channel) for channel in pixel) for pixel in image.getdata()]
+
+    cos_x = [[math.cos(math.pi * i * x / width) for x in range(width)]
+             for i in range(x_components)]
+    cos_y = [[math.cos(math.pi * j * y / height) for y in range(height)]
+             for j in range(y_components)]
+
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            normalisation = 1 if i == 0 and j == 0 else 2
+            r = g = b = 0.0
+            for y in range(height):
+                row = y * width
+                basis_y = normalisation * cos_y[j][y]
+                for x in range(width):
+                    basis = basis_y * cos_x[i][x]
+                    pixel = pixels[row + x]
+                    r += basis * pixel[0]
+                    g += basis * pixel[1]
+                    b += basis * pixel[2]
+            scale = 1 / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+
+    blurhash = encode_base83((x_components - 1) + (y_components - 1) * 9, 1)
+
+    if ac:
+        actual_maximum = max(abs(value) for factor in ac for value in factor)
+        quantised_maximum = max(0, min(82, int(math.floor(actual_maximum * 166 - 0.5))))
+        maximum = (quantised_maximum + 1) / 166
+        blurhash += encode_base83(quantised_maximum, 1)
+    else:
+        maximum = 1
+        blurhash += encode_base83(0, 1)
+
+    blurhash += encode_base83(
+        (linear_to_srgb(dc[0]) << 16) + (linear_to_srgb(dc[1]) << 8) + linear_to_srgb(dc[2]), 4)
+
+    for factor in ac:
+        quantised = [
+            max(0, min(18, int(math.floor(sign_pow(value / maximum, 0.5) * 9 + 9.5))))
+            for value in factor
+        ]
+        blurhash += encode_base83(quantised[0] * 19 * 19 + quantised[1] * 19 + quantised[2], 2)
+
+    return blurhash
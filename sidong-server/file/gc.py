@@ -0,0 +1,150 @@
+import datetime
+from django.db import connection, transaction
+from django.utils import timezone
+from file.storage import StorageError, get_storage
+
+# 작품 이미지(ArtImage)와 작가 썸네일/대표 작품 어디에서도 쓰지 않는 파일을 찾는다.
+# 같은 경로(같은 내용)를 쓰는 다른 File 이 참조되고 있으면 그 파일도 남겨둔다.
+REFERENCED_FILES_SQL = """
+    SELECT file_id FROM {art_image_table}
+    UNION
+    SELECT thumbnail_id FROM {artist_table} WHERE thumbnail_id IS NOT NULL
+    UNION
+    SELECT representative_work_id FROM {artist_table} WHERE representative_work_id IS NOT NULL
+"""
+
+ORPHANED_FILES_SQL = """
+    WITH referenced AS ({referenced_files})
+    SELECT file.id, file.bucket, file.path, file.size
+    FROM {file_table} AS file
+    LEFT JOIN referenced ON referenced.file_id = file.id
+    WHERE referenced.file_id IS NULL
+      AND file.last_used_at < NOW() - %s * INTERVAL '1 hour'
+      AND NOT EXISTS (
+          SELECT 1 FROM {file_table} AS other
+          JOIN referenced AS other_referenced ON other_referenced.file_id = other.id
+          WHERE other.bucket = file.bucket AND other.path = file.path
+      )
+    ORDER BY file.id
+"""
+
+# 찾은 뒤에 참조되거나 다시 업로드된 파일이 있을 수 있어서 지울 때 다시 확인한다.
+DELETE_FILES_SQL = """
+    WITH referenced AS ({referenced_files})
+    DELETE FROM {file_table} AS file
+    WHERE file.id = ANY(%s)
+      AND file.last_used_at < NOW() - %s * INTERVAL '1 hour'
+      AND NOT EXISTS (SELECT 1 FROM referenced WHERE referenced.file_id = file.id)
+    RETURNING file.id, file.bucket, file.path
+"""
+
+DELETE_VARIANTS_SQL = """
+    DELETE FROM {variant_table} WHERE original_id = ANY(%s)
+    RETURNING original_id, bucket, path
+"""
+
+
+def get_gc_tables():
+    from art.models import ArtImage
+    from file.models import File, ImageVariant
+    from user.models import Artist
+
+    tables = {
+        'art_image_table': ArtImage._meta.db_table,
+        'artist_table': Artist._meta.db_table,
+        'file_table': File._meta.db_table,
+        'variant_table': ImageVariant._meta.db_table,
+    }
+    tables['referenced_files'] = REFERENCED_FILES_SQL.format(**tables)
+    return tables
+
+
+def find_orphaned_files(grace_hours):
+    with connection.cursor() as cursor:
+        cursor.execute(ORPHANED_FILES_SQL.format(**get_gc_tables()), [grace_hours])
+        return cursor.fetchall()
+
+
+def get_storage_keys(deleted_files, deleted_variants, surviving_paths):
+    # 같은 내용을 다른 File 이 아직 쓰고 있으면 그 원본과 리사이즈 이미지는 남긴다.
+    from file.models import ImageVariant, get_variant_path
+
+    deleted_paths = {
+        file_id: (bucket, path) for file_id, bucket, path in deleted_files
+        if (bucket, path) not in surviving_paths
+    }
+
+    keys_by_bucket = {}
+    for bucket, path in deleted_paths.values():
+        keys = keys_by_bucket.setdefault(bucket, set())
+        keys.add(path)
+        # variant 행이 없어도 만들다 만 객체가 남아 있을 수 있다.
+        keys.update(get_variant_path(path, size) for size in ImageVariant.MAX_EDGE_OF_SIZE)
+    for original_id, bucket, path in deleted_variants:
+        if original_id in deleted_paths:
+            keys_by_bucket.setdefault(bucket, set()).add(path)
+    return keys_by_bucket
+
+
+def delete_orphaned_files(file_ids, grace_hours):
+    # DB 에서 지운 행의 객체를 commit 하기 전에 저장소에서 지운다. 같은 내용을 다시 올리는
+    # 요청(create_files)은 지우는 행의 잠금을 기다리므로 commit 뒤에 새로 올린 객체를 지우지 않는다.
+    from file.models import File
+
+    tables = get_gc_tables()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(DELETE_FILES_SQL.format(**tables), [list(file_ids), grace_hours])
+        deleted_files = cursor.fetchall()
+        cursor.execute(DELETE_VARIANTS_SQL.format(**tables),
+                       [[file_id for file_id, _, _ in deleted_files]])
+        deleted_variants = cursor.fetchall()
+
+        surviving_paths = set(File.objects.filter(
+            path__in={path for _, _, path in deleted_files}).values_list('bucket', 'path'))
+
+        failed_paths = []
+        for bucket, keys in get_storage_keys(
+                deleted_files, deleted_variants, surviving_paths).items():
+            try:
+                get_storage().delete(sorted(keys), bucket)
+            except StorageError:
+                # 지우지 못한 객체는 보고만 하고 DB 정리는 그대로 commit 한다.
+                failed_paths.extend(sorted(keys))
+
+    return len(deleted_files), failed_paths
+
+
+def find_expired_upload_slots(grace_hours):
+    from file.models import PendingUpload
+
+    # confirmUploads 하지 않은 채 유예 기간이 지난 업로드 slot
+    return list(PendingUpload.objects.filter(
+        created_at__lt=timezone.now() - datetime.timedelta(hours=grace_hours),
+    ).order_by('id').values_list('id', 'bucket', 'path'))
+
+
+def expire_upload_slots(slots):
+    # 저장소에서 먼저 지우고, 지운 slot 만 DB 에서 지운다. (실패한 slot 은 다음 gc 때 다시 시도한다.)
+    from file.models import File, PendingUpload
+
+    slot_ids_by_bucket = {}
+    paths_by_bucket = {}
+    for slot_id, bucket, path in slots:
+        slot_ids_by_bucket.setdefault(bucket, []).append(slot_id)
+        paths_by_bucket.setdefault(bucket, set()).add(path)
+
+    expired_count = 0
+    failed_paths = []
+    for bucket, paths in paths_by_bucket.items():
+        # 이미 File 로 등록된 객체는 지우지 않는다.
+        paths -= set(File.objects.filter(
+            bucket=bucket, path__in=paths).values_list('path', flat=True))
+        try:
+            get_storage().delete(sorted(paths), bucket)
+        except StorageError:
+            failed_paths.extend(paths)
+            continue
+        expired_count += PendingUpload.objects.filter(
+            id__in=slot_ids_by_bucket[bucket]).delete()[0]
+
+    return expired_count, failed_paths
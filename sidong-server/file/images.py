@@ -0,0 +1,116 @@
+import warnings
+from io import BytesIO
+from PIL import Image, ImageOps
+from django.conf import settings
+from file.blurhash import encode_blurhash
+
+CONTENT_TYPE_OF_FORMAT = {
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+}
+
+# (파일 앞부분, format) - 확장자나 클라이언트가 보낸 content type 대신 실제 내용으로 판단한다.
+IMAGE_SIGNATURES = [
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+]
+
+# Pillow 도 이 값의 2배가 넘는 이미지는 decode 하지 않는다. (decompression bomb)
+Image.MAX_IMAGE_PIXELS = settings.MAX_IMAGE_PIXELS
+
+EXTENSION_OF_FORMAT = {
+    'WEBP': 'webp',
+    'JPEG': 'jpg',
+}
+
+
+def sniff_image_format(signature):
+    for prefix, image_format in IMAGE_SIGNATURES:
+        if signature.startswith(prefix):
+            return image_format
+    if signature[:4] == b'RIFF' and signature[8:12] == b'WEBP':
+        return 'WEBP'
+    return None
+
+
+def read_image_header(file):
+    # 픽셀은 decode 하지 않고 header 만 읽어서 (format, width, height) 를 돌려준다.
+    file.seek(0)
+    image_format = sniff_image_format(file.read(16))
+    file.seek(0)
+    if image_format is None:
+        return None, None, None
+
+    try:
+        # 픽셀 수는 호출하는 쪽(validate_file)에서 직접 확인한다.
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+            width, height = Image.open(file, formats=[image_format]).size
+    finally:
+        file.seek(0)
+    return image_format, width, height
+
+
+# EXIF Orientation 이 이 값들이면 90도 회전된 사진이라 가로/세로가 바뀐다.
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+EXIF_ORIENTATION_TAG = 0x0112
+
+PLACEHOLDER_SIZE = 32
+
+
+def get_image_metadata(file):
+    # 크기는 header 만 읽어서 구하고, 색/blurhash 는 작게 줄여서 decode 한 이미지로 계산한다.
+    file.seek(0)
+    image = Image.open(file)
+    width, height = image.size
+    if image.getexif().get(EXIF_ORIENTATION_TAG) in TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+
+    # JPEG 은 draft 로 1/2~1/8 크기로 바로 decode 해서 전체 이미지를 풀지 않는다.
+    image.draft('RGB', (PLACEHOLDER_SIZE * 4, PLACEHOLDER_SIZE * 4))
+    placeholder = ImageOps.exif_transpose(image).convert('RGB')
+    placeholder.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    file.seek(0)
+
+    return {
+        'width': width,
+        'height': height,
+        'dominant_color': get_dominant_color(placeholder),
+        'blurhash': encode_blurhash(placeholder),
+    }
+
+
+def get_dominant_color(image):
+    palette_image = image.quantize(colors=8)
+    palette = palette_image.getpalette()
+    _, index = max(palette_image.getcolors())
+    return '#{0:02x}{1:02x}{2:02x}'.format(*palette[index * 3:index * 3 + 3])
+
+
+def open_image(file):
+    file.seek(0)
+    image = Image.open(file)
+    # 휴대폰 사진은 EXIF 회전 정보를 반영해야 세로 사진이 눕지 않는다.
+    image = ImageOps.exif_transpose(image)
+    image.load()
+    return image
+
+
+def render_variant(image, max_edge):
+    image_format = settings.IMAGE_VARIANT_FORMAT
+    variant = image.copy()
+    variant.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+    if image_format == 'JPEG' and variant.mode != 'RGB':
+        variant = variant.convert('RGB')
+    elif variant.mode not in ('RGB', 'RGBA'):
+        variant = variant.convert('RGBA' if 'transparency' in variant.info or
+                                  variant.mode.endswith('A') else 'RGB')
+
+    output = BytesIO()
+    variant.save(output, image_format, quality=settings.IMAGE_VARIANT_QUALITY)
+    return output.getvalue(), variant.width, variant.height
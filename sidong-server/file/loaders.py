@@ -0,0 +1,78 @@
+import copy
+from promise import Promise
+from promise.dataloader import DataLoader
+from file.models import File, ImageVariant
+
+
+class FileLoader(DataLoader):
+    def batch_load_fn(self, file_ids):
+        files = File.objects.in_bulk(file_ids)
+        return Promise.resolve([files.get(file_id) for file_id in file_ids])
+
+
+class ImageVariantLoader(DataLoader):
+    def batch_load_fn(self, keys):
+        variants = {
+            (variant.original_id, variant.size): variant
+            for variant in ImageVariant.objects.filter(
+                original_id__in={file_id for file_id, _ in keys},
+                size__in={size for _, size in keys},
+            )
+        }
+        return Promise.resolve([variants.get(key) for key in keys])
+
+
+def get_file_loader(info):
+    # 요청(request) 단위로 하나의 loader 를 공유해서 File 조회를 한 번의 쿼리로 묶는다.
+    loader = getattr(info.context, 'file_loader', None)
+    if loader is None:
+        loader = FileLoader()
+        info.context.file_loader = loader
+    return loader
+
+
+def with_image_size(file_instance, size):
+    # loader 가 캐시한 인스턴스를 공유하므로 복사본에 요청한 size 를 붙인다. (FileType.url 에서 사용)
+    if file_instance is None:
+        return None
+    file_instance = copy.copy(file_instance)
+    file_instance.image_size = size
+    return file_instance
+
+
+def load_file(info, file_id, size=None):
+    if file_id is None:
+        return None
+    promise = get_file_loader(info).load(int(file_id))
+    if size is None:
+        return promise
+    return promise.then(lambda file_instance: with_image_size(file_instance, size))
+
+
+def load_files(info, file_ids):
+    return get_file_loader(info).load_many([int(file_id) for file_id in file_ids])
+
+
+def get_image_variant_loader(info):
+    loader = getattr(info.context, 'image_variant_loader', None)
+    if loader is None:
+        loader = ImageVariantLoader()
+        info.context.image_variant_loader = loader
+    return loader
+
+
+def get_file_url(info, file_instance, size=None):
+    # size 에 맞는 리사이즈 이미지가 없으면 원본 URL 을 돌려준다.
+    if file_instance is None:
+        return None
+    if size not in ImageVariant.MAX_EDGE_OF_SIZE:
+        return file_instance.url
+    return get_image_variant_loader(info).load((file_instance.id, size)).then(
+        lambda variant: variant.url if variant else file_instance.url)
+
+
+def load_file_url(info, file_id, size=None):
+    if file_id is None:
+        return None
+    return load_file(info, file_id).then(
+        lambda file_instance: get_file_url(info, file_instance, size))
@@ -0,0 +1,50 @@
+import time
+from django.core.management.base import BaseCommand
+from file.models import File, create_image_variants
+
+
+class Command(BaseCommand):
+    help = '업로드 후 아직 처리되지 않은 이미지 파일의 리사이즈 이미지(variant)와 메타데이터를 만듭니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument(
+            '--limit', type=int, default=None, help='처리할 최대 파일 수')
+        parser.add_argument(
+            '--interval', type=int, default=None,
+            help='지정하면 종료하지 않고 이 간격(초)마다 새로 올라온 파일을 처리합니다.')
+
+    def handle(self, *args, **options):
+        while True:
+            self.process_pending_files(options['batch_size'], options['limit'])
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
+
+    def process_pending_files(self, batch_size, limit):
+        files = File.objects.filter(processed_at__isnull=True).order_by('id')
+
+        last_id = 0
+        processed_count = 0
+        variant_count = 0
+
+        while limit is None or processed_count < limit:
+            size = batch_size if limit is None else min(batch_size, limit - processed_count)
+
+            batch = list(files.filter(id__gt=last_id)[:size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            # 원본을 읽지 못한 파일은 processed_at 이 비어 있는 채로 남아 다음에 다시 시도한다.
+            processed_files, variants = create_image_variants(batch)
+            for file_instance in batch:
+                if file_instance not in processed_files:
+                    self.stderr.write('could not read file {0}: {1}'.format(
+                        file_instance.id, file_instance.path))
+
+            processed_count += len(batch)
+            variant_count += len(variants)
+
+            self.stdout.write('{0} files processed, {1} variants created'.format(
+                processed_count, variant_count))
@@ -0,0 +1,55 @@
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from file.models import File, get_upload_executor, read_image_metadata
+from file.storage import StorageError, get_storage
+
+METADATA_FIELDS = ['width', 'height', 'dominant_color', 'blurhash', 'size']
+
+
+def read_stored_image_metadata(file_instance):
+    try:
+        content = get_storage().read(file_instance.path, file_instance.bucket)
+    except StorageError:
+        return None
+    metadata = read_image_metadata(ContentFile(content), file_instance.content_type)
+    metadata['size'] = len(content)
+    return metadata
+
+
+class Command(BaseCommand):
+    help = '크기/대표 색/blurhash 가 없는 기존 이미지 파일의 메타데이터를 채웁니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        files = File.objects.filter(
+            content_type__startswith='image/', blurhash__isnull=True).order_by('id')
+
+        last_id = 0
+        updated_count = 0
+        failed_count = 0
+
+        while True:
+            batch = list(files.filter(id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            updated_files = []
+            for file_instance, metadata in zip(
+                    batch, get_upload_executor().map(read_stored_image_metadata, batch)):
+                if not metadata or 'blurhash' not in metadata:
+                    failed_count += 1
+                    self.stderr.write('could not read image {0}: {1}'.format(
+                        file_instance.id, file_instance.path))
+                    continue
+                for field, value in metadata.items():
+                    setattr(file_instance, field, value)
+                updated_files.append(file_instance)
+
+            File.objects.bulk_update(updated_files, METADATA_FIELDS)
+            updated_count += len(updated_files)
+
+            self.stdout.write('{0} files updated, {1} failed'.format(
+                updated_count, failed_count))
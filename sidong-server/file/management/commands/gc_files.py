@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from file.gc import delete_orphaned_files, expire_upload_slots, find_expired_upload_slots, \
+    find_orphaned_files
+
+
+def format_size(size):
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024:
+            return '{0:.1f}{1}'.format(size, unit)
+        size /= 1024
+    return '{0:.1f}TB'.format(size)
+
+
+class Command(BaseCommand):
+    help = '작품/작가 어디에서도 쓰지 않는 파일과 확인하지 않은 업로드를 DB 와 저장소에서 지웁니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=int, default=24,
+            help='이 시간 안에 만들었거나 다시 업로드한 파일은 아직 작품/작가에 연결 중일 수 있어서 지우지 않습니다.')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run', action='store_true', help='지울 파일 수와 용량만 보여줍니다.')
+
+    def handle(self, *args, **options):
+        expired_slots = find_expired_upload_slots(options['grace_hours'])
+        orphaned_files = find_orphaned_files(options['grace_hours'])
+        total_size = sum(size for _, _, _, size in orphaned_files if size)
+        unknown_size_count = sum(1 for _, _, _, size in orphaned_files if size is None)
+
+        self.stdout.write('{0} orphaned files, {1}{2}'.format(
+            len(orphaned_files), format_size(total_size),
+            ' (+{0} files without size)'.format(unknown_size_count) if unknown_size_count else ''))
+        self.stdout.write('{0} expired upload slots'.format(len(expired_slots)))
+
+        if options['dry_run']:
+            for file_id, bucket, path, size in orphaned_files[:20]:
+                self.stdout.write('  {0} {1}/{2} {3}'.format(
+                    file_id, bucket, path, format_size(size) if size else '-'))
+            return
+
+        deleted_count = 0
+        chunk_size = options['chunk_size']
+        for i in range(0, len(orphaned_files), chunk_size):
+            chunk = orphaned_files[i:i + chunk_size]
+            count, failed_paths = delete_orphaned_files(
+                [file_id for file_id, _, _, _ in chunk], options['grace_hours'])
+            deleted_count += count
+            for path in failed_paths:
+                self.stderr.write('could not delete object: ' + path)
+
+        self.stdout.write('{0} files deleted'.format(deleted_count))
+
+        expired_count = 0
+        for i in range(0, len(expired_slots), chunk_size):
+            count, failed_paths = expire_upload_slots(expired_slots[i:i + chunk_size])
+            expired_count += count
+            for path in failed_paths:
+                self.stderr.write('could not delete object: ' + path)
+
+        self.stdout.write('{0} upload slots expired'.format(expired_count))
@@ -0,0 +1,64 @@
+import hashlib
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, transaction
+from file.models import File, get_upload_executor
+from file.storage import StorageError, get_storage
+
+
+def hash_stored_file(file_instance):
+    try:
+        content = get_storage().read(file_instance.path, file_instance.bucket)
+    except StorageError:
+        return None
+    return hashlib.sha256(content).hexdigest(), len(content)
+
+
+class Command(BaseCommand):
+    help = 'sha256 이 없는 기존 파일의 내용을 읽어서 sha256 과 size 를 채웁니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        files = File.objects.filter(sha256__isnull=True).order_by('id')
+
+        last_id = 0
+        hashed_count = 0
+        failed_count = 0
+
+        while True:
+            batch = list(files.filter(id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            # 저장소에서 병렬로 내려받아 해시를 계산한다.
+            hashed_files = []
+            for file_instance, result in zip(
+                    batch, get_upload_executor().map(hash_stored_file, batch)):
+                if result is None:
+                    failed_count += 1
+                    self.stderr.write('could not read file {0}: {1}'.format(
+                        file_instance.id, file_instance.path))
+                    continue
+                file_instance.sha256, file_instance.size = result
+                hashed_files.append(file_instance)
+
+            try:
+                with transaction.atomic():
+                    File.objects.bulk_update(hashed_files, ['sha256', 'size'])
+            except IntegrityError:
+                # 같은 사용자가 같은 내용을 여러 번 올린 파일은 먼저 올린 파일만 sha256 을 갖는다.
+                for file_instance in list(hashed_files):
+                    try:
+                        with transaction.atomic():
+                            file_instance.save(update_fields=['sha256', 'size'])
+                    except IntegrityError:
+                        File.objects.filter(id=file_instance.id).update(size=file_instance.size)
+                        hashed_files.remove(file_instance)
+                        self.stderr.write('duplicate content of file {0}: {1}'.format(
+                            file_instance.id, file_instance.path))
+            hashed_count += len(hashed_files)
+
+            self.stdout.write('{0} files hashed, {1} failed'.format(
+                hashed_count, failed_count))
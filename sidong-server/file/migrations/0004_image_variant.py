@@ -0,0 +1,32 @@
+# Generated by Django 2.2.10 on 2026-10-18 09:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file', '0003_auto_20210603_1044'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageVariant',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('size', models.CharField(choices=[('thumbnail', '썸네일'), ('card', '목록 카드'), ('detail', '상세 페이지')], max_length=16)),
+                ('bucket', models.CharField(choices=[('assets', '기본 버킷')], default='assets', max_length=8)),
+                ('path', models.CharField(max_length=256)),
+                ('content_type', models.CharField(max_length=32)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('original', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='file.File')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='imagevariant',
+            constraint=models.UniqueConstraint(fields=('original', 'size'), name='unique_image_variant'),
+        ),
+    ]
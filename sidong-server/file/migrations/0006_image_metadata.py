@@ -0,0 +1,33 @@
+# Generated by Django 2.2.10 on 2026-10-18 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file', '0005_file_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='blurhash',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='dominant_color',
+            field=models.CharField(max_length=7, null=True),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='height',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='width',
+            field=models.PositiveIntegerField(null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.10 on 2026-10-18 09:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file', '0006_image_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='processed_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(condition=models.Q(processed_at__isnull=True), fields=['id'], name='file_unprocessed_idx'),
+        ),
+        # 이미지가 아니거나 리사이즈 이미지가 모두 있는 기존 파일은 처리된 것으로 둔다.
+        migrations.RunSQL(
+            """
+            UPDATE file_file SET processed_at = NOW()
+            WHERE content_type NOT LIKE 'image/%'
+               OR (SELECT COUNT(*) FROM file_imagevariant
+                   WHERE file_imagevariant.original_id = file_file.id) >= 3
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
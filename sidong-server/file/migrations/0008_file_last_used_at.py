@@ -0,0 +1,45 @@
+# Generated by Django 2.2.10 on 2026-10-18 09:28
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file', '0007_file_processed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='last_used_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunSQL(
+            "UPDATE file_file SET last_used_at = created_at",
+            migrations.RunSQL.noop,
+        ),
+        # 같은 사용자가 같은 내용을 여러 번 올린 파일은 먼저 올린 파일만 sha256 을 남긴다.
+        migrations.RunSQL(
+            """
+            UPDATE file_file SET sha256 = NULL
+            WHERE sha256 IS NOT NULL AND EXISTS (
+                SELECT 1 FROM file_file AS other
+                WHERE other.sha256 = file_file.sha256
+                  AND other.bucket = file_file.bucket
+                  AND other.user_id IS NOT DISTINCT FROM file_file.user_id
+                  AND other.id < file_file.id
+            )
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='file',
+            constraint=models.UniqueConstraint(fields=('user', 'bucket', 'sha256'), name='unique_user_file_content'),
+        ),
+        migrations.AddConstraint(
+            model_name='file',
+            constraint=models.UniqueConstraint(condition=models.Q(user__isnull=True), fields=('bucket', 'sha256'), name='unique_anonymous_file_content'),
+        ),
+    ]
@@ -1,9 +1,22 @@
+import hashlib
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.core.files.base import ContentFile
 from django.db import models
 from django.conf import settings
-from django.contrib.auth.models import User
 from django.utils import timezone
-import boto3
-from botocore.exceptions import ClientError
+from django.contrib.auth.models import User
+from PIL import Image
+from file.images import CONTENT_TYPE_OF_FORMAT, EXTENSION_OF_FORMAT, \
+    get_image_metadata, open_image, read_image_header, render_variant
+from file.storage import StorageError, get_storage
+
+MAX_FILE_SIZE = 10000000
+
+_upload_executor = None
+_upload_executor_lock = threading.Lock()
 
 
 class File(models.Model):
@@ -20,87 +33,383 @@ class File(models.Model):
         max_length=8, choices=CHOICES_OF_BUCKET, default=BUCKET_ASSETS)
     path = models.CharField(max_length=256)
     content_type = models.CharField(max_length=32)
+    sha256 = models.CharField(max_length=64, null=True, db_index=True)
+    size = models.BigIntegerField(null=True)
+    # 이미지 파일일 때만 채운다. (프론트에서 자리를 잡고 placeholder 를 보여줄 때 사용)
+    width = models.PositiveIntegerField(null=True)
+    height = models.PositiveIntegerField(null=True)
+    dominant_color = models.CharField(max_length=7, null=True)
+    blurhash = models.CharField(max_length=64, null=True)
+    # 리사이즈 이미지/메타데이터를 만들었는지. 비어 있으면 create_image_variants 가 처리한다.
+    processed_at = models.DateTimeField(null=True)
+    # 같은 내용을 다시 올려서 재사용할 때도 갱신한다. gc 는 이 시간을 기준으로 유예 기간을 둔다.
+    last_used_at = models.DateTimeField(default=timezone.now)
     user = models.ForeignKey(
         User, null=True, on_delete=models.SET_NULL, related_name='files')
 
+    class Meta:
+        # 저장소 객체(경로)는 사용자끼리 공유하지만 File 행은 사용자마다 하나씩 둔다.
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'bucket', 'sha256'], name='unique_user_file_content'),
+            models.UniqueConstraint(
+                fields=['bucket', 'sha256'], condition=models.Q(user__isnull=True),
+                name='unique_anonymous_file_content'),
+        ]
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(processed_at__isnull=True),
+                         name='file_unprocessed_idx'),
+        ]
+
     @property
     def url(self):
-        return "https://s3.ap-northeast-2.amazonaws.com/" + self.bucket + \
-            ".storage.jakupsil.co.kr/" + self.path
+        return get_storage().url(self.path, self.bucket)
+
+
+class ImageVariant(models.Model):
+    SIZE_THUMBNAIL = "thumbnail"
+    SIZE_CARD = "card"
+    SIZE_DETAIL = "detail"
+
+    CHOICES_OF_SIZE = [
+        (SIZE_THUMBNAIL, "썸네일"),
+        (SIZE_CARD, "목록 카드"),
+        (SIZE_DETAIL, "상세 페이지"),
+    ]
+
+    # 긴 변의 최대 길이(px)
+    MAX_EDGE_OF_SIZE = {
+        SIZE_THUMBNAIL: 200,
+        SIZE_CARD: 600,
+        SIZE_DETAIL: 1200,
+    }
 
+    created_at = models.DateTimeField(auto_now_add=True)
+    original = models.ForeignKey(
+        File, on_delete=models.CASCADE, related_name='variants')
+    size = models.CharField(max_length=16, choices=CHOICES_OF_SIZE)
+    bucket = models.CharField(
+        max_length=8, choices=File.CHOICES_OF_BUCKET, default=File.BUCKET_ASSETS)
+    path = models.CharField(max_length=256)
+    content_type = models.CharField(max_length=32)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['original', 'size'], name='unique_image_variant'),
+        ]
+
+    @property
+    def url(self):
+        return get_storage().url(self.path, self.bucket)
 
-def get_file_path(file):
-    current_time = timezone.now()
-    return current_time.strftime("%Y") + "/" + current_time.strftime(
-        "%m") + "/" + current_time.strftime("%d") + "/" + current_time.strftime("%H%M%s") + file.name
+
+class PendingUpload(models.Model):
+    # 발급했지만 아직 confirmUploads 하지 않은 업로드 slot. 확인하지 않은 채 남은 객체는 gc 가 지운다.
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    bucket = models.CharField(
+        max_length=8, choices=File.CHOICES_OF_BUCKET, default=File.BUCKET_ASSETS)
+    path = models.CharField(max_length=256, unique=True)
+    user = models.ForeignKey(
+        User, null=True, on_delete=models.SET_NULL, related_name='+')
+
+
+def hash_file(file):
+    # 파일 전체를 메모리에 올리지 않고 chunk 단위로 읽으면서 SHA-256 을 계산한다.
+    sha256 = hashlib.sha256()
+    for chunk in file.chunks():
+        sha256.update(chunk)
+    file.seek(0)
+    return sha256.hexdigest()
+
+
+def read_image_metadata(file, content_type):
+    if not content_type.startswith('image/'):
+        return {}
+    try:
+        return get_image_metadata(file)
+    except Exception:
+        file.seek(0)
+        return {}
+
+
+def inspect_file(file):
+    return hash_file(file), read_image_metadata(file, file.content_type)
+
+
+def get_file_path(file, sha256):
+    # 내용이 같으면 같은 경로가 되므로 경로 충돌을 따로 확인할 필요가 없다.
+    extension = os.path.splitext(file.name)[1].lower()
+    if not re.match(r'^\.[a-z0-9]{1,7}$', extension):
+        extension = ''
+    return sha256[:2] + "/" + sha256 + extension
 
 
 def upload_file(file, file_path, bucket):
-    bucket += ".storage.jakupsil.co.kr"
-    s3_client = boto3.client(
-        service_name="s3",
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        region_name="ap-northeast-2",
-    )
     try:
-        s3_client.put_object(
-            Key=file_path,
-            ACL="public-read",
-            Body=file,
-            Bucket=bucket,
-            ContentType=file.content_type,
-        )
-    except ClientError as error:
-        return {'status': 'fail', msg: error.msg}
+        get_storage().upload(file, file_path, bucket, file.content_type)
+    except StorageError as error:
+        return {'status': 'fail', 'msg': str(error)}
 
     return {'status': 'success'}
 
 
-def create_file(file, bucket, user):
-    file_path = get_file_path(file)
-    result_of_upload_to_s3 = upload_file(file, file_path, bucket)
+def get_upload_executor():
+    global _upload_executor
+    if _upload_executor is None:
+        with _upload_executor_lock:
+            if _upload_executor is None:
+                _upload_executor = ThreadPoolExecutor(
+                    max_workers=settings.FILE_UPLOAD_MAX_WORKERS)
+    return _upload_executor
+
+
+def upload_files(files, file_paths, bucket):
+    # 한 요청의 파일들을 동시에 저장소로 보낸다. 하나라도 실패하면 이미 올라간 파일은 지운다.
+    futures = [
+        get_upload_executor().submit(upload_file, file, file_path, bucket)
+        for file, file_path in zip(files, file_paths)
+    ]
+    results = [future.result() for future in futures]
+    failed_results = [result for result in results if result['status'] == 'fail']
+
+    if failed_results:
+        delete_uploaded_files([
+            file_path for file_path, result in zip(file_paths, results)
+            if result['status'] == 'success'
+        ], bucket)
+        return failed_results[0]
+
+    return {'status': 'success'}
+
+
+def delete_uploaded_files(file_paths, bucket):
+    # 같은 내용을 동시에 올린 다른 요청이 이미 File 로 등록한 경로는 지우지 않는다.
+    file_paths = set(file_paths) - set(File.objects.filter(
+        bucket=bucket, path__in=file_paths).values_list('path', flat=True))
+    if not file_paths:
+        return
+    try:
+        get_storage().delete(list(file_paths), bucket)
+    except StorageError:
+        # 지우지 못한 파일은 참조되지 않은 파일로 남는다.
+        pass
+
+
+def create_files(files, bucket, user):
+    inspections = list(get_upload_executor().map(inspect_file, files))
+    hashes = [sha256 for sha256, _ in inspections]
+    metadata = dict(inspections)
+
+    # 같은 내용의 파일이 있으면 다시 올리지 않는다. gc 가 유예 기간 동안 지우지 않도록
+    # 같은 경로를 쓰는 File 을 먼저 모두 갱신한다.
+    File.objects.filter(bucket=bucket, sha256__in=set(hashes)).update(
+        last_used_at=timezone.now())
+    stored_paths = {}
+    user_files = {}
+    for file_instance in File.objects.filter(
+            bucket=bucket, sha256__in=set(hashes)).order_by('-id'):
+        stored_paths[file_instance.sha256] = file_instance.path
+        if file_instance.user_id == (user.id if user else None):
+            user_files[file_instance.sha256] = file_instance
+
+    new_files = {}
+    new_uploads = {}
+    for file, sha256 in zip(files, hashes):
+        if sha256 in user_files or sha256 in new_files:
+            continue
+        if sha256 in stored_paths:
+            new_files[sha256] = (file, stored_paths[sha256])
+        else:
+            new_files[sha256] = new_uploads[sha256] = (file, get_file_path(file, sha256))
 
-    if result_of_upload_to_s3['status'] == 'fail':
+    result_of_upload = upload_files(
+        [file for file, _ in new_uploads.values()],
+        [file_path for _, file_path in new_uploads.values()], bucket)
+
+    if result_of_upload['status'] == 'fail':
         return {
             'status': 'fail',
-            'msg': result_of_upload_to_s3['msg'],
+            'msg': result_of_upload['msg'],
         }
 
     try:
-        instance = File.objects.create(
-            name=file.name,
-            bucket=bucket,
-            path=file_path,
-            content_type=file.content_type,
-            user=user,
-        )
-        return {
-            'status': 'success',
-            'instance': instance,
-        }
+        # 같은 내용을 동시에 올린 요청이 먼저 만든 File 이 있으면 그 File 을 쓴다.
+        File.objects.bulk_create([
+            File(
+                name=file.name,
+                bucket=bucket,
+                path=file_path,
+                content_type=file.content_type,
+                sha256=sha256,
+                size=file.size,
+                user=user,
+                # 이미지는 요청이 끝난 뒤 create_image_variants 가 리사이즈 이미지를 만든다.
+                processed_at=None if file.content_type.startswith('image/') else timezone.now(),
+                **metadata[sha256]
+            ) for sha256, (file, file_path) in new_files.items()
+        ], ignore_conflicts=True)
+        user_files.update(
+            (file_instance.sha256, file_instance) for file_instance in File.objects.filter(
+                user=user, bucket=bucket, sha256__in=list(new_files)))
     except Exception as error:
+        delete_uploaded_files([file_path for _, file_path in new_uploads.values()], bucket)
         return {
             'status': 'fail',
-            'msg': error,
+            'msg': str(error),
         }
 
+    # 먼저 만든 File 이 다른 경로를 쓰고 있으면 이번에 올린 객체는 쓰이지 않는다.
+    delete_uploaded_files([file_path for _, file_path in new_uploads.values()], bucket)
+
+    return {
+        'status': 'success',
+        'instances': [user_files[sha256] for sha256 in hashes],
+    }
+
+
+def get_variant_path(file_path, size):
+    return file_path + "." + size + "." + EXTENSION_OF_FORMAT[settings.IMAGE_VARIANT_FORMAT]
+
+
+def upload_image_variants(file, file_path, bucket):
+    # 작업 스레드에서 실행되므로 DB 는 건드리지 않고 만들어진 variant 정보만 돌려준다.
+    storage = get_storage()
+    content_type = CONTENT_TYPE_OF_FORMAT[settings.IMAGE_VARIANT_FORMAT]
+    variants = []
+
+    try:
+        image = open_image(file)
+        for size, max_edge in ImageVariant.MAX_EDGE_OF_SIZE.items():
+            content, width, height = render_variant(image, max_edge)
+            variant_path = get_variant_path(file_path, size)
+            storage.upload(ContentFile(content, name=variant_path),
+                           variant_path, bucket, content_type)
+            variants.append({
+                'size': size,
+                'bucket': bucket,
+                'path': variant_path,
+                'content_type': content_type,
+                'width': width,
+                'height': height,
+            })
+    except Exception:
+        # 리사이즈 이미지를 만들지 못하면 원본 URL 을 대신 쓴다.
+        try:
+            storage.delete([variant['path'] for variant in variants], bucket)
+        except StorageError:
+            pass
+        return []
+
+    return variants
+
+
+def process_file(file_instance):
+    # 저장소에서 원본을 읽어서 메타데이터와 리사이즈 이미지를 만든다. 원본을 못 읽으면 None (다음에 다시 시도)
+    try:
+        file = ContentFile(get_storage().read(file_instance.path, file_instance.bucket),
+                           name=file_instance.path)
+    except StorageError:
+        return None
+
+    metadata = {}
+    if file_instance.blurhash is None:
+        metadata = read_image_metadata(file, file_instance.content_type)
+    return metadata, upload_image_variants(file, file_instance.path, file_instance.bucket)
+
+
+def create_image_variants(file_instances):
+    # 업로드 요청 밖(create_image_variants 명령)에서 processed_at 이 비어 있는 파일을 처리한다.
+    results = list(get_upload_executor().map(process_file, file_instances))
+
+    processed_files = []
+    image_variants = []
+    for file_instance, result in zip(file_instances, results):
+        if result is None:
+            continue
+        metadata, variants = result
+        for field, value in metadata.items():
+            setattr(file_instance, field, value)
+        file_instance.processed_at = timezone.now()
+        processed_files.append(file_instance)
+        image_variants.extend(
+            ImageVariant(original=file_instance, **variant) for variant in variants)
+
+    ImageVariant.objects.bulk_create(image_variants, ignore_conflicts=True)
+    File.objects.bulk_update(processed_files, [
+        'processed_at', 'width', 'height', 'dominant_color', 'blurhash'])
+    return processed_files, image_variants
+
+
+def create_file(file, bucket, user):
+    result = create_files([file], bucket, user)
+    if result['status'] == 'fail':
+        return result
+
+    return {
+        'status': 'success',
+        'instance': result['instances'][0],
+    }
+
 
 def validate_file(file, bucket):
     file_name = file.name
 
-    if file.size > 10000000:
+    if file.size > MAX_FILE_SIZE:
         return {
             'status': 'fail',
             'msg': '파일 용량은 10MB까지 가능합니다. ' + file_name + ' 용량을 확인해주세요.',
         }
 
-    file_path = get_file_path(file)
+    # 저장소로 보내기 전에 앞부분만 읽어서 실제 이미지인지, 해상도가 적당한지 확인한다.
+    too_large_msg = {
+        'status': 'fail',
+        'msg': '이미지 해상도가 너무 큽니다. ' + file_name + ' 크기를 줄여주세요.',
+    }
+    broken_msg = {
+        'status': 'fail',
+        'msg': '손상된 이미지 파일입니다. ' + file_name + ' 파일을 확인해주세요.',
+    }
 
-    if File.objects.filter(bucket=bucket, path=file_path).exists():
+    try:
+        image_format, width, height = read_image_header(file)
+    except Image.DecompressionBombError:
+        return too_large_msg
+    except (OSError, SyntaxError, ValueError):
+        return broken_msg
+
+    if image_format is None:
         return {
             'status': 'fail',
-            'msg': '이미 존재하는 파일명입니다. ' + file_name + '의 이름을 변경해주세요.'
+            'msg': 'JPEG, PNG, WEBP, GIF 이미지만 올릴 수 있습니다. ' + file_name + ' 형식을 확인해주세요.',
         }
 
+    if not width or not height:
+        return broken_msg
+
+    if width * height > settings.MAX_IMAGE_PIXELS:
+        return too_large_msg
+
+    # 클라이언트가 보낸 content type 대신 실제 내용의 형식으로 저장한다.
+    file.content_type = CONTENT_TYPE_OF_FORMAT[image_format]
+
     return {'status': 'success'}
+
+
+def get_user_files(file_ids, user):
+    # 미리 업로드(confirmUploads)한 파일 id 를 받을 때 본인이 올린 파일인지 확인한다.
+    try:
+        file_ids = [int(file_id) for file_id in file_ids]
+    except (TypeError, ValueError):
+        return {'status': 'fail', 'msg': '파일 정보가 올바르지 않습니다.'}
+
+    files = File.objects.filter(user=user).in_bulk(file_ids)
+    if len(files) != len(set(file_ids)):
+        return {'status': 'fail', 'msg': '업로드한 파일을 찾을 수 없습니다.'}
+
+    return {
+        'status': 'success',
+        'instances': [files[file_id] for file_id in file_ids],
+    }
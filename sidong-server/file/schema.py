@@ -1,20 +1,85 @@
 from graphene_django.types import DjangoObjectType
-from graphene import Field, ID, String, ObjectType
+from graphene import Field, ID, Int, List, String, Boolean, Mutation, ObjectType, \
+    InputObjectType
 from file.models import File
+from file.loaders import load_file, load_file_url
+from file.uploads import confirm_upload_slots, create_upload_slots
 
 
 class FileType(DjangoObjectType):
     class Meta:
         model = File
 
-    url = String()
+    url = String(size=String())
 
-    def resolve_url(self, info):
-        return self.url
+    def resolve_url(self, info, size=None):
+        return load_file_url(info, self.id, size or getattr(self, 'image_size', None))
+
+
+class UploadFileInput(InputObjectType):
+    name = String(required=True)
+    content_type = String(required=True)
+    size = Int(required=True)
+
+
+class UploadHeaderType(ObjectType):
+    name = String()
+    value = String()
+
+
+class UploadSlotType(ObjectType):
+    token = String()
+    upload_url = String()
+    headers = List(UploadHeaderType)
+
+
+class RequestUploadSlots(Mutation):
+    class Arguments:
+        files = List(UploadFileInput, required=True)
+
+    success = Boolean()
+    msg = String()
+    slots = List(UploadSlotType)
+
+    def mutate(self, info, files):
+        user = info.context.user
+        if user.is_anonymous:
+            return RequestUploadSlots(success=False, msg="로그인이 필요합니다.")
+
+        result = create_upload_slots(files, File.BUCKET_ASSETS, user)
+        if result['status'] == 'fail':
+            return RequestUploadSlots(success=False, msg=result['msg'])
+
+        return RequestUploadSlots(success=True, slots=result['slots'])
+
+
+class ConfirmUploads(Mutation):
+    class Arguments:
+        tokens = List(String, required=True)
+
+    success = Boolean()
+    msg = String()
+    files = List(FileType)
+
+    def mutate(self, info, tokens):
+        user = info.context.user
+        if user.is_anonymous:
+            return ConfirmUploads(success=False, msg="로그인이 필요합니다.")
+
+        result = confirm_upload_slots(tokens, user)
+        if result['status'] == 'fail':
+            return ConfirmUploads(success=False, msg=result['msg'])
+
+        return ConfirmUploads(success=True, files=result['instances'])
 
 
 class Query(ObjectType):
     file = Field(FileType, file_id=ID())
 
     def resolve_file(self, info, file_id):
-        return File.objects.get(id=file_id)
+        return load_file(info, file_id)
+
+
+class Mutation(ObjectType):
+    request_upload_slots = RequestUploadSlots.Field()
+    confirm_uploads = ConfirmUploads.Field()
@@ -0,0 +1,285 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+import boto3
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from django.conf import settings
+from django.core import signing
+from django.utils.module_loading import import_string
+
+
+LOCAL_UPLOAD_SALT = 'file.storage.local_upload'
+
+
+class StorageError(Exception):
+    pass
+
+
+class Storage(ABC):
+    @abstractmethod
+    def upload(self, file, path, bucket, content_type):
+        pass
+
+    @abstractmethod
+    def read(self, path, bucket):
+        pass
+
+    @abstractmethod
+    def read_head(self, path, bucket, size):
+        # 앞부분 size 바이트만 읽는다. (파일 형식/해상도 확인용)
+        pass
+
+    @abstractmethod
+    def get_size(self, path, bucket):
+        pass
+
+    @abstractmethod
+    def get_upload_url(self, path, bucket, content_type, expires_in):
+        # 클라이언트가 직접 PUT 으로 올릴 URL 과 함께 보내야 하는 header 를 돌려준다.
+        pass
+
+    @abstractmethod
+    def delete(self, paths, bucket):
+        pass
+
+    @abstractmethod
+    def url(self, path, bucket):
+        pass
+
+
+class S3Storage(Storage):
+    REGION_NAME = "ap-northeast-2"
+
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # boto3 client 는 thread-safe 하지만 생성은 그렇지 않아서 lock 안에서 한 번만 만든다.
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = boto3.session.Session().client(
+                        service_name="s3",
+                        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                        region_name=self.REGION_NAME,
+                        config=Config(
+                            max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+                            connect_timeout=settings.S3_CONNECT_TIMEOUT,
+                            read_timeout=settings.S3_READ_TIMEOUT,
+                            retries={'max_attempts': 3},
+                        ),
+                    )
+        return self._client
+
+    def get_bucket_name(self, bucket):
+        return bucket + ".storage.jakupsil.co.kr"
+
+    # S3 multipart 업로드는 마지막 part 를 제외하고 5MB 이상이어야 한다.
+    MIN_PART_SIZE = 5 * 1024 * 1024
+
+    def upload(self, file, path, bucket, content_type):
+        if file.size is not None and file.size > settings.S3_MULTIPART_THRESHOLD:
+            return self.upload_multipart(file, path, bucket, content_type)
+
+        try:
+            self.client.put_object(
+                Key=path,
+                ACL="public-read",
+                Body=file,
+                Bucket=self.get_bucket_name(bucket),
+                ContentType=content_type,
+                CacheControl=settings.FILE_CACHE_CONTROL,
+            )
+        except (BotoCoreError, ClientError) as error:
+            raise StorageError(str(error))
+
+    def upload_multipart(self, file, path, bucket, content_type):
+        # 파일을 part 크기만큼씩 읽어서 보내므로 메모리에는 part 하나만 올라간다.
+        bucket_name = self.get_bucket_name(bucket)
+        part_size = max(settings.S3_MULTIPART_PART_SIZE, self.MIN_PART_SIZE)
+
+        try:
+            upload_id = self.client.create_multipart_upload(
+                Key=path,
+                ACL="public-read",
+                Bucket=bucket_name,
+                ContentType=content_type,
+                CacheControl=settings.FILE_CACHE_CONTROL,
+            )['UploadId']
+        except (BotoCoreError, ClientError) as error:
+            raise StorageError(str(error))
+
+        try:
+            parts = []
+            file.seek(0)
+            part_number = 0
+            while True:
+                chunk = file.read(part_size)
+                if not chunk:
+                    break
+                part_number += 1
+                response = self.client.upload_part(
+                    Key=path,
+                    Bucket=bucket_name,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=chunk,
+                )
+                parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+
+            self.client.complete_multipart_upload(
+                Key=path,
+                Bucket=bucket_name,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': parts},
+            )
+        except (BotoCoreError, ClientError, OSError) as error:
+            # 중단된 업로드의 part 들이 버킷에 남아 과금되지 않도록 정리한다.
+            try:
+                self.client.abort_multipart_upload(
+                    Key=path, Bucket=bucket_name, UploadId=upload_id)
+            except (BotoCoreError, ClientError):
+                pass
+            raise StorageError(str(error))
+
+    def read(self, path, bucket):
+        try:
+            return self.client.get_object(
+                Bucket=self.get_bucket_name(bucket), Key=path)['Body'].read()
+        except (BotoCoreError, ClientError) as error:
+            raise StorageError(str(error))
+
+    def read_head(self, path, bucket, size):
+        try:
+            return self.client.get_object(
+                Bucket=self.get_bucket_name(bucket), Key=path,
+                Range='bytes=0-' + str(size - 1))['Body'].read()
+        except (BotoCoreError, ClientError) as error:
+            raise StorageError(str(error))
+
+    def get_size(self, path, bucket):
+        try:
+            return self.client.head_object(
+                Bucket=self.get_bucket_name(bucket), Key=path)['ContentLength']
+        except (BotoCoreError, ClientError) as error:
+            raise StorageError(str(error))
+
+    def get_upload_url(self, path, bucket, content_type, expires_in):
+        headers = {
+            'Content-Type': content_type,
+            'Cache-Control': settings.FILE_CACHE_CONTROL,
+            'x-amz-acl': 'public-read',
+        }
+        try:
+            upload_url = self.client.generate_presigned_url(
+                'put_object',
+                Params={
+                    'Key': path,
+                    'ACL': 'public-read',
+                    'Bucket': self.get_bucket_name(bucket),
+                    'ContentType': content_type,
+                    'CacheControl': settings.FILE_CACHE_CONTROL,
+                },
+                ExpiresIn=expires_in,
+                HttpMethod='PUT',
+            )
+        except (BotoCoreError, ClientError) as error:
+            raise StorageError(str(error))
+        return upload_url, headers
+
+    # DeleteObjects 는 한 번에 1000개까지 지울 수 있다.
+    MAX_DELETE_OBJECTS = 1000
+
+    def delete(self, paths, bucket):
+        for i in range(0, len(paths), self.MAX_DELETE_OBJECTS):
+            try:
+                response = self.client.delete_objects(
+                    Bucket=self.get_bucket_name(bucket),
+                    Delete={
+                        'Objects': [
+                            {'Key': path} for path in paths[i:i + self.MAX_DELETE_OBJECTS]
+                        ],
+                        'Quiet': True,
+                    },
+                )
+            except (BotoCoreError, ClientError) as error:
+                raise StorageError(str(error))
+            if response.get('Errors'):
+                raise StorageError(', '.join(
+                    error['Key'] + ': ' + error['Message'] for error in response['Errors']))
+
+    def url(self, path, bucket):
+        return "https://s3." + self.REGION_NAME + ".amazonaws.com/" + \
+            self.get_bucket_name(bucket) + "/" + path
+
+
+class LocalStorage(Storage):
+    # 네트워크 없이 업로드를 테스트/벤치마크할 때 쓰는 로컬 파일시스템 저장소
+    def get_file_path(self, path, bucket):
+        return os.path.join(settings.FILE_STORAGE_LOCAL_ROOT, bucket, path)
+
+    def upload(self, file, path, bucket, content_type):
+        file_path = self.get_file_path(path, bucket)
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, 'wb') as destination:
+                for chunk in file.chunks():
+                    destination.write(chunk)
+        except OSError as error:
+            raise StorageError(str(error))
+
+    def read(self, path, bucket):
+        try:
+            with open(self.get_file_path(path, bucket), 'rb') as source:
+                return source.read()
+        except OSError as error:
+            raise StorageError(str(error))
+
+    def read_head(self, path, bucket, size):
+        try:
+            with open(self.get_file_path(path, bucket), 'rb') as source:
+                return source.read(size)
+        except OSError as error:
+            raise StorageError(str(error))
+
+    def get_size(self, path, bucket):
+        try:
+            return os.path.getsize(self.get_file_path(path, bucket))
+        except OSError as error:
+            raise StorageError(str(error))
+
+    def get_upload_url(self, path, bucket, content_type, expires_in):
+        # S3 presigned URL 대신 서명한 토큰으로 file.views.upload_to_local_storage 에 PUT 한다.
+        token = signing.dumps({'path': path, 'bucket': bucket}, salt=LOCAL_UPLOAD_SALT)
+        return settings.FILE_STORAGE_LOCAL_URL + "upload/" + token, {
+            'Content-Type': content_type,
+        }
+
+    def delete(self, paths, bucket):
+        for path in paths:
+            try:
+                os.remove(self.get_file_path(path, bucket))
+            except FileNotFoundError:
+                pass
+            except OSError as error:
+                raise StorageError(str(error))
+
+    def url(self, path, bucket):
+        return settings.FILE_STORAGE_LOCAL_URL + bucket + "/" + path
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = import_string(settings.FILE_STORAGE_BACKEND)()
+    return _storage
@@ -0,0 +1,194 @@
+import datetime
+import io
+import shutil
+import tempfile
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from file import storage
+from file.gc import delete_orphaned_files, expire_upload_slots, find_expired_upload_slots, \
+    find_orphaned_files
+from file.models import File, ImageVariant, PendingUpload, create_files, get_variant_path
+from file.uploads import confirm_upload_slots, create_upload_slots
+from user.models import Artist
+
+
+def create_image(color=(200, 10, 20), name='image.png'):
+    content = io.BytesIO()
+    Image.new('RGB', (40, 30), color).save(content, 'PNG')
+    return SimpleUploadedFile(name, content.getvalue(), content_type='image/png')
+
+
+class LocalStorageTestCase(TestCase):
+    def setUp(self):
+        self.storage_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.storage_root, True)
+        settings_override = override_settings(FILE_STORAGE_LOCAL_ROOT=self.storage_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        storage_patch = mock.patch.object(storage, '_storage', storage.LocalStorage())
+        storage_patch.start()
+        self.addCleanup(storage_patch.stop)
+        self.storage = storage.get_storage()
+
+
+class CreateFilesTest(LocalStorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='user')
+        self.other_user = User.objects.create(username='other')
+
+    def test_same_content_reuses_the_users_file_and_touches_it(self):
+        first = create_files([create_image()], File.BUCKET_ASSETS, self.user)['instances'][0]
+        File.objects.filter(id=first.id).update(
+            last_used_at=timezone.now() - datetime.timedelta(days=30))
+
+        second = create_files([create_image()], File.BUCKET_ASSETS, self.user)['instances'][0]
+
+        self.assertEqual(second.id, first.id)
+        first.refresh_from_db()
+        self.assertGreater(first.last_used_at, timezone.now() - datetime.timedelta(hours=1))
+
+    def test_same_content_of_other_user_shares_the_stored_object(self):
+        first = create_files(
+            [create_image(name='a.png')], File.BUCKET_ASSETS, self.user)['instances'][0]
+
+        with mock.patch.object(self.storage, 'upload') as upload:
+            second = create_files(
+                [create_image(name='b.PNG')], File.BUCKET_ASSETS,
+                self.other_user)['instances'][0]
+
+        upload.assert_not_called()
+        self.assertNotEqual(second.id, first.id)
+        self.assertEqual(second.user, self.other_user)
+        self.assertEqual(second.path, first.path)
+
+    def test_duplicates_in_one_request_create_one_file(self):
+        instances = create_files(
+            [create_image(), create_image(), create_image((0, 0, 0))],
+            File.BUCKET_ASSETS, self.user)['instances']
+
+        self.assertEqual(instances[0].id, instances[1].id)
+        self.assertNotEqual(instances[0].id, instances[2].id)
+        self.assertEqual(File.objects.filter(user=self.user).count(), 2)
+
+
+class UploadSlotTest(LocalStorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='user')
+
+    def request_slot(self, content_type='image/png'):
+        result = create_upload_slots([
+            {'name': 'image.png', 'content_type': content_type, 'size': 100},
+        ], File.BUCKET_ASSETS, self.user)
+        return result['slots'][0]['token'], PendingUpload.objects.get().path
+
+    def put(self, path, content):
+        self.storage.upload(ContentFile(content), path, File.BUCKET_ASSETS, 'image/png')
+
+    def test_confirm_checks_the_stored_content(self):
+        token, path = self.request_slot(content_type='image/jpeg')
+        self.put(path, create_image().read())
+
+        result = confirm_upload_slots([token], self.user)
+
+        self.assertEqual(result['status'], 'success')
+        file_instance = result['instances'][0]
+        self.assertEqual(file_instance.content_type, 'image/png')
+        self.assertIsNone(file_instance.processed_at)
+        self.assertFalse(PendingUpload.objects.exists())
+
+    def test_confirm_rejects_and_deletes_non_image(self):
+        token, path = self.request_slot()
+        self.put(path, b'<html></html>')
+
+        result = confirm_upload_slots([token], self.user)
+
+        self.assertEqual(result['status'], 'fail')
+        self.assertFalse(File.objects.exists())
+        self.assertFalse(PendingUpload.objects.exists())
+        with self.assertRaises(storage.StorageError):
+            self.storage.read(path, File.BUCKET_ASSETS)
+
+    def test_gc_expires_unconfirmed_slots(self):
+        _, path = self.request_slot()
+        self.put(path, create_image().read())
+        self.assertEqual(find_expired_upload_slots(1), [])
+
+        PendingUpload.objects.update(created_at=timezone.now() - datetime.timedelta(hours=2))
+        expired_count, failed_paths = expire_upload_slots(find_expired_upload_slots(1))
+
+        self.assertEqual((expired_count, failed_paths), (1, []))
+        self.assertFalse(PendingUpload.objects.exists())
+        with self.assertRaises(storage.StorageError):
+            self.storage.read(path, File.BUCKET_ASSETS)
+
+
+class GarbageCollectionTest(LocalStorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='user')
+        self.other_user = User.objects.create(username='other')
+
+    def create_stored_file(self, user, color=(200, 10, 20)):
+        file_instance = create_files([create_image(color)], File.BUCKET_ASSETS, user)['instances'][0]
+        for size in ImageVariant.MAX_EDGE_OF_SIZE:
+            self.put(get_variant_path(file_instance.path, size))
+        return file_instance
+
+    def put(self, path):
+        self.storage.upload(ContentFile(b'variant'), path, File.BUCKET_ASSETS, 'image/webp')
+
+    def is_stored(self, path):
+        try:
+            self.storage.read(path, File.BUCKET_ASSETS)
+        except storage.StorageError:
+            return False
+        return True
+
+    def expire(self):
+        File.objects.update(last_used_at=timezone.now() - datetime.timedelta(hours=2))
+
+    def collect(self):
+        orphaned_files = find_orphaned_files(1)
+        return delete_orphaned_files([file_id for file_id, _, _, _ in orphaned_files], 1)
+
+    def test_deletes_unreferenced_file_with_its_variants(self):
+        file_instance = self.create_stored_file(self.user)
+        self.expire()
+
+        self.assertEqual(self.collect(), (1, []))
+        self.assertFalse(File.objects.exists())
+        self.assertFalse(self.is_stored(file_instance.path))
+        for size in ImageVariant.MAX_EDGE_OF_SIZE:
+            self.assertFalse(self.is_stored(get_variant_path(file_instance.path, size)))
+
+    def test_keeps_referenced_and_recently_used_files(self):
+        referenced = self.create_stored_file(self.user)
+        Artist.objects.create(
+            user=self.user, artist_name='작가', real_name='작가', thumbnail=referenced)
+        self.expire()
+        recent = self.create_stored_file(self.user, color=(0, 0, 0))
+
+        self.assertEqual(self.collect(), (0, []))
+        self.assertTrue(self.is_stored(referenced.path))
+        self.assertTrue(self.is_stored(recent.path))
+
+    def test_keeps_objects_still_used_by_other_files(self):
+        deleted = self.create_stored_file(self.user)
+        surviving = self.create_stored_file(self.other_user)
+        self.assertEqual(deleted.path, surviving.path)
+        self.expire()
+        # 다른 사용자가 방금 다시 올린 것처럼 하나만 갱신한다.
+        File.objects.filter(id=surviving.id).update(last_used_at=timezone.now())
+
+        self.assertEqual(self.collect(), (1, []))
+        self.assertFalse(File.objects.filter(id=deleted.id).exists())
+        self.assertTrue(self.is_stored(surviving.path))
+        for size in ImageVariant.MAX_EDGE_OF_SIZE:
+            self.assertTrue(self.is_stored(get_variant_path(surviving.path, size)))
@@ -0,0 +1,164 @@
+import os
+import re
+import uuid
+from django.conf import settings
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.db import transaction
+from file.models import File, MAX_FILE_SIZE, PendingUpload, get_upload_executor, validate_file
+from file.storage import StorageError, get_storage
+
+UPLOAD_SLOT_SALT = 'file.uploads.upload_slot'
+
+# 확인할 때 저장소에서 이만큼만 읽어서 이미지 header 를 검사한다.
+UPLOAD_HEADER_SIZE = 256 * 1024
+
+
+def get_upload_slot_path(name):
+    # 클라이언트가 올리는 내용은 미리 알 수 없어서 임의의 경로를 쓴다.
+    extension = os.path.splitext(name)[1].lower()
+    if not re.match(r'^\.[a-z0-9]{1,7}$', extension):
+        extension = ''
+    return "uploads/" + uuid.uuid4().hex + extension
+
+
+def create_upload_slots(files, bucket, user):
+    for file in files:
+        if not file['content_type'].startswith('image/'):
+            return {
+                'status': 'fail',
+                'msg': '이미지 파일만 업로드할 수 있습니다. ' + file['name'] + '의 형식을 확인해주세요.',
+            }
+        if file['size'] > MAX_FILE_SIZE:
+            return {
+                'status': 'fail',
+                'msg': '파일 용량은 10MB까지 가능합니다. ' + file['name'] + ' 용량을 확인해주세요.',
+            }
+
+    storage = get_storage()
+    slots = []
+    pending_uploads = []
+
+    try:
+        for file in files:
+            path = get_upload_slot_path(file['name'])
+            pending_uploads.append(PendingUpload(bucket=bucket, path=path, user=user))
+            upload_url, headers = storage.get_upload_url(
+                path, bucket, file['content_type'], settings.FILE_UPLOAD_SLOT_MAX_AGE)
+            slots.append({
+                'token': signing.dumps({
+                    'user': user.id,
+                    'name': file['name'],
+                    'bucket': bucket,
+                    'path': path,
+                    'content_type': file['content_type'],
+                }, salt=UPLOAD_SLOT_SALT),
+                'upload_url': upload_url,
+                'headers': [{'name': name, 'value': value} for name, value in headers.items()],
+            })
+    except StorageError as error:
+        return {'status': 'fail', 'msg': str(error)}
+
+    PendingUpload.objects.bulk_create(pending_uploads)
+
+    return {'status': 'success', 'slots': slots}
+
+
+def validate_uploaded_file(slot):
+    # 저장소에 올라온 객체의 앞부분만 읽어서 업로드 전 검사(validate_file)와 같은 검사를 한다.
+    storage = get_storage()
+    try:
+        content = storage.read_head(slot['path'], slot['bucket'], UPLOAD_HEADER_SIZE)
+        file = ContentFile(content, name=slot['name'])
+        result = validate_file(file, slot['bucket'])
+        # EXIF 등이 길어서 header 가 앞부분에 다 들어있지 않으면 전체를 읽어서 다시 확인한다.
+        if result['status'] == 'fail' and slot['size'] > len(content):
+            file = ContentFile(storage.read(slot['path'], slot['bucket']), name=slot['name'])
+            result = validate_file(file, slot['bucket'])
+    except StorageError:
+        return {
+            'status': 'fail',
+            'msg': slot['name'] + ' 파일이 업로드되지 않았습니다.',
+        }
+
+    if result['status'] == 'success':
+        result['content_type'] = file.content_type
+    return result
+
+
+def confirm_upload_slots(tokens, user):
+    # 업로드가 끝난 slot 을 확인하고 File 을 만든다. 파일 내용은 서버를 거치지 않는다.
+    slots = []
+    for token in tokens:
+        try:
+            slot = signing.loads(
+                token, salt=UPLOAD_SLOT_SALT, max_age=settings.FILE_UPLOAD_SLOT_MAX_AGE)
+        except signing.BadSignature:
+            return {'status': 'fail', 'msg': '업로드 정보가 만료되었거나 올바르지 않습니다.'}
+        if slot['user'] != user.id:
+            return {'status': 'fail', 'msg': '업로드 정보가 올바르지 않습니다.'}
+        slots.append(slot)
+
+    storage = get_storage()
+    for slot in slots:
+        try:
+            slot['size'] = storage.get_size(slot['path'], slot['bucket'])
+        except StorageError:
+            return {
+                'status': 'fail',
+                'msg': slot['name'] + ' 파일이 업로드되지 않았습니다.',
+            }
+        if slot['size'] > MAX_FILE_SIZE:
+            try:
+                storage.delete([slot['path']], slot['bucket'])
+            except StorageError:
+                pass
+            return {
+                'status': 'fail',
+                'msg': '파일 용량은 10MB까지 가능합니다. ' + slot['name'] + ' 용량을 확인해주세요.',
+            }
+
+    # 같은 slot 을 두 번 확인하면 이미 만든 File 을 돌려준다.
+    existing_files = {
+        (file_instance.bucket, file_instance.path): file_instance
+        for file_instance in File.objects.filter(
+            user=user, path__in=[slot['path'] for slot in slots])
+    }
+    new_slots = {}
+    for slot in slots:
+        key = (slot['bucket'], slot['path'])
+        if key not in existing_files:
+            new_slots[key] = slot
+
+    # 클라이언트가 알려준 content type 을 믿지 않고 실제 내용을 확인한다.
+    results = list(get_upload_executor().map(validate_uploaded_file, new_slots.values()))
+    for slot, result in zip(new_slots.values(), results):
+        if result['status'] == 'fail':
+            try:
+                storage.delete([slot['path']], slot['bucket'])
+            except StorageError:
+                pass
+            PendingUpload.objects.filter(path=slot['path']).delete()
+            return {'status': 'fail', 'msg': result['msg']}
+        slot['content_type'] = result['content_type']
+
+    # 메타데이터와 리사이즈 이미지는 create_image_variants 가 만든다. (processed_at 이 비어 있는 파일)
+    with transaction.atomic():
+        existing_files.update(
+            ((file_instance.bucket, file_instance.path), file_instance)
+            for file_instance in File.objects.bulk_create([
+                File(
+                    name=slot['name'],
+                    bucket=slot['bucket'],
+                    path=slot['path'],
+                    content_type=slot['content_type'],
+                    size=slot['size'],
+                    user=user,
+                ) for slot in new_slots.values()
+            ]))
+        PendingUpload.objects.filter(path__in=[slot['path'] for slot in slots]).delete()
+
+    return {
+        'status': 'success',
+        'instances': [existing_files[(slot['bucket'], slot['path'])] for slot in slots],
+    }
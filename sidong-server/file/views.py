@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core import signing
+from django.core.files.base import File as DjangoFile
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from file.storage import LOCAL_UPLOAD_SALT, StorageError, get_storage
+
+
+@csrf_exempt
+@require_http_methods(['PUT'])
+def upload_to_local_storage(request, token):
+    # LocalStorage 를 쓸 때 S3 presigned PUT 을 대신한다. (개발 환경 전용)
+    try:
+        slot = signing.loads(
+            token, salt=LOCAL_UPLOAD_SALT, max_age=settings.FILE_UPLOAD_SLOT_MAX_AGE)
+    except signing.BadSignature:
+        return HttpResponse(status=403)
+
+    try:
+        get_storage().upload(DjangoFile(request), slot['path'], slot['bucket'],
+                             request.content_type)
+    except StorageError as error:
+        return HttpResponse(str(error), status=500)
+
+    return HttpResponse(status=200)
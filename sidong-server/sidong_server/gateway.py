@@ -0,0 +1,93 @@
+import logging
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# 외부 API(iamport, Toast) 호출 설정. timeout 은 (connect, read) 초.
+# idempotent 한 호출만 연결 실패/timeout/5xx 에서 다시 시도한다.
+# idempotent 하지 않은 호출은 요청이 나가기 전에 실패한 경우(connect timeout)만 다시 시도한다.
+ENDPOINTS = {
+    'iamport.token': {'timeout': (3, 5), 'idempotent': True},
+    'iamport.payment': {'timeout': (3, 5), 'idempotent': True},
+    'iamport.cancel': {'timeout': (3, 15), 'idempotent': False},
+    'toast.message': {'timeout': (3, 5), 'idempotent': False},
+}
+
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class GatewayError(Exception):
+    pass
+
+
+def get_session(url):
+    # host 마다 keep-alive 연결을 재사용하는 session 을 하나씩 둔다.
+    host = urlsplit(url).netloc
+    session = _sessions.get(host)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1, pool_maxsize=settings.GATEWAY_POOL_SIZE, max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _sessions[host] = session
+    return session
+
+
+def get_retry_delay(attempt):
+    # 여러 worker 가 동시에 다시 시도하지 않도록 jitter 를 준다.
+    return settings.GATEWAY_RETRY_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+def get_max_duration(endpoint):
+    # 모든 시도가 connect + read timeout 을 다 쓰고 backoff 도 최대로 걸린 경우의 시간(초).
+    connect_timeout, read_timeout = ENDPOINTS[endpoint]['timeout']
+    max_retries = settings.GATEWAY_MAX_RETRIES
+    retry_delay = sum(
+        settings.GATEWAY_RETRY_BACKOFF * (2 ** attempt) * 1.5 for attempt in range(max_retries))
+    return (connect_timeout + read_timeout) * (max_retries + 1) + retry_delay
+
+
+def request(endpoint, method, url, **kwargs):
+    config = ENDPOINTS[endpoint]
+    session = get_session(url)
+    max_retries = settings.GATEWAY_MAX_RETRIES
+
+    for attempt in range(max_retries + 1):
+        started_at = time.monotonic()
+        error = None
+        response = None
+        try:
+            response = session.request(method, url, timeout=config['timeout'], **kwargs)
+        except requests.RequestException as request_error:
+            error = request_error
+
+        elapsed = (time.monotonic() - started_at) * 1000
+        logger.info('%s %s %s %.1fms attempt=%d', endpoint, method,
+                    response.status_code if response is not None else type(error).__name__,
+                    elapsed, attempt + 1)
+
+        if config['idempotent']:
+            retryable = error is not None or response.status_code in RETRY_STATUS_CODES
+        else:
+            retryable = isinstance(error, requests.ConnectTimeout)
+
+        if not retryable or attempt == max_retries:
+            break
+        time.sleep(get_retry_delay(attempt))
+
+    if error is not None:
+        raise GatewayError('{0} 요청 실패: {1}'.format(endpoint, error))
+    return response
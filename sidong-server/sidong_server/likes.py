@@ -0,0 +1,63 @@
+from django.db import connection
+
+# 좋아요(Like) 행이 실제로 추가/삭제됐을 때만 like_count 를 바꾸도록 한 문장의 SQL 로 처리한다.
+# 동시에 여러 요청이 와도 like_count 가 Like 행 수와 어긋나지 않는다.
+
+ADD_LIKE_SQL = """
+    WITH inserted AS (
+        INSERT INTO {like_table} (user_id, {target_column}) VALUES (%s, %s)
+        ON CONFLICT DO NOTHING
+        RETURNING {target_column}
+    )
+    UPDATE {target_table} SET like_count = like_count + 1
+    WHERE id IN (SELECT {target_column} FROM inserted)
+"""
+
+REMOVE_LIKE_SQL = """
+    WITH deleted AS (
+        DELETE FROM {like_table} WHERE user_id = %s AND {target_column} = %s
+        RETURNING {target_column}
+    )
+    UPDATE {target_table} SET like_count = like_count - 1
+    WHERE id IN (SELECT {target_column} FROM deleted) AND like_count > 0
+"""
+
+RECONCILE_LIKE_COUNT_SQL = """
+    UPDATE {target_table} SET like_count = counts.like_count
+    FROM (
+        SELECT target.id, COUNT(likes.{target_column}) AS like_count
+        FROM {target_table} AS target
+        LEFT JOIN {like_table} AS likes ON likes.{target_column} = target.id
+        GROUP BY target.id
+    ) AS counts
+    WHERE {target_table}.id = counts.id AND {target_table}.like_count <> counts.like_count
+"""
+
+
+def get_like_tables(like_model, target_field):
+    field = like_model._meta.get_field(target_field)
+    return {
+        'like_table': like_model._meta.db_table,
+        'target_column': field.column,
+        'target_table': field.related_model._meta.db_table,
+    }
+
+
+def execute_like_sql(sql, like_model, target_field, params=None):
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(**get_like_tables(like_model, target_field)), params)
+        return cursor.rowcount
+
+
+def add_like(like_model, target_field, user_id, target_id):
+    return execute_like_sql(
+        ADD_LIKE_SQL, like_model, target_field, [user_id, target_id]) == 1
+
+
+def remove_like(like_model, target_field, user_id, target_id):
+    return execute_like_sql(
+        REMOVE_LIKE_SQL, like_model, target_field, [user_id, target_id]) == 1
+
+
+def reconcile_like_count(like_model, target_field):
+    return execute_like_sql(RECONCILE_LIKE_COUNT_SQL, like_model, target_field)
@@ -0,0 +1,129 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from graphene.utils.str_converters import to_snake_case
+from graphene_django.registry import get_global_registry
+from graphql.language.ast import Field, FragmentSpread
+
+
+def collect_fields(selection_sets, fragments):
+    # {snake_case 필드명: [하위 selection_set, ...]}
+    fields = {}
+    for selection_set in selection_sets:
+        if selection_set is None:
+            continue
+        for selection in selection_set.selections:
+            if isinstance(selection, Field):
+                fields.setdefault(to_snake_case(selection.name.value), []).append(
+                    selection.selection_set)
+            else:
+                if isinstance(selection, FragmentSpread):
+                    selection = fragments[selection.name.value]
+                for name, sub_selection_sets in collect_fields(
+                        [selection.selection_set], fragments).items():
+                    fields.setdefault(name, []).extend(sub_selection_sets)
+    return fields
+
+
+def get_requested_fields(info, path=None):
+    fields = collect_fields(
+        [field_ast.selection_set for field_ast in info.field_asts], info.fragments)
+    if path is None:
+        return fields
+    return collect_fields(fields.get(to_snake_case(path), []), info.fragments)
+
+
+class QueryPlan(object):
+    def __init__(self):
+        self.only = set()
+        self.select_related = set()
+        self.prefetch_related = []
+
+    def add_model_fields(self, model, fields, fragments, prefix=''):
+        graphene_type = get_global_registry().get_type_for_model(model)
+        hints = getattr(graphene_type, 'optimizer_hints', {})
+
+        self.only.add(prefix + model._meta.pk.name)
+
+        for name, sub_selection_sets in fields.items():
+            if name in hints:
+                for hint in hints[name]:
+                    self.add_hint(model, hint, prefix)
+                continue
+
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+
+            if not field.is_relation:
+                self.only.add(prefix + field.name)
+                continue
+
+            sub_fields = collect_fields(sub_selection_sets, fragments)
+
+            if field.many_to_one or field.one_to_one:
+                if field.concrete:
+                    self.only.add(prefix + field.name)
+                self.select_related.add(prefix + field.name)
+                self.add_model_fields(
+                    field.related_model, sub_fields, fragments, prefix + field.name + '__')
+            else:
+                self.add_prefetch(get_prefetch(field, sub_fields, fragments, prefix))
+
+    def add_hint(self, model, name, prefix):
+        if isinstance(name, Prefetch):
+            # 필드 이름 대신 Prefetch 를 직접 적을 수도 있다.
+            self.add_prefetch(Prefetch(
+                prefix + name.prefetch_through, queryset=name.queryset,
+                to_attr=name.to_attr))
+            return
+
+        field = model._meta.get_field(name)
+        if field.concrete:
+            self.only.add(prefix + field.name)
+        elif field.is_relation:
+            self.add_prefetch(prefix + field.name)
+
+    def add_prefetch(self, lookup):
+        # 같은 경로를 두 번 prefetch 하면 Django 가 에러를 내므로 처음 것만 쓴다.
+        prefetch_to = lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+        for added in self.prefetch_related:
+            if prefetch_to == (added.prefetch_to if isinstance(added, Prefetch) else added):
+                return
+        self.prefetch_related.append(lookup)
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        return queryset.only(*self.only)
+
+
+def get_prefetch(field, fields, fragments, prefix):
+    accessor = prefix + field.get_accessor_name() if field.auto_created \
+        else prefix + field.name
+
+    if field.many_to_many:
+        return accessor
+
+    plan = QueryPlan()
+    plan.add_model_fields(field.related_model, fields, fragments)
+    plan.only.add(field.field.name)
+
+    return Prefetch(
+        accessor, queryset=plan.apply(field.related_model.objects.all()))
+
+
+def optimize(queryset, info, path=None, fields=()):
+    # GraphQL 에서 요청한 필드만 가져오고, 관계 필드는 select_related / prefetch_related 로 한 번에 가져온다.
+    # fields: 요청과 관계없이 항상 가져와야 하는 컬럼 (예: cursor 를 만들 정렬 키)
+    plan = QueryPlan()
+    plan.add_model_fields(
+        queryset.model, get_requested_fields(info, path), info.fragments)
+    plan.only.update(fields)
+    return plan.apply(queryset)
+
+
+def is_prefetched(instance, accessor):
+    return accessor in getattr(instance, '_prefetched_objects_cache', {})
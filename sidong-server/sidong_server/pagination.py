@@ -0,0 +1,117 @@
+import base64
+import datetime
+import json
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+# 한 번에 가져올 수 있는 최대 행 수
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def to_cursor_value(value):
+    # DjangoJSONEncoder 는 datetime 을 밀리초까지만 남겨서, 같은 밀리초 안의 행을 건너뛰거나 반복하게 된다.
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(ordering, values):
+    # 어떤 정렬로 만든 cursor 인지 함께 넣어서 다른 정렬에 잘못 쓰이지 않게 한다.
+    return base64.urlsafe_b64encode(json.dumps({
+        'ordering': list(ordering),
+        'values': [to_cursor_value(value) for value in values],
+    }, cls=DjangoJSONEncoder).encode()).decode()
+
+
+def decode_cursor(cursor, ordering):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, TypeError):
+        raise InvalidCursor('유효하지 않은 cursor 입니다.')
+
+    if not isinstance(payload, dict) or not isinstance(payload.get('values'), list):
+        raise InvalidCursor('유효하지 않은 cursor 입니다.')
+    if payload.get('ordering') != list(ordering):
+        raise InvalidCursor('정렬 조건이 바뀌어 cursor 를 사용할 수 없습니다.')
+    return payload['values']
+
+
+def get_ordering(ordering_priority, allowed_fields, default=('-id',)):
+    ordering = list(ordering_priority or default)
+
+    for field in ordering:
+        if field.lstrip('-') not in allowed_fields:
+            raise InvalidCursor('정렬할 수 없는 필드입니다: ' + field)
+
+    # 같은 값이 여러 개인 정렬 키에서도 순서가 유일하도록 id 를 마지막 키로 둔다.
+    if 'id' not in [field.lstrip('-') for field in ordering]:
+        ordering.append('-id')
+    return ordering
+
+
+def get_keyset_filter(model, ordering, values):
+    if len(values) != len(ordering):
+        raise InvalidCursor('유효하지 않은 cursor 입니다.')
+
+    names = [field.lstrip('-') for field in ordering]
+    values = [to_python(model, name, value) for name, value in zip(names, values)]
+    lookups = ['__lt' if field.startswith('-') else '__gt' for field in ordering]
+
+    keyset_filter = Q()
+    for i, (name, value, lookup) in enumerate(zip(names, values, lookups)):
+        condition = Q(**{name + lookup: value})
+        for previous_name, previous_value in zip(names[:i], values[:i]):
+            condition &= Q(**{previous_name: previous_value})
+        keyset_filter |= condition
+
+    # 첫 번째 키의 범위 조건을 따로 걸어서 인덱스 범위 스캔을 탈 수 있게 한다.
+    return Q(**{names[0] + lookups[0] + 'e': values[0]}) & keyset_filter
+
+
+def to_python(model, name, value):
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:   # annotate 된 값 (예: 검색 유사도)
+        field = None
+
+    try:
+        if field is None:
+            value = float(value)
+        elif isinstance(field, models.DateTimeField):
+            value = parse_datetime(value)
+        else:
+            value = field.to_python(value)
+    except (ValueError, TypeError, ValidationError):
+        value = None
+
+    if value is None:
+        raise InvalidCursor('유효하지 않은 cursor 입니다.')
+    return value
+
+
+def paginate_by_cursor(queryset, ordering, cursor=None, page_size=20):
+    # OFFSET 대신 마지막 행의 정렬 키 값으로 다음 페이지를 찾는다. (keyset pagination)
+    page_size = min(max(page_size or 1, 1), MAX_PAGE_SIZE)
+
+    if cursor:
+        queryset = queryset.filter(get_keyset_filter(
+            queryset.model, ordering, decode_cursor(cursor, ordering)))
+
+    items = list(queryset.order_by(*ordering)[:page_size + 1])
+    if len(items) <= page_size:
+        return items, None
+
+    items = items[:page_size]
+    last_item = items[-1]
+    next_cursor = encode_cursor(
+        ordering, [getattr(last_item, field.lstrip('-')) for field in ordering])
+
+    return items, next_cursor
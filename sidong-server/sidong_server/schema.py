@@ -3,7 +3,7 @@ import graphql_jwt
 import art.schema
 import file.schema
 import user.schema
-from django.db.models import Q
+from sidong_server.search import search
 from user.models import Artist
 from art.models import Art
 
@@ -24,9 +24,9 @@ class SearchQuery(ObjectType):
 
         return {
             'result': True,
-            'art_count': Art.objects.filter(name__icontains=word).count(),
-            'artist_count': Artist.objects.filter(
-                Q(real_name__icontains=word) | Q(artist_name__icontains=word)).count(),
+            'art_count': search(Art.objects.all(), ['name'], word).count(),
+            'artist_count': search(
+                Artist.objects.all(), user.schema.ARTIST_SEARCH_FIELDS, word).count(),
         }
 
 
@@ -39,7 +39,7 @@ class Query(SearchQuery,
     pass
 
 
-class Mutation(art.schema.Mutation, user.schema.Mutation, ObjectType):
+class Mutation(art.schema.Mutation, file.schema.Mutation, user.schema.Mutation, ObjectType):
     token_auth = graphql_jwt.ObtainJSONWebToken.Field()
     verify_token = graphql_jwt.Verify.Field()
     refresh_token = graphql_jwt.Refresh.Field()
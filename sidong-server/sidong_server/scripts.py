@@ -23,7 +23,7 @@ def artAutoCreate():
     technique = Technique.objects.get(id=3)
     for user in range(1, 30):
         artist = Artist.objects.get(id=user)
-        Art.objects.create(
+        art = Art.objects.create(
             artist=artist,
             name=artist.artist_name + "의 test 작품",
             description="test 작품 description",
@@ -38,8 +38,8 @@ def artAutoCreate():
             size="medium",
             width=130,
             height=110,
-            images=[20, 21],
         )
+        set_art_images(art.id, [20, 21])
 
 
 def send_email_test():
@@ -0,0 +1,41 @@
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import CharField, FloatField, Q, TextField, Transform
+from django.db.models.functions import Cast, Greatest
+
+# pg_trgm 은 3글자 단위로 인덱스를 만들기 때문에, 그보다 짧은 검색어(예: 2글자 한글 이름)는
+# search_ngrams() 로 만든 1~2글자 n-gram 배열 GIN 인덱스로 찾는다.
+# 인덱스 정의는 user/migrations/0017_search_indexes.py, art/migrations/0008_search_indexes.py 참고.
+MIN_TRIGRAM_LENGTH = 3
+
+SEARCH_ORDERING = ['-search_rank', '-id']
+
+
+@CharField.register_lookup
+class SearchNgrams(Transform):
+    lookup_name = 'search_ngrams'
+    function = 'search_ngrams'
+    output_field = ArrayField(TextField())
+
+
+def search(queryset, fields, word):
+    word = word.strip()
+
+    search_filter = Q()
+    if len(word) < MIN_TRIGRAM_LENGTH:
+        for field in fields:
+            search_filter |= Q(
+                **{field + '__search_ngrams__contains': [word.upper()]})
+    else:
+        for field in fields:
+            search_filter |= Q(**{field + '__icontains': word})
+
+    return queryset.filter(search_filter)
+
+
+def rank(queryset, fields, word):
+    similarities = [TrigramSimilarity(field, word.strip()) for field in fields]
+    search_rank = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+
+    # similarity() 는 real 을 돌려주는데, cursor 로 왕복할 때 값이 달라지지 않도록 double 로 바꾼다.
+    return queryset.annotate(search_rank=Cast(search_rank, FloatField()))
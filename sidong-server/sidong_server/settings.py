@@ -31,8 +31,41 @@ SESSION_COOKIE_SECURE = bool(os.environ.get("SESSION_COOKIE_SECURE", False))
 AWS_ACCESS_KEY_ID = os.environ.get("SIDONG_AWS_ACCESS_KEY")
 AWS_SECRET_ACCESS_KEY = os.environ.get("SIDONG_AWS_SECRET_ACCESS_KEY")
 
+# 파일 저장소. 로컬 테스트/벤치마크에서는 file.storage.LocalStorage 를 사용한다.
+FILE_STORAGE_BACKEND = os.environ.get(
+    "FILE_STORAGE_BACKEND", "file.storage.S3Storage")
+FILE_STORAGE_LOCAL_ROOT = os.environ.get(
+    "FILE_STORAGE_LOCAL_ROOT", os.path.join(BASE_DIR, 'storage/'))
+FILE_STORAGE_LOCAL_URL = os.environ.get(
+    "FILE_STORAGE_LOCAL_URL", "http://localhost:8000/storage/")
+S3_MAX_POOL_CONNECTIONS = int(os.environ.get("S3_MAX_POOL_CONNECTIONS", 20))
+S3_CONNECT_TIMEOUT = int(os.environ.get("S3_CONNECT_TIMEOUT", 5))
+S3_READ_TIMEOUT = int(os.environ.get("S3_READ_TIMEOUT", 30))
+# 파일 경로가 내용의 SHA-256 이라서 한 번 올라간 객체는 바뀌지 않는다.
+FILE_CACHE_CONTROL = os.environ.get(
+    "FILE_CACHE_CONTROL", "public, max-age=31536000, immutable")
+# 이 크기보다 큰 파일은 S3 multipart 로 part 단위로 나눠서 업로드한다.
+S3_MULTIPART_THRESHOLD = int(os.environ.get("S3_MULTIPART_THRESHOLD", 8 * 1024 * 1024))
+S3_MULTIPART_PART_SIZE = int(os.environ.get("S3_MULTIPART_PART_SIZE", 5 * 1024 * 1024))
+# 업로드할 수 있는 이미지의 최대 픽셀 수 (가로 x 세로)
+MAX_IMAGE_PIXELS = int(os.environ.get("MAX_IMAGE_PIXELS", 50000000))
+# 업로드한 이미지로 만드는 리사이즈 이미지 포맷 (WEBP 또는 JPEG)
+IMAGE_VARIANT_FORMAT = os.environ.get("IMAGE_VARIANT_FORMAT", "WEBP")
+IMAGE_VARIANT_QUALITY = int(os.environ.get("IMAGE_VARIANT_QUALITY", 80))
+# requestUploadSlots 로 받은 업로드 URL/토큰의 유효 시간(초)
+FILE_UPLOAD_SLOT_MAX_AGE = int(os.environ.get("FILE_UPLOAD_SLOT_MAX_AGE", 900))
+# 한 번에 저장소로 동시에 업로드할 수 있는 파일 수 (프로세스 전체)
+FILE_UPLOAD_MAX_WORKERS = int(os.environ.get("FILE_UPLOAD_MAX_WORKERS", 8))
+
 IMP_ACCESS_KEY = os.environ.get("IMP_ACCESS_KEY")
 IMP_SECRET_ACCESS_KEY = os.environ.get("IMP_SECRET_ACCESS_KEY")
+IMP_API_URL = os.environ.get("IMP_API_URL", "https://api.iamport.kr")
+TOAST_API_URL = os.environ.get("TOAST_API_URL", "https://api-sms.cloud.toast.com")
+# 토큰 만료(expired_at) 몇 초 전부터 새 토큰을 받을지
+IMP_TOKEN_EXPIRY_MARGIN = int(os.environ.get("IMP_TOKEN_EXPIRY_MARGIN", 60))
+# 토큰을 받는 동안 잡는 lock 의 유지 시간(초). gateway 가 재시도까지 다 쓰는 시간보다 짧으면
+# 그 시간에 여유를 더한 값을 대신 쓴다.
+IMP_TOKEN_LOCK_TIMEOUT = int(os.environ.get("IMP_TOKEN_LOCK_TIMEOUT", 30))
 
 TOAST_APP_KEY = os.environ.get("TOAST_APP_KEY")
 NAVER_CLOUD_SERVICE_ID = os.environ.get("NAVER_CLOUD_SERVICE_ID")
@@ -141,6 +174,36 @@ AUTHENTICATION_BACKENDS = [
 ]
 
 PHONENUMBER_DEFAULT_REGION = "KR"
+
+# 외부 API(iamport, Toast) 호출 (sidong_server/gateway.py)
+GATEWAY_POOL_SIZE = int(os.environ.get("GATEWAY_POOL_SIZE", 10))
+GATEWAY_MAX_RETRIES = int(os.environ.get("GATEWAY_MAX_RETRIES", 2))
+GATEWAY_RETRY_BACKOFF = float(os.environ.get("GATEWAY_RETRY_BACKOFF", 0.2))
+
+# 문자 outbox 발송 (python manage.py dispatch_notifications)
+NOTIFICATION_MAX_ATTEMPTS = int(os.environ.get("NOTIFICATION_MAX_ATTEMPTS", 5))
+NOTIFICATION_RETRY_BACKOFF = float(os.environ.get("NOTIFICATION_RETRY_BACKOFF", 30))
+NOTIFICATION_LEASE_SECONDS = int(os.environ.get("NOTIFICATION_LEASE_SECONDS", 300))
+
+# iamport 토큰처럼 worker 끼리 공유해야 하는 값이 있어서 운영에서는 공유 캐시(memcached 등)를 쓴다.
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    }
+}
+
+# 작품 필터 패널의 항목별 개수(artFacets) 캐시 시간(초)
+ART_FACETS_CACHE_TIMEOUT = int(os.environ.get("ART_FACETS_CACHE_TIMEOUT", 60))
+
+# reserveArt 로 작품을 잡아두는 시간(분). 이 시간 안에 결제를 마쳐야 한다.
+ART_RESERVATION_MINUTES = int(os.environ.get("ART_RESERVATION_MINUTES", 10))
+# 예약을 연장해도 처음 예약한 때부터 이 시간(분)을 넘기지 못한다.
+ART_RESERVATION_MAX_MINUTES = int(os.environ.get("ART_RESERVATION_MAX_MINUTES", 30))
+
+# Theme/Style/Technique 메모리 캐시를 다시 읽는 주기(초). 같은 프로세스의 변경은 signal 로 바로 반영된다.
+TAXONOMY_MAX_AGE = int(os.environ.get("TAXONOMY_MAX_AGE", 600))
 CORS_ALLOWED_ORIGIN_REGEXES = [
     r"^https://\w+\.jakupteo\.com$",
 ]
@@ -1,10 +1,19 @@
+from django.conf import settings
+from django.conf.urls.static import static
 from django.urls import path
 from django.contrib import admin
 from graphene_file_upload.django import FileUploadGraphQLView
 from sidong_server import apis
+from file import views as file_views
 
 urlpatterns = [
     path("admin", admin.site.urls),
     path("graphql", FileUploadGraphQLView.as_view(graphiql=True)),
     path("api/create/order", apis.create_order_on_mobile),
 ]
+
+if settings.FILE_STORAGE_BACKEND == "file.storage.LocalStorage":
+    urlpatterns += [
+        path("storage/upload/<str:token>", file_views.upload_to_local_storage),
+    ]
+    urlpatterns += static("/storage/", document_root=settings.FILE_STORAGE_LOCAL_ROOT)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from user.models import Artist, UserInfo, Order, Payment, Refund
+from user.models import Artist, UserInfo, Order, Payment, Refund, Notification
 
 
 class ArtistAdmin(admin.ModelAdmin):
@@ -22,8 +22,14 @@ class RefundAdmin(admin.ModelAdmin):
     pass
 
 
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'recipient', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'kind')
+
+
 admin.site.register(Artist, ArtistAdmin)
 admin.site.register(UserInfo, UserInfoAdmin)
 admin.site.register(Order, OrderAdmin)
 admin.site.register(Payment, PaymentAdmin)
 admin.site.register(Refund, RefundAdmin)
+admin.site.register(Notification, NotificationAdmin)
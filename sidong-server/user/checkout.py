@@ -0,0 +1,201 @@
+import logging
+from django.db import transaction
+from django.utils import timezone
+from phonenumber_field.phonenumber import to_python
+from art.models import Art
+from user.models import Order, Payment
+from user.func import create_order, create_payment, request_cancel_payment, \
+    update_or_create_userinfo, validate_payment
+from user.notifications import enqueue_sms, enqueue_lms
+
+# 주문은 단계별로 처리한다.
+# 0. 결제창을 열기 전에 reserveArt 로 작품을 잡아둔다. (art/reservations.py)
+# 1. 트랜잭션 밖에서 iamport 결제 정보를 확인한다. (외부 호출 동안 DB 연결/잠금을 잡지 않는다.)
+# 2. 짧은 트랜잭션에서 작품 행을 잠그고 판매 상태와 예약을 다시 확인한 뒤 주문/결제/판매 완료를 저장한다.
+# 3. 그 사이 다른 주문이 먼저 끝났거나 예약 시간이 지났으면 트랜잭션이 끝난 뒤 결제를 취소한다.
+# 같은 imp_uid 로 다시 온 요청은 iamport 를 부르지 않고 저장된 주문을 돌려준다.
+# 같은 idempotency key 로 다른 결제가 오면(중복 결제) 새 결제를 확인한 뒤 취소한다.
+
+logger = logging.getLogger(__name__)
+
+
+class CheckoutError(Exception):
+    pass
+
+
+def get_phone_number(phone):
+    # 문자 수신 번호(국내 번호, 앞자리 0 제외)로 바꾼다. 올바른 번호가 아니면 None
+    phone_number = to_python(phone)
+    if not phone_number or not phone_number.is_valid():
+        return None
+    return str(phone_number.national_number)
+
+
+def get_short_art_name(art_name):
+    return art_name[:8] + '..' if len(art_name) > 8 else art_name
+
+
+def enqueue_order_notifications(order, phone_number):
+    art_name = get_short_art_name(order.art_name)
+    order_id = str(order.id)
+
+    # 고객 안내
+    enqueue_lms([phone_number],
+                "[작업터] 주문 완료\n" +
+                "- 주문번호: " + order_id + "\n" +
+                "- 작품명: " + art_name + "\n" +
+                "작품 주문 감사합니다.\n" +
+                "작가분이 배송 준비할 예정입니다.\n" +
+                "배송 진행 상황을 문자로 안내드리겠습니다.\n" +
+                "작업터를 이용해주셔서 감사합니다. :)"
+                )
+    # 작가 안내 (전화번호를 등록하지 않은 작가는 건너뛴다.)
+    artist_phone_number = get_phone_number(order.artist.phone)
+    if artist_phone_number:
+        enqueue_lms([artist_phone_number],
+                    "[작업터] 작품 판매 안내\n" +
+                    "- 주문번호: " + order_id + "\n" +
+                    "- 작품명: " + art_name + "\n" +
+                    "작품이 판매되었습니다. :)\n" +
+                    "배송 준비 부탁드립니다.\n\n" +
+                    "[필독 사항]\n" +
+                    "* 판매 관리에서 '배송 준비중' 으로 상태 변경 부탁드립니다.\n" +
+                    "* '작품보증서'를 작품과 함께 배송하셔야 합니다.\n" +
+                    "* 작품보증서 양식은 '판매 관리' 메뉴에서 다운로드 가능합니다.\n\n" +
+                    "작품 판매를 축하드립니다. 작품이 안전히 구매자에게 전달될 수 있도록 꼼꼼한 포장 부탁드립니다 :)"
+                    )
+    # 관리자 안내
+    enqueue_sms(["01027251365"], """
+        [주문 접수]\n{order_id}: {art_name}
+    """.format(order_id=order_id, art_name=art_name))
+
+
+def find_processed_order(user, imp_uid):
+    # unique_paid_transaction 인덱스로 같은 결제로 저장된 주문을 찾는다. 처음 온 결제면 None
+    payment = Payment.objects.filter(
+        transaction_id=imp_uid, status='paid').select_related('order__userinfo').first()
+    if payment is None:
+        return None
+
+    order = payment.order
+    if order is None or order.userinfo is None or order.userinfo.user_id != user.id:
+        return (False, '이미 처리된 결제입니다.')
+    return (True, order)
+
+
+def is_used_idempotency_key(user, idempotency_key):
+    # 같은 key 로 이미 (다른 결제로) 주문을 저장했는지 확인한다.
+    return bool(idempotency_key) and Order.objects.filter(
+        userinfo__user=user, idempotency_key=idempotency_key).exists()
+
+
+def save_order(art_id, user, name, phone, address,
+               recipient_address, recipient_name, recipient_phone, payment_info,
+               idempotency_key=None):
+    phone_number = get_phone_number(phone)
+    if phone_number is None:
+        return (False, '전화번호가 올바르지 않습니다.')
+
+    try:
+        with transaction.atomic():
+            art = Art.objects.select_for_update().get(id=art_id)
+            # 결제를 확인하는 동안 다른 주문이 먼저 끝났거나 가격이 바뀌었을 수 있다.
+            if art.sale_status != Art.ON_SALE:
+                return (False, '이미 판매된 작품입니다.')
+            # reserveArt 로 잡아둔 사람만 예약 시간 안에 주문할 수 있다.
+            # (release_art_reservations 가 만료된 예약을 푸는 시점과 관계없이 결과가 같다.)
+            if art.reserved_by_id != user.id or art.reserved_until < timezone.now():
+                return (False, '작품 예약 시간이 지났습니다.')
+            if payment_info['amount'] != art.price + art.delivery_fee:
+                return (False, '작품 가격이 변경되었습니다.')
+
+            userinfo = update_or_create_userinfo(user, name, phone, address)
+
+            result_of_create_order, msg_or_order = create_order(
+                art, userinfo, recipient_address, recipient_name, recipient_phone,
+                idempotency_key)
+            if result_of_create_order is False:
+                raise CheckoutError(msg_or_order)
+
+            result_of_create_payment, msg = create_payment(payment_info, msg_or_order)
+            if result_of_create_payment is False:
+                raise CheckoutError(msg)
+
+            msg_or_order.status = Order.SUCCESS
+            msg_or_order.save()
+
+            art.sale_status = Art.SOLD_OUT
+            art.reserved_by = None
+            art.reserved_at = None
+            art.reserved_until = None
+            art.save()
+
+            # outbox 에 쌓는 것이라 주문과 함께 commit 된다.
+            enqueue_order_notifications(msg_or_order, phone_number)
+    except CheckoutError as error:
+        return (False, str(error))
+    except Exception:
+        # 결제는 끝났으므로 어떤 이유로든 저장하지 못하면 checkout 에서 결제를 취소한다.
+        logger.exception('could not save order of art %s', art_id)
+        return (False, '주문 저장 중 문제가 발생했습니다.')
+
+    return (True, msg_or_order)
+
+
+def checkout(art_id, user, name, phone, address,
+             recipient_address, recipient_name, recipient_phone, imp_uid,
+             idempotency_key=None):
+    idempotency_key = idempotency_key or None
+    if idempotency_key and len(idempotency_key) > Order._meta.get_field('idempotency_key').max_length:
+        return (False, '주문 요청 정보가 올바르지 않습니다.')
+
+    processed = find_processed_order(user, imp_uid)
+    if processed is not None:
+        return processed
+
+    try:
+        art = Art.objects.get(id=art_id)
+    except Art.DoesNotExist:
+        return (False, '작품 정보가 없습니다.')
+
+    # 중복 결제는 작품이 이미 팔렸어도 확인해서 취소해야 한다.
+    is_duplicate_payment = is_used_idempotency_key(user, idempotency_key)
+    if art.sale_status != Art.ON_SALE and not is_duplicate_payment:
+        return (False, '판매 중인 작품이 아닙니다.')
+
+    result_of_payment, msg_or_payment_info = validate_payment(
+        imp_uid, art.price+art.delivery_fee)
+
+    if result_of_payment is False:
+        return (False, msg_or_payment_info)
+
+    if is_duplicate_payment:
+        # 같은 주문 요청이 다른 결제로 이미 처리됐으므로 이번 결제는 취소한다.
+        result_of_save_order, msg_or_order = (False, '이미 처리된 주문 요청입니다.')
+    else:
+        result_of_save_order, msg_or_order = save_order(
+            art_id, user, name, phone, address,
+            recipient_address, recipient_name, recipient_phone, msg_or_payment_info,
+            idempotency_key)
+
+    if result_of_save_order is True:
+        return (True, msg_or_order)
+
+    # 같은 결제로 온 다른 요청이 먼저 주문을 저장했다면 결제를 취소하지 않고 그 주문을 돌려준다.
+    # (작품 행 잠금을 기다린 뒤라 먼저 끝난 요청의 결과가 보인다.) 같은 key 라도 결제가 다르면 취소한다.
+    processed = find_processed_order(user, imp_uid)
+    if processed is not None:
+        return processed
+
+    # 결제는 됐지만 주문을 저장하지 못했으므로 트랜잭션이 끝난 뒤 결제를 취소한다.
+    result_of_cancel, msg = request_cancel_payment(
+        msg_or_payment_info['imp_uid'], msg_or_payment_info['amount'])
+
+    if result_of_cancel is False:
+        # 관리자 안내
+        enqueue_sms(["01027251365"], """
+            [결제 취소 실패]\nimp_uid: {imp_uid}\n{msg}
+        """.format(imp_uid=imp_uid, msg=msg))
+        return (False, msg_or_order + '\n결제 취소가 지연되고 있어 확인 후 환불해드리겠습니다.')
+
+    return (False, msg_or_order + '\n결제는 취소되었습니다.')
@@ -1,52 +1,119 @@
-import requests
 import datetime
+import math
+import time
+import uuid
 import pytz
 from django.conf import settings
+from django.core.cache import cache
+from sidong_server import gateway
 from user.models import Payment, UserInfo, Order
+from user.notifications import enqueue_sms
 
 
-def send_sms(recipient_list, content):
-    try:
-        requests.post(
-            'https://api-sms.cloud.toast.com/sms/v2.4/appKeys/' +
-            settings.TOAST_APP_KEY+'/sender/sms',
-            json={
-                "body": content,
-                "sendNo": "01027251365",
-                "recipientList": recipient_list,
-            }
-        )
-    except:
-        # TODO: 문자 전송 실패 에러 처리
-        pass
+IMP_TOKEN_CACHE_KEY = 'iamport:access_token'
+IMP_TOKEN_LOCK_KEY = 'iamport:access_token:lock'
+# lock 값이 내 것일 때만 지운다. (redis 에서 비교와 삭제를 한 번에 하기 위한 script)
+IMP_TOKEN_UNLOCK_SCRIPT = (
+    "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end "
+    "return 0")
 
 
-def send_lms(recipient_list, content):
+def request_access_token_of_imp():
     try:
-        requests.post(
-            'https://api-sms.cloud.toast.com/sms/v2.4/appKeys/' +
-            settings.TOAST_APP_KEY+'/sender/mms',
-            json={
-                "title": "작업터 안내 문자",
-                "body": content,
-                "sendNo": "01027251365",
-                "recipientList": recipient_list,
-            }
-        )
+        response = gateway.request(
+            'iamport.token', 'POST', settings.IMP_API_URL + '/users/getToken', json={
+                'imp_key': settings.IMP_ACCESS_KEY,
+                'imp_secret': settings.IMP_SECRET_ACCESS_KEY,
+            })
+        return response.json()['response']
     except:
-        # TODO: 문자 전송 실패 에러 처리
-        pass
+        return None
+
+
+def get_cached_access_token_of_imp():
+    token = cache.get(IMP_TOKEN_CACHE_KEY)
+    if token and token['expired_at'] - time.time() > settings.IMP_TOKEN_EXPIRY_MARGIN:
+        return token['access_token']
+    return None
+
+
+def get_imp_token_lock_timeout():
+    # lock 이 토큰 요청 중에 만료되면 다른 요청도 토큰을 받으러 가므로,
+    # gateway 가 재시도까지 다 쓰는 시간보다 넉넉히 길게 잡는다.
+    max_duration = math.ceil(gateway.get_max_duration('iamport.token')) + 5
+    return max(settings.IMP_TOKEN_LOCK_TIMEOUT, max_duration)
+
+
+def release_imp_token_lock(lock_token):
+    client = getattr(cache, 'client', None)
+    if hasattr(client, 'get_client'):
+        # django-redis 면 비교와 삭제를 lua script 로 한 번에 한다.
+        client.get_client(write=True).eval(
+            IMP_TOKEN_UNLOCK_SCRIPT, 1,
+            client.make_key(IMP_TOKEN_LOCK_KEY), client.encode(lock_token))
+        return
+    # 그 외의 cache 는 get 과 delete 사이에 lock 이 만료되어 다른 요청이 잡을 수 있어서 best-effort 다.
+    # lock timeout 을 토큰 요청의 최대 시간보다 길게 잡아서 그 사이에 만료되지 않게 한다.
+    if cache.get(IMP_TOKEN_LOCK_KEY) == lock_token:
+        cache.delete(IMP_TOKEN_LOCK_KEY)
 
 
 def get_access_token_of_imp():
+    # iamport 토큰은 만료 직전까지 캐시해서 여러 worker 가 같이 쓴다.
+    # 만료되면 lock 을 잡은 한 요청만 새 토큰을 받고, 나머지는 캐시에 들어올 때까지 기다린다.
+    access_token = get_cached_access_token_of_imp()
+    if access_token:
+        return access_token
+
+    # lock 이 만료된 뒤 다른 요청이 잡은 lock 을 지우지 않도록 각자 다른 값을 넣는다.
+    lock_token = uuid.uuid4().hex
+    lock_timeout = get_imp_token_lock_timeout()
+    deadline = time.monotonic() + lock_timeout
+    while not cache.add(IMP_TOKEN_LOCK_KEY, lock_token, lock_timeout):
+        time.sleep(0.05)
+        access_token = get_cached_access_token_of_imp()
+        if access_token:
+            return access_token
+        if time.monotonic() > deadline:
+            # lock 을 잡은 요청이 응답을 못 받고 있으면 직접 받는다.
+            token = request_access_token_of_imp()
+            return token['access_token'] if token else None
+
     try:
-        response = requests.post('https://api.iamport.kr/users/getToken', json={
-            'imp_key': settings.IMP_ACCESS_KEY,
-            'imp_secret': settings.IMP_SECRET_ACCESS_KEY,
-        })
-        return response.json()['response']['access_token']
-    except:
-        return None
+        access_token = get_cached_access_token_of_imp()
+        if access_token:
+            return access_token
+
+        token = request_access_token_of_imp()
+        if not token:
+            return None
+
+        timeout = token['expired_at'] - time.time() - settings.IMP_TOKEN_EXPIRY_MARGIN
+        if timeout > 0:
+            cache.set(IMP_TOKEN_CACHE_KEY, {
+                'access_token': token['access_token'],
+                'expired_at': token['expired_at'],
+            }, timeout)
+        return token['access_token']
+    finally:
+        release_imp_token_lock(lock_token)
+
+
+def invalidate_access_token_of_imp():
+    cache.delete(IMP_TOKEN_CACHE_KEY)
+
+
+def request_imp(endpoint, method, path, **kwargs):
+    # 캐시된 토큰이 iamport 쪽에서 먼저 만료됐으면(401) 새 토큰으로 한 번 더 요청한다.
+    response = gateway.request(endpoint, method, settings.IMP_API_URL + path, headers={
+        'Authorization': get_access_token_of_imp(),
+    }, **kwargs)
+    if response.status_code == 401:
+        invalidate_access_token_of_imp()
+        response = gateway.request(endpoint, method, settings.IMP_API_URL + path, headers={
+            'Authorization': get_access_token_of_imp(),
+        }, **kwargs)
+    return response
 
 
 def update_or_create_userinfo(user, name, phone, address):
@@ -61,7 +128,8 @@ def update_or_create_userinfo(user, name, phone, address):
     return userinfo
 
 
-def create_order(art, userinfo, recipient_address, recipient_name, recipient_phone):
+def create_order(art, userinfo, recipient_address, recipient_name, recipient_phone,
+                 idempotency_key=None):
     try:
         order = Order.objects.create(
             userinfo=userinfo,
@@ -73,20 +141,19 @@ def create_order(art, userinfo, recipient_address, recipient_name, recipient_pho
             recipient_name=recipient_name,
             recipient_phone=recipient_phone,
             status=Order.WAIT,
+            idempotency_key=idempotency_key,
         )
         return (True, order)
     except Exception as error:
-        return (False, '주문(Order) 생성 중에 문제가 발생했습니다.\n' + error)
+        return (False, '주문(Order) 생성 중에 문제가 발생했습니다.\n' + str(error))
 
 
 def validate_payment(imp_uid, price):
     try:
-        response = requests.get('https://api.iamport.kr/payments/'+imp_uid, headers={
-            'Authorization': get_access_token_of_imp(),
-        })
+        response = request_imp('iamport.payment', 'GET', '/payments/'+imp_uid)
         payment_info = response.json()['response']
     except Exception as error:
-        return (False, '결제 정보 확인 중 문제가 발생했습니다.\n' + error)
+        return (False, '결제 정보 확인 중 문제가 발생했습니다.\n' + str(error))
 
     if not payment_info:
         return (False, '결제 정보가 없습니다.')
@@ -97,7 +164,7 @@ def validate_payment(imp_uid, price):
     if payment_info.get('amount') != price:
         # TODO: 결제 취소
         # 관리자 안내
-        send_sms([{"recipientNo": "01027251365"}], """
+        enqueue_sms(["01027251365"], """
             [결제 금액 불일치]\nimp_uid: {imp_uid}
         """.format(imp_uid=imp_uid))
 
@@ -119,7 +186,27 @@ def create_payment(payment_info, order):
         )
         return (True, '')
     except Exception as error:
-        return (False, '결제(Payment) 생성 중에 문제가 발생했습니다.\n' + error)
+        return (False, '결제(Payment) 생성 중에 문제가 발생했습니다.\n' + str(error))
+
+
+def request_cancel_payment(imp_uid, amount):
+    try:
+        response = request_imp(
+            'iamport.cancel',
+            'POST',
+            '/payments/cancel',
+            json={
+                'imp_uid': imp_uid,
+                'checksum': amount,
+            }
+        ).json()
+    except Exception as error:
+        return (False, '결제 취소 중 문제가 발생했습니다.\n' + str(error))
+
+    if response['code'] != 0:
+        return (False, response['message'])
+
+    return (True, response['response'])
 
 
 def cancel_payment(payment_id):
@@ -128,33 +215,23 @@ def cancel_payment(payment_id):
     if payment.status != 'paid':
         return (False, '결제 완료된 주문이 아닙니다.\n주문 상태를 확인 바랍니다.')
 
-    try:
-        response = requests.post(
-            'https://api.iamport.kr/payments/cancel',
-            headers={
-                'Authorization': get_access_token_of_imp(),
-            },
-            json={
-                'imp_uid': payment.transaction_id,
-                'checksum': payment.amount,
-            }
-        ).json()
-
-        if response['code'] != 0:
-            return (False, response['message'])
+    result_of_cancel, msg_or_cancel_result = request_cancel_payment(
+        payment.transaction_id, payment.amount)
 
-        cancel_result = response['response']
+    if result_of_cancel is False:
+        return (False, msg_or_cancel_result)
 
+    try:
         Payment.objects.create(
             transacted_at=datetime.datetime.fromtimestamp(
-                cancel_result['cancelled_at'], pytz.timezone('Asia/Seoul')),
-            transaction_id=cancel_result['imp_uid'],
+                msg_or_cancel_result['cancelled_at'], pytz.timezone('Asia/Seoul')),
+            transaction_id=msg_or_cancel_result['imp_uid'],
             order=payment.order,
-            status=cancel_result['status'],
-            amount=cancel_result['cancel_amount'],
-            pay_method=cancel_result['pay_method'],
+            status=msg_or_cancel_result['status'],
+            amount=msg_or_cancel_result['cancel_amount'],
+            pay_method=msg_or_cancel_result['pay_method'],
         )
 
         return (True, '')
     except Exception as error:
-        return (False, '결제 취소 중 문제가 발생했습니다.\n' + error)
+        return (False, '결제 취소 중 문제가 발생했습니다.\n' + str(error))
@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from user.notifications import dispatch_notifications
+
+
+class Command(BaseCommand):
+    help = 'outbox(Notification)에 쌓인 문자를 Toast 로 보냅니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--interval', type=float, default=1,
+            help='보낼 문자가 없을 때 다시 확인하기까지 기다리는 시간(초)')
+        parser.add_argument(
+            '--once', action='store_true', help='지금 보낼 문자만 보내고 끝냅니다.')
+
+    def handle(self, *args, **options):
+        while True:
+            sent_count, failed_count = dispatch_notifications(options['batch_size'])
+            if sent_count or failed_count:
+                self.stdout.write('{0} sent, {1} failed'.format(sent_count, failed_count))
+
+            if sent_count + failed_count >= options['batch_size']:
+                continue
+            if options['once']:
+                return
+            time.sleep(options['interval'])
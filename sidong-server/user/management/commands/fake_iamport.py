@@ -0,0 +1,131 @@
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from django.core.management.base import BaseCommand
+
+# 결제 금액은 imp_uid 끝의 숫자로 정한다. (예: imp_fake_150000 -> 150000원 결제)
+IMP_UID_AMOUNT_PATTERN = re.compile(r'(\d+)$')
+
+
+class FakeIamport(object):
+    def __init__(self, token_ttl, token_delay):
+        self.token_ttl = token_ttl
+        self.token_delay = token_delay
+        self.lock = threading.Lock()
+        self.tokens = {}
+        self.calls = {}
+
+    def count(self, name):
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def issue_token(self):
+        time.sleep(self.token_delay)
+        access_token = uuid.uuid4().hex
+        expired_at = int(time.time()) + self.token_ttl
+        with self.lock:
+            self.tokens[access_token] = expired_at
+        return {'access_token': access_token, 'expired_at': expired_at, 'now': int(time.time())}
+
+    def is_valid_token(self, access_token):
+        with self.lock:
+            return self.tokens.get(access_token, 0) > time.time()
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def make_handler(iamport, stdout):
+    class FakeIamportHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            stdout.write(format % args)
+
+        def send_json(self, status, body):
+            content = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def read_json(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            return json.loads(self.rfile.read(length) or b'{}')
+
+        def is_authorized(self):
+            if iamport.is_valid_token(self.headers.get('Authorization')):
+                return True
+            self.send_json(401, {'code': -1, 'message': 'Unauthorized', 'response': None})
+            return False
+
+        def do_GET(self):
+            if self.path == '/__stats':
+                return self.send_json(200, iamport.calls)
+
+            match = re.match(r'^/payments/([\w-]+)$', self.path)
+            if not match:
+                return self.send_json(404, {'code': -1, 'message': 'Not Found'})
+
+            iamport.count('payments')
+            if not self.is_authorized():
+                return
+            imp_uid = match.group(1)
+            amount = IMP_UID_AMOUNT_PATTERN.search(imp_uid)
+            self.send_json(200, {'code': 0, 'message': None, 'response': {
+                'imp_uid': imp_uid,
+                'status': 'paid',
+                'amount': int(amount.group(1)) if amount else 0,
+                'paid_at': int(time.time()),
+                'pay_method': 'card',
+            }})
+
+        def do_POST(self):
+            if self.path == '/users/getToken':
+                iamport.count('getToken')
+                return self.send_json(200, {
+                    'code': 0, 'message': None, 'response': iamport.issue_token()})
+
+            if self.path == '/payments/cancel':
+                iamport.count('cancel')
+                if not self.is_authorized():
+                    return
+                body = self.read_json()
+                return self.send_json(200, {'code': 0, 'message': None, 'response': {
+                    'imp_uid': body.get('imp_uid'),
+                    'status': 'cancelled',
+                    'cancel_amount': body.get('checksum') or 0,
+                    'cancelled_at': int(time.time()),
+                    'pay_method': 'card',
+                }})
+
+            self.send_json(404, {'code': -1, 'message': 'Not Found'})
+
+    return FakeIamportHandler
+
+
+class Command(BaseCommand):
+    help = '로컬 테스트용 가짜 iamport API 서버를 띄웁니다. (IMP_API_URL=http://127.0.0.1:<port>)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument(
+            '--token-ttl', type=int, default=1800, help='발급한 토큰의 유효 시간(초)')
+        parser.add_argument(
+            '--token-delay', type=float, default=0, help='토큰 발급 응답을 늦출 시간(초)')
+
+    def handle(self, *args, **options):
+        iamport = FakeIamport(options['token_ttl'], options['token_delay'])
+        server = ThreadingHTTPServer(
+            ('127.0.0.1', options['port']), make_handler(iamport, self.stdout))
+        self.stdout.write('fake iamport listening on http://127.0.0.1:{0}'.format(options['port']))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
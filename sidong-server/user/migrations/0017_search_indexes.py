@@ -0,0 +1,41 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0016_artist_account'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunSQL(
+            """
+            CREATE OR REPLACE FUNCTION search_ngrams(value text) RETURNS text[] AS $$
+                SELECT COALESCE(array_agg(DISTINCT substr(upper(value), i, n)), '{}')
+                FROM generate_series(1, char_length(value)) AS i, (VALUES (1), (2)) AS sizes(n)
+                WHERE i + n - 1 <= char_length(value)
+            $$ LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE;
+            """,
+            "DROP FUNCTION IF EXISTS search_ngrams(text);",
+        ),
+        migrations.RunSQL(
+            [
+                "CREATE INDEX user_artist_real_name_trgm ON user_artist "
+                "USING gin ((UPPER(real_name::text)) gin_trgm_ops);",
+                "CREATE INDEX user_artist_real_name_ngrams ON user_artist "
+                "USING gin (search_ngrams(real_name));",
+                "CREATE INDEX user_artist_artist_name_trgm ON user_artist "
+                "USING gin ((UPPER(artist_name::text)) gin_trgm_ops);",
+                "CREATE INDEX user_artist_artist_name_ngrams ON user_artist "
+                "USING gin (search_ngrams(artist_name));",
+            ],
+            [
+                "DROP INDEX IF EXISTS user_artist_real_name_trgm;",
+                "DROP INDEX IF EXISTS user_artist_real_name_ngrams;",
+                "DROP INDEX IF EXISTS user_artist_artist_name_trgm;",
+                "DROP INDEX IF EXISTS user_artist_artist_name_ngrams;",
+            ],
+        ),
+    ]
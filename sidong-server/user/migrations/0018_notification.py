@@ -0,0 +1,33 @@
+# Generated by Django 2.2.10 on 2026-10-18 09:11
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0017_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('kind', models.CharField(choices=[('sms', '단문'), ('lms', '장문')], max_length=8)),
+                ('recipient', models.CharField(max_length=16)),
+                ('body', models.TextField()),
+                ('status', models.PositiveIntegerField(choices=[(0, '대기'), (1, '발송 완료'), (2, '발송 실패')], default=0)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('sent_at', models.DateTimeField(null=True)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(status=0), fields=['next_attempt_at'], name='notification_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 2.2.10 on 2026-10-18 09:15
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_duplicate_paid_transactions(apps, schema_editor):
+    # 같은 결제(imp_uid)로 결제 완료(paid) 행이 여러 개면 unique_paid_transaction 을 만들 수 없다.
+    # 인덱스를 만들다가 실패하지 않도록 먼저 확인하고, 정리해야 할 imp_uid 를 알려준다.
+    Payment = apps.get_model('user', 'Payment')
+    duplicates = list(
+        Payment.objects.filter(status='paid').values('transaction_id').annotate(
+            count=Count('id')).filter(count__gt=1).order_by('transaction_id').values_list(
+            'transaction_id', flat=True))
+    if duplicates:
+        raise RuntimeError(
+            '결제 완료(paid) 상태의 Payment 가 중복된 imp_uid 가 {0}개 있습니다. '
+            '중복 행을 정리(환불 확인 후 status 변경)한 뒤 다시 migrate 해주세요: {1}'.format(
+                len(duplicates), ', '.join(duplicates)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0018_notification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='idempotency_key',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.UniqueConstraint(fields=('userinfo', 'idempotency_key'), name='unique_order_idempotency_key'),
+        ),
+        migrations.RunPython(check_duplicate_paid_transactions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='payment',
+            constraint=models.UniqueConstraint(condition=models.Q(status='paid'), fields=('transaction_id',), name='unique_paid_transaction'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.10 on 2026-10-18 09:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0019_order_idempotency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='locked_until',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='status',
+            field=models.PositiveIntegerField(choices=[(0, '대기'), (1, '발송 완료'), (2, '발송 실패'), (3, '발송 중')], default=0),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(status=3), fields=['locked_until'], name='notification_sending_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.postgres.fields import JSONField
 from django.contrib.auth.models import User
 from phonenumber_field.modelfields import PhoneNumberField
@@ -146,6 +147,14 @@ class Order(models.Model):
     artist = models.ForeignKey(
         Artist, null=True, on_delete=models.SET_NULL, related_name="orders")
     delivery_data = JSONField(null=True)
+    # 클라이언트가 같은 주문 요청을 다시 보낼 때 구분하는 값 (선택, 사용자마다 한 번만 쓸 수 있다.)
+    idempotency_key = models.CharField(max_length=64, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['userinfo', 'idempotency_key'], name='unique_order_idempotency_key'),
+        ]
 
 
 class Payment(models.Model):
@@ -157,6 +166,14 @@ class Payment(models.Model):
     amount = models.IntegerField()
     pay_method = models.CharField(max_length=32)
 
+    class Meta:
+        # 같은 결제(imp_uid)로 주문이 두 번 만들어지지 않도록 한다. 취소 내역은 같은 imp_uid 로 한 줄 더 쌓인다.
+        constraints = [
+            models.UniqueConstraint(
+                fields=['transaction_id'], condition=models.Q(status='paid'),
+                name='unique_paid_transaction'),
+        ]
+
 
 class Refund(models.Model):
     CHANGED_MIND = 0
@@ -178,3 +195,48 @@ class Refund(models.Model):
         Order, null=True, on_delete=models.SET_NULL, related_name='refunds')
     reason = models.PositiveIntegerField(
         choices=CHOICES_OF_REASON, default=CHANGED_MIND)
+
+
+class Notification(models.Model):
+    # 문자 발송 outbox. 주문 처리와 같은 트랜잭션에서 쌓고, dispatch_notifications 가 보낸다.
+    KIND_SMS = 'sms'
+    KIND_LMS = 'lms'
+
+    CHOICES_OF_KIND = [
+        (KIND_SMS, '단문'),
+        (KIND_LMS, '장문'),
+    ]
+
+    PENDING = 0
+    SENT = 1
+    FAILED = 2
+    SENDING = 3
+
+    STATUS_CHOICES = (
+        (PENDING, '대기'),
+        (SENT, '발송 완료'),
+        (FAILED, '발송 실패'),
+        (SENDING, '발송 중'),
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    kind = models.CharField(max_length=8, choices=CHOICES_OF_KIND)
+    recipient = models.CharField(max_length=16)
+    body = models.TextField()
+    status = models.PositiveIntegerField(choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True)
+    last_error = models.TextField(blank=True)
+    # 발송 중(SENDING)인 dispatcher 가 이 시간까지 결과를 저장하지 못하면 다른 dispatcher 가 다시 가져간다.
+    locked_until = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['next_attempt_at'], condition=models.Q(status=0),    # PENDING
+                name='notification_pending_idx'),
+            models.Index(
+                fields=['locked_until'], condition=models.Q(status=3),    # SENDING
+                name='notification_sending_idx'),
+        ]
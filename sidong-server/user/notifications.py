@@ -0,0 +1,137 @@
+import datetime
+from collections import OrderedDict
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from sidong_server import gateway
+from user.models import Notification
+
+# 주문 처리 중에는 outbox(Notification)에 쌓기만 하고, 실제 발송은 dispatch_notifications 가 한다.
+# 문자 서버가 느리거나 실패해도 주문 요청은 기다리지 않는다.
+
+SEND_NO = "01027251365"
+LMS_TITLE = "작업터 안내 문자"
+
+# Toast 는 한 요청에 수신자 1000명까지 보낼 수 있다.
+MAX_RECIPIENTS = 1000
+
+
+def enqueue_notifications(kind, recipients, body):
+    # 호출한 쪽의 트랜잭션 안에서 저장되므로 주문이 rollback 되면 문자도 나가지 않는다.
+    return Notification.objects.bulk_create([
+        Notification(kind=kind, recipient=str(recipient), body=body)
+        for recipient in recipients
+    ])
+
+
+def enqueue_sms(recipients, body):
+    return enqueue_notifications(Notification.KIND_SMS, recipients, body)
+
+
+def enqueue_lms(recipients, body):
+    return enqueue_notifications(Notification.KIND_LMS, recipients, body)
+
+
+def send_message(kind, recipients, body):
+    # 수신자별 결과를 돌려준다. {recipient: None(성공) 또는 실패 사유}
+    json = {
+        "body": body,
+        "sendNo": SEND_NO,
+        "recipientList": [{"recipientNo": recipient} for recipient in recipients],
+    }
+    if kind == Notification.KIND_LMS:
+        json["title"] = LMS_TITLE
+
+    try:
+        response = gateway.request(
+            'toast.message', 'POST',
+            '{0}/sms/v2.4/appKeys/{1}/sender/{2}'.format(
+                settings.TOAST_API_URL, settings.TOAST_APP_KEY,
+                'mms' if kind == Notification.KIND_LMS else 'sms'),
+            json=json,
+        )
+        result = response.json()
+    except (gateway.GatewayError, ValueError) as error:
+        return {recipient: str(error) for recipient in recipients}
+
+    header = result.get('header') or {}
+    if not header.get('isSuccessful'):
+        error = '{0}: {1}'.format(header.get('resultCode'), header.get('resultMessage'))
+        return {recipient: error for recipient in recipients}
+
+    errors = {recipient: None for recipient in recipients}
+    send_results = ((result.get('body') or {}).get('data') or {}).get('sendResultList') or []
+    for send_result in send_results:
+        if send_result.get('resultCode') != 0 and send_result.get('recipientNo') in errors:
+            errors[send_result['recipientNo']] = '{0}: {1}'.format(
+                send_result.get('resultCode'), send_result.get('resultMessage'))
+    return errors
+
+
+def get_retry_at(attempts):
+    delay = settings.NOTIFICATION_RETRY_BACKOFF * (2 ** (attempts - 1))
+    return timezone.now() + datetime.timedelta(seconds=delay)
+
+
+def claim_notifications(batch_size):
+    # 보낼 차례가 된 행과 lease 가 끝난 발송 중 행을 짧은 트랜잭션에서 SENDING 으로 바꿔서 가져간다.
+    # 다른 dispatcher 가 잡고 있는 행은 건너뛴다. (SKIP LOCKED)
+    now = timezone.now()
+    with transaction.atomic():
+        notification_ids = list(
+            Notification.objects.select_for_update(skip_locked=True).filter(
+                Q(status=Notification.PENDING, next_attempt_at__lte=now) |
+                Q(status=Notification.SENDING, locked_until__lt=now),
+            ).order_by('next_attempt_at', 'id').values_list('id', flat=True)[:batch_size])
+        Notification.objects.filter(id__in=notification_ids).update(
+            status=Notification.SENDING,
+            locked_until=now + datetime.timedelta(seconds=settings.NOTIFICATION_LEASE_SECONDS))
+
+    return list(Notification.objects.filter(
+        id__in=notification_ids).order_by('next_attempt_at', 'id'))
+
+
+def dispatch_notifications(batch_size):
+    # Toast 호출은 트랜잭션 밖에서 하고, 보낸 묶음마다 바로 결과를 저장한다.
+    # 결과를 저장하기 전에 dispatcher 가 죽으면 lease 가 끝난 뒤 다시 보낸다.
+    notifications = claim_notifications(batch_size)
+
+    # 내용이 같은 문자는 수신자를 모아서 한 번에 보낸다.
+    groups = OrderedDict()
+    for notification in notifications:
+        groups.setdefault(
+            (notification.kind, notification.body), []).append(notification)
+
+    sent_count = 0
+    failed_count = 0
+    for (kind, body), group in groups.items():
+        for i in range(0, len(group), MAX_RECIPIENTS):
+            chunk = group[i:i + MAX_RECIPIENTS]
+            errors = send_message(
+                kind, list(OrderedDict.fromkeys(
+                    notification.recipient for notification in chunk)), body)
+
+            for notification in chunk:
+                notification.attempts += 1
+                notification.locked_until = None
+                error = errors.get(notification.recipient)
+                if error is None:
+                    notification.status = Notification.SENT
+                    notification.sent_at = timezone.now()
+                    notification.last_error = ''
+                    sent_count += 1
+                else:
+                    if notification.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+                        notification.status = Notification.FAILED
+                    else:
+                        notification.status = Notification.PENDING
+                        notification.next_attempt_at = get_retry_at(notification.attempts)
+                    notification.last_error = error
+                    failed_count += 1
+
+            Notification.objects.bulk_update(chunk, [
+                'status', 'attempts', 'next_attempt_at', 'sent_at', 'last_error',
+                'locked_until'])
+
+    return sent_count, failed_count
@@ -5,12 +5,23 @@ from graphene import Mutation, ObjectType, String, Boolean, \
     Field, List, Int, ID
 from graphene_django.types import DjangoObjectType
 from user.models import Artist, UserInfo, Order, Like as ArtistLike
-from user.func import cancel_payment, create_order, create_payment, \
-    update_or_create_userinfo, validate_payment, send_sms, send_lms
+from user.func import cancel_payment
+from user.checkout import checkout
+from user.notifications import enqueue_sms, enqueue_lms
 from art.models import Art, Like as ArtLike
-from file.models import File, create_file, validate_file
+from file.models import File, create_files, get_user_files, validate_file
+from file.loaders import load_file
+from file.schema import FileType
+from user.viewer import get_viewer
+from sidong_server.likes import add_like, remove_like
+from sidong_server.optimizer import optimize
+from sidong_server.pagination import get_ordering, paginate_by_cursor
+from sidong_server.search import SEARCH_ORDERING, rank, search
 from django.utils import timezone
-from django.db.models import Q
+
+
+ARTIST_ORDERING_FIELDS = ['id', 'like_count', 'created_at']
+ARTIST_SEARCH_FIELDS = ['real_name', 'artist_name']
 
 
 class UserInfoType(DjangoObjectType):
@@ -29,6 +40,12 @@ class UserType(DjangoObjectType):
     liking_artists_count = Int()
     last_userinfo = Field(UserInfoType)
 
+    optimizer_hints = {
+        'liking_arts_count': [],
+        'liking_artists_count': [],
+        'last_userinfo': [],
+    }
+
     def resolve_liking_arts_count(self, info):
         return ArtLike.objects.filter(user_id=self.id).count()
 
@@ -45,12 +62,22 @@ class ArtistType(DjangoObjectType):
         convert_choices_to_enum = False
 
     current_user_likes_this_artist = Boolean()
+    thumbnail = Field(FileType, size=String())
+
+    optimizer_hints = {
+        'current_user_likes_this_artist': [],
+        'thumbnail': ['thumbnail'],
+        'representative_work': ['representative_work'],
+    }
 
     def resolve_current_user_likes_this_artist(self, info):
-        user = info.context.user
-        if user.is_anonymous:
-            return False
-        return ArtistLike.objects.filter(user=user, artist_id=self.id).exists()
+        return get_viewer(info).likes_artist(self.id)
+
+    def resolve_thumbnail(self, info, size=None):
+        return load_file(info, self.thumbnail_id, size)
+
+    def resolve_representative_work(self, info):
+        return load_file(info, self.representative_work_id)
 
     def resolve_phone(self, info):
         return '0' + str(self.phone.national_number)
@@ -64,6 +91,11 @@ class OrderType(DjangoObjectType):
     delivery_company = String()
     delivery_number = String()
 
+    optimizer_hints = {
+        'delivery_company': ['delivery_data'],
+        'delivery_number': ['delivery_data'],
+    }
+
     def resolve_created_at(self, info):
         return timezone.localdate(self.created_at)
 
@@ -85,7 +117,13 @@ class ArtistLikeType(ObjectType):
 
 class CursorBasedArtists(ObjectType):
     last_id = ID()
+    next_cursor = String()
+    artists = List(ArtistType)
+
+
+class ArtistCursorConnection(ObjectType):
     artists = List(ArtistType)
+    next_cursor = String()
 
 
 class OrderConnection(ObjectType):
@@ -99,6 +137,18 @@ class ArtistAccountInfo(ObjectType):
     number = String()
 
 
+def get_artists_filter(category=None, residence=None):
+    artists_filter = {}
+
+    if category:  # 필터 적용
+        if category != 'all':
+            artists_filter['category'] = category
+        if residence != 'all':
+            artists_filter['residence'] = residence
+
+    return artists_filter
+
+
 class Query(ObjectType):
     user = Field(UserType, id=ID(), email=String())
     current_user = Field(UserType)
@@ -107,13 +157,16 @@ class Query(ObjectType):
     artists = List(ArtistType, page=Int(), page_size=Int(),
                    category=String(), residence=String(),
                    ordering_priority=List(String))
+    artists_by_cursor = Field(ArtistCursorConnection, cursor=String(),
+                              page_size=Int(), category=String(), residence=String(),
+                              ordering_priority=List(String))
     user_liking_artists = Field(ArtistLikeType, user_id=ID(required=True),
                                 last_like_id=ID())
     orders = Field(OrderConnection, page=Int(), page_size=Int())
     sales = Field(OrderConnection, page=Int(), page_size=Int())
     artist_account_info = Field(ArtistAccountInfo)
     search_artists = Field(
-        CursorBasedArtists, last_id=ID(), word=String(required=True))
+        CursorBasedArtists, last_id=ID(), cursor=String(), word=String(required=True))
 
     def resolve_user(self, info, id=None, email=None):
         if id is not None:
@@ -152,25 +205,34 @@ class Query(ObjectType):
     def resolve_artists(self, info, page=0, page_size=20, category=None,
                         residence=None, ordering_priority=None):
 
-        artists_filter = {}
-
-        if category:  # 필터 적용
-            if category != 'all':
-                artists_filter['category'] = category
-            if residence != 'all':
-                artists_filter['residence'] = residence
+        artists_filter = get_artists_filter(category, residence)
 
         artists = Artist.objects.filter(
             is_approved=True, **artists_filter)
 
-        if not artists:
+        if not artists.exists():
             return None
 
         if ordering_priority is None:
             ordering_priority = ['-id']
 
-        return artists.order_by(
-            *ordering_priority)[page*page_size:(page + 1)*page_size]
+        return optimize(artists.order_by(*ordering_priority), info)[
+            page*page_size:(page + 1)*page_size]
+
+    def resolve_artists_by_cursor(self, info, cursor=None, page_size=20,
+                                  category=None, residence=None, ordering_priority=None):
+        artists_filter = get_artists_filter(category, residence)
+        ordering = get_ordering(ordering_priority, ARTIST_ORDERING_FIELDS)
+
+        artists, next_cursor = paginate_by_cursor(
+            optimize(Artist.objects.filter(is_approved=True, **artists_filter),
+                     info, 'artists', fields=[field.lstrip('-') for field in ordering]),
+            ordering, cursor, page_size)
+
+        return {
+            'artists': artists,
+            'next_cursor': next_cursor,
+        }
 
     def resolve_user_liking_artists(self, info, user_id, last_like_id=None):
         like_instances = ArtistLike.objects.filter(
@@ -198,7 +260,8 @@ class Query(ObjectType):
         orders = Order.objects.filter(userinfo__user=user)
 
         return {
-            'orders': orders.order_by('-id')[page*page_size:(page + 1)*page_size],
+            'orders': optimize(orders.order_by('-id'), info, 'orders')[
+                page*page_size:(page + 1)*page_size],
             'total_count': orders.count(),
         }
 
@@ -211,7 +274,8 @@ class Query(ObjectType):
         sales = Order.objects.filter(artist=artist)
 
         return {
-            'orders': sales.order_by('-id')[page*page_size:(page + 1)*page_size],
+            'orders': optimize(sales.order_by('-id'), info, 'orders')[
+                page*page_size:(page + 1)*page_size],
             'total_count': sales.count(),
         }
 
@@ -230,23 +294,33 @@ class Query(ObjectType):
             'number': artist.account['number'],
         }
 
-    def resolve_search_artists(self, info, word, last_id=None):
+    def resolve_search_artists(self, info, word, last_id=None, cursor=None):
         if not word:
             return None
 
-        artists = Artist.objects.filter(
-            Q(real_name__icontains=word) |
-            Q(artist_name__icontains=word))
+        artists = search(Artist.objects.all(), ARTIST_SEARCH_FIELDS, word)
 
-        if not artists:
+        if not artists.exists():
             return None
 
-        artists_filter = {'id__lt': last_id} if last_id else {}
+        if cursor is None:  # 이전 클라이언트: id 순서로 lastId 다음부터 조회
+            artists_filter = {'id__lt': last_id} if last_id else {}
+            artists = optimize(artists.filter(
+                **artists_filter).order_by('-id'), info, 'artists')[:20]
 
-        artists = artists.filter(**artists_filter).order_by('-id')[:20]
+            return {
+                'last_id': artists[len(artists) - 1].id if artists else None,
+                'artists': artists,
+            }
+
+        # cursor 를 넘기면(첫 페이지는 빈 문자열) 유사도 순으로 정렬하고 nextCursor 로 이어서 조회한다.
+        artists, next_cursor = paginate_by_cursor(
+            optimize(rank(artists, ARTIST_SEARCH_FIELDS, word), info, 'artists'),
+            SEARCH_ORDERING, cursor, 20)
 
         return {
-            'last_id': artists[len(artists) - 1].id if artists else None,
+            'last_id': artists[-1].id if artists else None,
+            'next_cursor': next_cursor,
             'artists': artists,
         }
 
@@ -266,6 +340,38 @@ class CreateUser(Mutation):
             return CreateUser(success=True)
 
 
+def get_artist_files(user, uploads, file_ids):
+    # uploads / file_ids: {'thumbnail': ..., 'representative_work': ...}
+    # 미리 올린 파일 id 가 있으면 그 파일을 쓰고, 없으면 함께 온 Upload 파일을 올린다.
+    artist_files = {}
+    upload_fields = []
+
+    for field, upload in uploads.items():
+        if file_ids.get(field) or not upload:
+            continue
+        validate = validate_file(upload[0], File.BUCKET_ASSETS)
+        if validate['status'] == 'fail':
+            return validate
+        upload_fields.append(field)
+
+    id_fields = [field for field, file_id in file_ids.items() if file_id]
+    if id_fields:
+        user_files = get_user_files([file_ids[field] for field in id_fields], user)
+        if user_files['status'] == 'fail':
+            return user_files
+        artist_files.update(zip(id_fields, user_files['instances']))
+
+    if upload_fields:
+        # 업로드는 트랜잭션 밖에서 병렬로 처리한다.
+        created_files = create_files(
+            [uploads[field][0] for field in upload_fields], File.BUCKET_ASSETS, user)
+        if created_files['status'] == 'fail':
+            return created_files
+        artist_files.update(zip(upload_fields, created_files['instances']))
+
+    return {'status': 'success', 'files': artist_files}
+
+
 class CreateArtist(Mutation):
     class Arguments:
         artist_name = String(required=True)
@@ -274,39 +380,36 @@ class CreateArtist(Mutation):
         description = String(required=True)
         category = Int(required=True)
         residence = Int(required=True)
-        thumbnail = Upload(required=True)
-        representative_work = Upload(required=True)
+        thumbnail = Upload()
+        representative_work = Upload()
+        thumbnail_file_id = ID()
+        representative_work_file_id = ID()
         website = String()
 
     success = Boolean()
     msg = String()
 
-    @transaction.atomic
     def mutate(self, info, artist_name, real_name, website,
-               phone, description, category, residence, thumbnail, representative_work):
+               phone, description, category, residence, thumbnail=None, representative_work=None,
+               thumbnail_file_id=None, representative_work_file_id=None):
         current_user = info.context.user
 
         if Artist.objects.filter(user=current_user).exists():
             return CreateArtist(success=False, msg="이미 작가 신청하셨습니다.\n관리자의 승인이 필요합니다.")
 
-        validate_thumbnail = validate_file(thumbnail[0], File.BUCKET_ASSETS)
-        if validate_thumbnail['status'] == 'fail':
-            return CreateArtist(success=False, msg=validate_thumbnail['msg'])
-
-        validate_representative_work = validate_file(
-            representative_work[0], File.BUCKET_ASSETS)
-        if validate_representative_work['status'] == 'fail':
-            return CreateArtist(success=False, msg=validate_representative_work['msg'])
+        if not (thumbnail or thumbnail_file_id) or \
+                not (representative_work or representative_work_file_id):
+            return CreateArtist(success=False, msg="프로필 사진과 대표 작품 이미지를 등록해주세요.")
 
-        thumbnail_file = create_file(
-            thumbnail[0], File.BUCKET_ASSETS, current_user)
-        if thumbnail_file['status'] == 'fail':
-            return CreateArtist(success=False, msg=thumbnail_file['msg'])
-
-        representative_work_file = create_file(
-            representative_work[0], File.BUCKET_ASSETS, current_user)
-        if representative_work_file['status'] == 'fail':
-            return CreateArtist(success=False, msg=representative_work_file['msg'])
+        artist_files = get_artist_files(current_user, {
+            'thumbnail': thumbnail,
+            'representative_work': representative_work,
+        }, {
+            'thumbnail': thumbnail_file_id,
+            'representative_work': representative_work_file_id,
+        })
+        if artist_files['status'] == 'fail':
+            return CreateArtist(success=False, msg=artist_files['msg'])
 
         Artist.objects.create(
             user=current_user,
@@ -316,8 +419,8 @@ class CreateArtist(Mutation):
             description=description,
             category=category,
             residence=residence,
-            thumbnail=thumbnail_file['instance'],
-            representative_work=representative_work_file['instance'],
+            thumbnail=artist_files['files']['thumbnail'],
+            representative_work=artist_files['files']['representative_work'],
             website=website if website else None,
             is_approved=True,
         )
@@ -335,45 +438,34 @@ class UpdateArtist(Mutation):
         residence = Int(required=True)
         thumbnail = Upload()
         representative_work = Upload()
+        thumbnail_file_id = ID()
+        representative_work_file_id = ID()
         website = String()
 
     success = Boolean()
     msg = String()
 
-    @transaction.atomic
     def mutate(self, info, artist_name, real_name, website,
-               phone, description, category, residence, thumbnail, representative_work):
+               phone, description, category, residence, thumbnail=None, representative_work=None,
+               thumbnail_file_id=None, representative_work_file_id=None):
         current_user = info.context.user
         try:
             artist = Artist.objects.get(user=current_user)
         except Artist.DoesNotExist:
             return UpdateArtist(success=False, msg="작가 등록되지 않은 유저입니다.")
 
-        if thumbnail:
-            validate_thumbnail = validate_file(
-                thumbnail[0], File.BUCKET_ASSETS)
-            if validate_thumbnail['status'] == 'fail':
-                return UpdateArtist(success=False, msg=validate_thumbnail['msg'])
-
-            thumbnail_file = create_file(
-                thumbnail[0], File.BUCKET_ASSETS, current_user)
-            if thumbnail_file['status'] == 'fail':
-                return UpdateArtist(success=False, msg=thumbnail_file['msg'])
-
-            artist.thumbnail = thumbnail_file['instance']
+        artist_files = get_artist_files(current_user, {
+            'thumbnail': thumbnail,
+            'representative_work': representative_work,
+        }, {
+            'thumbnail': thumbnail_file_id,
+            'representative_work': representative_work_file_id,
+        })
+        if artist_files['status'] == 'fail':
+            return UpdateArtist(success=False, msg=artist_files['msg'])
 
-        if representative_work:
-            validate_representative_work = validate_file(
-                representative_work[0], File.BUCKET_ASSETS)
-            if validate_representative_work['status'] == 'fail':
-                return UpdateArtist(success=False, msg=validate_representative_work['msg'])
-
-            representative_work_file = create_file(
-                representative_work[0], File.BUCKET_ASSETS, current_user)
-            if representative_work_file['status'] == 'fail':
-                return UpdateArtist(success=False, msg=representative_work_file['msg'])
-
-            artist.representative_work = representative_work_file['instance']
+        for field, file_instance in artist_files['files'].items():
+            setattr(artist, field, file_instance)
 
         artist.artist_name = artist_name
         artist.real_name = real_name
@@ -399,10 +491,7 @@ class LikeArtist(Mutation):
         if user.is_anonymous:
             return LikeArtist(success=False)
 
-        artist = Artist.objects.get(id=artist_id)
-        ArtistLike.objects.create(user=user, artist=artist)
-        artist.like_count += 1
-        artist.save()
+        add_like(ArtistLike, 'artist', user.id, artist_id)
 
         return LikeArtist(success=True)
 
@@ -418,13 +507,7 @@ class CancelLikeArtist(Mutation):
         if user.is_anonymous:
             return CancelLikeArtist(success=False)
 
-        artist = Artist.objects.get(id=artist_id)
-        like = ArtistLike.objects.filter(user=user, artist=artist)
-        like.delete()
-
-        if artist.like_count > 0:
-            artist.like_count -= 1
-            artist.save()
+        remove_like(ArtistLike, 'artist', user.id, artist_id)
 
         return CancelLikeArtist(success=True)
 
@@ -439,79 +522,25 @@ class CreateOrder(Mutation):
         recipient_name = String(required=True)
         recipient_phone = String(required=True)
         imp_uid = String(required=True)
+        idempotency_key = String()
 
     success = Boolean()
     msg = String()
 
-    @transaction.atomic
     def mutate(self, info, art_id, recipient_address, address,
-               recipient_name, name, recipient_phone, phone, imp_uid):
+               recipient_name, name, recipient_phone, phone, imp_uid, idempotency_key=None):
         user = info.context.user
         if user.is_anonymous:
             return CreateOrder(success=False, msg="로그인이 필요합니다.")
 
-        art = Art.objects.get(id=art_id)
-        if art.sale_status != Art.ON_SALE:
-            return CreateOrder(success=False, msg="판매 중인 작품이 아닙니다.")
-
-        result_of_payment, msg_or_payment_info = validate_payment(
-            imp_uid, art.price+art.delivery_fee)
-
-        if result_of_payment is False:
-            return CreateOrder(success=False, msg=msg_or_payment_info)
+        result_of_checkout, msg_or_order = checkout(
+            art_id, user, name, phone, address,
+            recipient_address, recipient_name, recipient_phone, imp_uid,
+            idempotency_key)
 
-        userinfo = update_or_create_userinfo(user, name, phone, address)
-
-        result_of_create_order, msg_or_order = create_order(
-            art, userinfo, recipient_address, recipient_name, recipient_phone)
-
-        if result_of_create_order is False:
+        if result_of_checkout is False:
             return CreateOrder(success=False, msg=msg_or_order)
 
-        result_of_create_payment, msg = create_payment(
-            msg_or_payment_info, msg_or_order)
-
-        if result_of_create_payment is False:
-            return CreateOrder(success=False, msg=msg)
-
-        msg_or_order.status = Order.SUCCESS
-        msg_or_order.save()
-
-        art.sale_status = Art.SOLD_OUT
-        art.save()
-
-        art_name = art.name[:8] + \
-            '..' if len(art.name) > 8 else art.name
-        order_id = str(msg_or_order.id)
-
-        # 고객 안내
-        send_lms([{"recipientNo": phone}],
-                 "[작업터] 주문 완료\n" +
-                 "- 주문번호: " + order_id + "\n" +
-                 "- 작품명: " + art_name + "\n" +
-                 "작품 주문 감사합니다.\n" +
-                 "작가분이 배송 준비할 예정입니다.\n" +
-                 "배송 진행 상황을 문자로 안내드리겠습니다.\n" +
-                 "작업터를 이용해주셔서 감사합니다. :)"
-                 )
-        # 작가 안내
-        send_lms([{"recipientNo": art.artist.phone.national_number}],
-                 "[작업터] 작품 판매 안내\n" +
-                 "- 주문번호: " + order_id + "\n" +
-                 "- 작품명: " + art_name + "\n" +
-                 "작품이 판매되었습니다. :)\n" +
-                 "배송 준비 부탁드립니다.\n\n" +
-                 "[필독 사항]\n" +
-                 "* 판매 관리에서 '배송 준비중' 으로 상태 변경 부탁드립니다.\n" +
-                 "* '작품보증서'를 작품과 함께 배송하셔야 합니다.\n" +
-                 "* 작품보증서 양식은 '판매 관리' 메뉴에서 다운로드 가능합니다.\n\n" +
-                 "작품 판매를 축하드립니다. 작품이 안전히 구매자에게 전달될 수 있도록 꼼꼼한 포장 부탁드립니다 :)"
-                 )
-        # 관리자 안내
-        send_sms([{"recipientNo": "01027251365"}], """
-            [주문 접수]\n{order_id}: {art_name}
-        """.format(order_id=order_id, art_name=art_name))
-
         return CreateOrder(success=True)
 
 
@@ -545,7 +574,7 @@ class CancelOrder(Mutation):
             '..' if len(order.art_name) > 8 else order.art_name
 
         # 작가 안내
-        send_sms([{"recipientNo": order.artist.phone.national_number}], """
+        enqueue_sms([order.artist.phone.national_number], """
             [작업터]\n구매자가 '{art_name}' 작품 주문을 취소했습니다.
         """.format(art_name=art_name))
 
@@ -559,6 +588,7 @@ class CompleteOrder(Mutation):
     success = Boolean()
     msg = String()
 
+    @transaction.atomic
     def mutate(self, info, order_id):
         order = Order.objects.get(id=order_id)
 
@@ -572,15 +602,15 @@ class CompleteOrder(Mutation):
             '..' if len(order.art_name) > 8 else order.art_name
 
         # 작가 안내
-        send_lms([{"recipientNo": order.artist.phone.national_number}],
-                 "[작업터] 구매 확정 안내\n\n" +
-                 "- 작품명: " + art_name + "\n" +
-                 "구매자가 구매를 확정했습니다. 판매 축하드립니다. :)\n\n" +
-                 "[필독 사항]\n" +
-                 "* 대금 정산은 매월 마지막 주에 진행됩니다.\n" +
-                 "* 정산이 끝나면 다시 안내 문자 드리겠습니다.\n\n" +
-                 "작업터를 이용해주셔서 감사합니다. 작가님들을 위한 서비스가 되겠습니다.(꾸벅)"
-                 )
+        enqueue_lms([order.artist.phone.national_number],
+                    "[작업터] 구매 확정 안내\n\n" +
+                    "- 작품명: " + art_name + "\n" +
+                    "구매자가 구매를 확정했습니다. 판매 축하드립니다. :)\n\n" +
+                    "[필독 사항]\n" +
+                    "* 대금 정산은 매월 마지막 주에 진행됩니다.\n" +
+                    "* 정산이 끝나면 다시 안내 문자 드리겠습니다.\n\n" +
+                    "작업터를 이용해주셔서 감사합니다. 작가님들을 위한 서비스가 되겠습니다.(꾸벅)"
+                    )
 
         return CompleteOrder(success=True)
 
@@ -592,6 +622,7 @@ class RequestRefund(Mutation):
     success = Boolean()
     msg = String()
 
+    @transaction.atomic
     def mutate(self, info, order_id):
         order = Order.objects.get(id=order_id)
 
@@ -604,15 +635,15 @@ class RequestRefund(Mutation):
         art_name = order.art_name[:8] + \
             '..' if len(order.art_name) > 8 else order.art_name
         # 고객 안내
-        send_sms([{"recipientNo": order.userinfo.phone.national_number}], """
+        enqueue_sms([order.userinfo.phone.national_number], """
             [작업터]\n- 작품명: {art_name}\n환불 요청 접수 완료.\n감사합니다.
         """.format(art_name=art_name))
         # 작가 안내
-        send_sms([{"recipientNo": order.artist.phone.national_number}], """
+        enqueue_sms([order.artist.phone.national_number], """
             [작업터]\n- 작품명: {art_name}\n환불이 진행될 예정입니다.
         """.format(art_name=art_name))
         # 관리자 안내
-        send_sms([{"recipientNo": "01027251365"}], """
+        enqueue_sms(["01027251365"], """
             [환불 접수]\n{order_id}, {art_name}\n환불 요청 확인하세요~
         """.format(order_id=order_id, art_name=art_name))
 
@@ -650,6 +681,7 @@ class UpdateOrder(Mutation):
     success = Boolean()
     msg = String()
 
+    @transaction.atomic
     def mutate(self, info, order_id, delivery_company, delivery_number, status):
         order = Order.objects.get(id=order_id)
 
@@ -714,7 +746,8 @@ class UpdateOrder(Mutation):
                 "작업터를 이용해주셔서 감사합니다 :)"
 
         # 고객 안내
-        send_lms([{"recipientNo": order.userinfo.phone.national_number}], message)
+        if message:
+            enqueue_lms([order.userinfo.phone.national_number], message)
 
         return UpdateOrder(success=True)
 
@@ -0,0 +1,343 @@
+import datetime
+import threading
+import time
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from art.models import Art
+from user import checkout, func, notifications
+from user.models import Artist, Notification, Order, Payment
+
+
+def create_token(access_token, expires_in=1800):
+    return {'access_token': access_token, 'expired_at': time.time() + expires_in}
+
+
+def create_response(status_code):
+    response = mock.Mock(status_code=status_code)
+    response.json.return_value = {'response': {}}
+    return response
+
+
+@override_settings(
+    CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'user-tests',
+    }},
+    IMP_TOKEN_EXPIRY_MARGIN=60,
+    IMP_TOKEN_LOCK_TIMEOUT=5,
+)
+class AccessTokenTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        patch = mock.patch.object(func, 'request_access_token_of_imp')
+        self.request_access_token = patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_cached_token_is_reused(self):
+        self.request_access_token.return_value = create_token('first')
+
+        self.assertEqual(func.get_access_token_of_imp(), 'first')
+        self.assertEqual(func.get_access_token_of_imp(), 'first')
+        self.assertEqual(self.request_access_token.call_count, 1)
+        self.assertIsNone(cache.get(func.IMP_TOKEN_LOCK_KEY))
+
+    def test_token_is_refreshed_before_expiry(self):
+        # 만료까지 margin(60초)보다 적게 남은 토큰은 캐시하지 않고 다시 받는다.
+        self.request_access_token.side_effect = [
+            create_token('first', expires_in=30), create_token('second')]
+
+        self.assertEqual(func.get_access_token_of_imp(), 'first')
+        self.assertEqual(func.get_access_token_of_imp(), 'second')
+        self.assertEqual(func.get_access_token_of_imp(), 'second')
+        self.assertEqual(self.request_access_token.call_count, 2)
+
+    def test_unauthorized_response_invalidates_and_retries(self):
+        self.request_access_token.side_effect = [create_token('first'), create_token('second')]
+
+        with mock.patch.object(func.gateway, 'request', side_effect=[
+                create_response(401), create_response(200)]) as request:
+            response = func.request_imp('iamport.payment', 'GET', '/payments/imp_1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [call[1]['headers']['Authorization'] for call in request.call_args_list],
+            ['first', 'second'])
+        self.assertEqual(func.get_access_token_of_imp(), 'second')
+
+    def test_concurrent_callers_fetch_one_token(self):
+        def request_access_token():
+            time.sleep(0.2)
+            return create_token('shared')
+        self.request_access_token.side_effect = request_access_token
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(func.get_access_token_of_imp()))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ['shared'] * 5)
+        self.assertEqual(self.request_access_token.call_count, 1)
+
+    def test_lock_taken_over_by_other_caller_is_kept(self):
+        # lock 이 만료돼서 다른 요청이 새로 잡은 lock 은 지우지 않는다.
+        def request_access_token():
+            cache.set(func.IMP_TOKEN_LOCK_KEY, 'other caller')
+            return create_token('first')
+        self.request_access_token.side_effect = request_access_token
+
+        func.get_access_token_of_imp()
+
+        self.assertEqual(cache.get(func.IMP_TOKEN_LOCK_KEY), 'other caller')
+
+    def test_lock_outlives_token_request(self):
+        # 설정값(5초)이 짧아도 gateway 가 재시도까지 다 쓰는 시간보다 길게 잡는다.
+        self.request_access_token.return_value = create_token('first')
+
+        with mock.patch.object(func.cache, 'add', wraps=cache.add) as add:
+            func.get_access_token_of_imp()
+
+        lock_timeout = add.call_args[0][2]
+        self.assertGreater(lock_timeout, func.gateway.get_max_duration('iamport.token'))
+
+    def test_redis_lock_is_released_atomically(self):
+        self.request_access_token.return_value = create_token('first')
+        redis_cache = mock.Mock()
+        redis_cache.get.return_value = None
+        redis_cache.client.make_key.return_value = 'lock key'
+        redis_cache.client.encode.side_effect = lambda value: value.encode()
+
+        with mock.patch.object(func, 'cache', redis_cache):
+            func.get_access_token_of_imp()
+
+        lock_token = redis_cache.add.call_args[0][1]
+        redis_cache.client.get_client.return_value.eval.assert_called_once_with(
+            func.IMP_TOKEN_UNLOCK_SCRIPT, 1, 'lock key', lock_token.encode())
+        redis_cache.delete.assert_not_called()
+
+
+@override_settings(NOTIFICATION_MAX_ATTEMPTS=2, NOTIFICATION_LEASE_SECONDS=300)
+class DispatchNotificationsTest(TransactionTestCase):
+    def setUp(self):
+        patch = mock.patch.object(notifications, 'send_message', side_effect=self.send_message)
+        self.send_message_mock = patch.start()
+        self.addCleanup(patch.stop)
+        self.errors = {}
+
+    def send_message(self, kind, recipients, body):
+        # Toast 를 부르는 동안에는 트랜잭션(행 잠금) 밖이고, 행은 이미 SENDING 으로 저장되어 있다.
+        self.assertFalse(connection.in_atomic_block)
+        self.assertEqual(set(Notification.objects.filter(
+            recipient__in=recipients).values_list('status', flat=True)), {Notification.SENDING})
+        return {recipient: self.errors.get(recipient) for recipient in recipients}
+
+    def test_same_body_is_sent_together(self):
+        notifications.enqueue_sms(['01000000001', '01000000002'], '안내')
+        notifications.enqueue_lms(['01000000003'], '장문 안내')
+
+        self.assertEqual(notifications.dispatch_notifications(100), (3, 0))
+
+        self.assertEqual(self.send_message_mock.call_count, 2)
+        self.assertEqual(
+            set(Notification.objects.values_list('status', 'attempts', 'locked_until')),
+            {(Notification.SENT, 1, None)})
+
+    def test_failure_is_retried_then_given_up(self):
+        notifications.enqueue_sms(['01000000001'], '안내')
+        self.errors['01000000001'] = '500: error'
+
+        self.assertEqual(notifications.dispatch_notifications(100), (0, 1))
+        notification = Notification.objects.get()
+        self.assertEqual(notification.status, Notification.PENDING)
+        self.assertGreater(notification.next_attempt_at, timezone.now())
+        # 아직 다시 보낼 시간이 아니다.
+        self.assertEqual(notifications.dispatch_notifications(100), (0, 0))
+
+        Notification.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(notifications.dispatch_notifications(100), (0, 1))
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.attempts), (Notification.FAILED, 2))
+
+    def test_expired_lease_is_claimed_again(self):
+        notifications.enqueue_sms(['01000000001', '01000000002'], '안내')
+        Notification.objects.filter(recipient='01000000001').update(
+            status=Notification.SENDING,
+            locked_until=timezone.now() + datetime.timedelta(minutes=1))
+        Notification.objects.filter(recipient='01000000002').update(
+            status=Notification.SENDING,
+            locked_until=timezone.now() - datetime.timedelta(minutes=1))
+
+        self.assertEqual(notifications.dispatch_notifications(100), (1, 0))
+        self.assertEqual(
+            Notification.objects.get(recipient='01000000001').status, Notification.SENDING)
+        self.assertEqual(
+            Notification.objects.get(recipient='01000000002').status, Notification.SENT)
+
+
+class CheckoutTestCase(TestCase):
+    PRICE = 100000
+
+    def setUp(self):
+        self.user = User.objects.create(username='buyer@test.com')
+        self.artist = Artist.objects.create(
+            artist_name='작가', real_name='작가', phone='010-9876-5432')
+        self.art = Art.objects.create(
+            artist=self.artist, name='작품', size=Art.SMALL, sale_status=Art.ON_SALE,
+            price=self.PRICE, reserved_by=self.user,
+            reserved_until=timezone.now() + datetime.timedelta(minutes=10))
+
+        self.payments = {}
+        validate_patch = mock.patch.object(
+            checkout, 'validate_payment', side_effect=self.validate_payment)
+        validate_patch.start()
+        self.addCleanup(validate_patch.stop)
+        cancel_patch = mock.patch.object(
+            checkout, 'request_cancel_payment', return_value=(True, {}))
+        self.cancel_payment = cancel_patch.start()
+        self.addCleanup(cancel_patch.stop)
+
+    def validate_payment(self, imp_uid, price):
+        return (True, {
+            'imp_uid': imp_uid,
+            'amount': price,
+            'status': 'paid',
+            'paid_at': time.time(),
+            'pay_method': 'card',
+        })
+
+    def checkout(self, imp_uid='imp_1', user=None, phone='010-1234-5678', idempotency_key=None):
+        return checkout.checkout(
+            self.art.id, user or self.user, '구매자', phone, '주소',
+            '받는 주소', '받는 사람', '010-1111-2222', imp_uid, idempotency_key)
+
+    def assert_not_sold(self):
+        self.art.refresh_from_db()
+        self.assertEqual(self.art.sale_status, Art.ON_SALE)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Payment.objects.exists())
+
+
+class CheckoutTest(CheckoutTestCase):
+    def test_checkout_saves_order_and_queues_notifications(self):
+        result, order = self.checkout()
+
+        self.assertTrue(result)
+        self.assertEqual(order.status, Order.SUCCESS)
+        self.art.refresh_from_db()
+        self.assertEqual(self.art.sale_status, Art.SOLD_OUT)
+        self.assertIsNone(self.art.reserved_by)
+        self.assertEqual(
+            sorted(Notification.objects.values_list('recipient', flat=True)),
+            ['01027251365', '1012345678', '1098765432'])
+        self.cancel_payment.assert_not_called()
+
+    def test_invalid_phone_cancels_payment(self):
+        result, msg = self.checkout(phone='not a phone')
+
+        self.assertFalse(result)
+        self.assertIn('결제는 취소되었습니다.', msg)
+        self.cancel_payment.assert_called_once_with('imp_1', self.PRICE)
+        self.assert_not_sold()
+
+    def test_unexpected_error_cancels_payment(self):
+        with mock.patch.object(checkout, 'create_payment', side_effect=RuntimeError('boom')), \
+                self.assertLogs('user.checkout', 'ERROR'):
+            result, msg = self.checkout()
+
+        self.assertFalse(result)
+        self.cancel_payment.assert_called_once_with('imp_1', self.PRICE)
+        self.assert_not_sold()
+        self.assertFalse(Notification.objects.exclude(recipient='01027251365').exists())
+
+    def test_art_sold_during_payment_cancels_payment(self):
+        # 결제를 확인하는 동안 다른 주문이 먼저 끝난 경우
+        def sell_and_validate_payment(imp_uid, price):
+            Art.objects.filter(id=self.art.id).update(sale_status=Art.SOLD_OUT)
+            return self.validate_payment(imp_uid, price)
+
+        with mock.patch.object(checkout, 'validate_payment', side_effect=sell_and_validate_payment):
+            result, msg = self.checkout()
+
+        self.assertFalse(result)
+        self.cancel_payment.assert_called_once_with('imp_1', self.PRICE)
+
+    def test_expired_reservation_cancels_payment(self):
+        # 예약 시간이 지난 뒤 도착한 결제는 만료된 예약을 아직 풀지 않았더라도 취소한다.
+        Art.objects.filter(id=self.art.id).update(
+            reserved_until=timezone.now() - datetime.timedelta(seconds=1))
+
+        result, msg = self.checkout()
+
+        self.assertFalse(result)
+        self.assertIn('예약 시간이 지났습니다', msg)
+        self.cancel_payment.assert_called_once_with('imp_1', self.PRICE)
+        self.assert_not_sold()
+
+
+class IdempotencyTest(CheckoutTestCase):
+    def test_retry_with_same_payment_returns_saved_order(self):
+        _, order = self.checkout(idempotency_key='key-1')
+
+        with mock.patch.object(checkout, 'validate_payment') as validate_payment:
+            result, retried_order = self.checkout(idempotency_key='key-1')
+
+        self.assertTrue(result)
+        self.assertEqual(retried_order.id, order.id)
+        validate_payment.assert_not_called()
+        self.cancel_payment.assert_not_called()
+
+    def test_same_key_with_other_payment_is_cancelled(self):
+        _, order = self.checkout(imp_uid='imp_1', idempotency_key='key-1')
+
+        result, msg = self.checkout(imp_uid='imp_2', idempotency_key='key-1')
+
+        self.assertFalse(result)
+        self.assertIn('결제는 취소되었습니다.', msg)
+        self.cancel_payment.assert_called_once_with('imp_2', self.PRICE)
+        self.assertEqual(list(Order.objects.values_list('id', flat=True)), [order.id])
+        self.assertFalse(Payment.objects.filter(transaction_id='imp_2').exists())
+
+    def test_loser_of_same_key_race_is_cancelled(self):
+        self.checkout(imp_uid='imp_1', idempotency_key='key-1')
+        Art.objects.filter(id=self.art.id).update(
+            sale_status=Art.ON_SALE, reserved_by=self.user,
+            reserved_until=timezone.now() + datetime.timedelta(minutes=10))
+
+        # 두 요청이 동시에 key 를 확인해서 둘 다 처음 온 요청으로 본 경우
+        with mock.patch.object(checkout, 'is_used_idempotency_key', return_value=False):
+            result, msg = self.checkout(imp_uid='imp_2', idempotency_key='key-1')
+
+        self.assertFalse(result)
+        self.assertIn('주문(Order) 생성 중에 문제가 발생했습니다.', msg)
+        self.cancel_payment.assert_called_once_with('imp_2', self.PRICE)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_key_is_scoped_to_the_user(self):
+        self.checkout(imp_uid='imp_1', idempotency_key='key-1')
+        other_user = User.objects.create(username='other@test.com')
+        Art.objects.filter(id=self.art.id).update(
+            sale_status=Art.ON_SALE, reserved_by=other_user,
+            reserved_until=timezone.now() + datetime.timedelta(minutes=10))
+
+        result, _ = self.checkout(imp_uid='imp_2', user=other_user, idempotency_key='key-1')
+
+        self.assertTrue(result)
+        self.assertEqual(Order.objects.filter(idempotency_key='key-1').count(), 2)
+
+    def test_payment_of_other_user_is_rejected(self):
+        self.checkout(imp_uid='imp_1')
+        other_user = User.objects.create(username='other@test.com')
+
+        result, msg = self.checkout(imp_uid='imp_1', user=other_user)
+
+        self.assertFalse(result)
+        self.assertEqual(msg, '이미 처리된 결제입니다.')
+        self.cancel_payment.assert_not_called()
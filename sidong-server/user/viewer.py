@@ -0,0 +1,46 @@
+from promise import Promise
+from promise.dataloader import DataLoader
+from art.models import Like as ArtLike
+from user.models import Like as ArtistLike
+
+
+class LikeLoader(DataLoader):
+    def __init__(self, like_model, target_field, user):
+        super(LikeLoader, self).__init__()
+        self.like_model = like_model
+        self.target_field = target_field
+        self.user = user
+
+    def batch_load_fn(self, target_ids):
+        liked_ids = set(self.like_model.objects.filter(**{
+            'user': self.user,
+            self.target_field + '__in': target_ids,
+        }).values_list(self.target_field, flat=True))
+        return Promise.resolve([target_id in liked_ids for target_id in target_ids])
+
+
+class Viewer(object):
+    # 현재 요청의 로그인 유저. 페이지에 나온 작품/작가의 좋아요 여부를 테이블당 한 번의 쿼리로 가져온다.
+    def __init__(self, user):
+        self.user = user
+        if not user.is_anonymous:
+            self.art_likes = LikeLoader(ArtLike, 'art_id', user)
+            self.artist_likes = LikeLoader(ArtistLike, 'artist_id', user)
+
+    def likes_art(self, art_id):
+        if self.user.is_anonymous:
+            return False
+        return self.art_likes.load(int(art_id))
+
+    def likes_artist(self, artist_id):
+        if self.user.is_anonymous:
+            return False
+        return self.artist_likes.load(int(artist_id))
+
+
+def get_viewer(info):
+    viewer = getattr(info.context, 'viewer', None)
+    if viewer is None:
+        viewer = Viewer(info.context.user)
+        info.context.viewer = viewer
+    return viewer